@@ -17,6 +17,13 @@ import app.models.vendors  # noqa: F401
 import app.models.exceptions  # noqa: F401
 import app.models.users  # noqa: F401
 import app.models.meta  # noqa: F401
+import app.models.runs  # noqa: F401
+import app.models.audit  # noqa: F401
+import app.models.fingerprints  # noqa: F401
+import app.models.jobs  # noqa: F401
+import app.models.timings  # noqa: F401
+import app.models.operand_orders  # noqa: F401
+import app.models.rollups  # noqa: F401
 
 config = context.config
 db_url = os.getenv("DATABASE_URL")
@@ -0,0 +1,48 @@
+"""incremental evaluation fingerprints
+
+Revision ID: 0004_incremental_evaluation
+Revises: 0003_audit_logs
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_incremental_evaluation"
+down_revision = "0003_audit_logs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "evaluation_fingerprints",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("run_id", sa.String(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("fingerprint", sa.String(), nullable=False),
+    )
+    op.create_index(
+        "ix_evaluation_fingerprints_run_kind",
+        "evaluation_fingerprints",
+        ["run_id", "kind"],
+        unique=False,
+    )
+    op.add_column(
+        "evaluation_runs",
+        sa.Column("reused_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "evaluation_runs",
+        sa.Column("recomputed_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("evaluation_runs", "recomputed_count")
+    op.drop_column("evaluation_runs", "reused_count")
+    op.drop_index(
+        "ix_evaluation_fingerprints_run_kind", table_name="evaluation_fingerprints"
+    )
+    op.drop_table("evaluation_fingerprints")
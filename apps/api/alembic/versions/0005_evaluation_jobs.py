@@ -0,0 +1,50 @@
+"""evaluation job queue
+
+Revision ID: 0005_evaluation_jobs
+Revises: 0004_incremental_evaluation
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_evaluation_jobs"
+down_revision = "0004_incremental_evaluation"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "evaluation_jobs",
+        sa.Column("job_id", sa.String(), primary_key=True),
+        sa.Column("run_id", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False, server_default="queued"),
+        sa.Column("params", sa.JSON(), nullable=False, server_default=sa.text("'{}'")),
+        sa.Column("controls_done", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("controls_total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "cancel_requested", sa.Boolean(), nullable=False, server_default=sa.false()
+        ),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index(
+        "ix_evaluation_jobs_status_created",
+        "evaluation_jobs",
+        ["status", "created_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_evaluation_jobs_status_created", table_name="evaluation_jobs")
+    op.drop_table("evaluation_jobs")
@@ -0,0 +1,41 @@
+"""evaluation phase and control timings
+
+Revision ID: 0006_evaluation_timings
+Revises: 0005_evaluation_jobs
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_evaluation_timings"
+down_revision = "0005_evaluation_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("evaluation_runs", sa.Column("timings", sa.JSON(), nullable=True))
+    op.create_table(
+        "evaluation_control_timings",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("run_id", sa.String(), nullable=False),
+        sa.Column("control_id", sa.String(), nullable=False),
+        sa.Column("seconds", sa.Float(), nullable=False),
+        sa.Column("assets_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_index(
+        "ix_evaluation_control_timings_run_seconds",
+        "evaluation_control_timings",
+        ["run_id", "seconds"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_evaluation_control_timings_run_seconds",
+        table_name="evaluation_control_timings",
+    )
+    op.drop_table("evaluation_control_timings")
+    op.drop_column("evaluation_runs", "timings")
@@ -0,0 +1,24 @@
+"""shared sub-expression statistics
+
+Revision ID: 0007_shared_expressions
+Revises: 0006_evaluation_timings
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_shared_expressions"
+down_revision = "0006_evaluation_timings"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "evaluation_runs", sa.Column("shared_stats", sa.JSON(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("evaluation_runs", "shared_stats")
@@ -0,0 +1,37 @@
+"""profiled and/or operand orders
+
+Revision ID: 0008_operand_orders
+Revises: 0007_shared_expressions
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_operand_orders"
+down_revision = "0007_shared_expressions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "evaluation_operand_orders",
+        sa.Column("node_hash", sa.String(), primary_key=True),
+        sa.Column("op", sa.String(), nullable=False),
+        sa.Column("logic", sa.JSON(), nullable=False),
+        sa.Column("order", sa.JSON(), nullable=False),
+        sa.Column("samples", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("seconds", sa.JSON(), nullable=False),
+        sa.Column("stops", sa.JSON(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=True,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("evaluation_operand_orders")
@@ -0,0 +1,22 @@
+"""control content hash for diff-based rule-pack apply
+
+Revision ID: 0009_control_content_hash
+Revises: 0008_operand_orders
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_control_content_hash"
+down_revision = "0008_operand_orders"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("controls", sa.Column("content_hash", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("controls", "content_hash")
@@ -0,0 +1,40 @@
+"""composite indexes for keyset pagination of results
+
+Revision ID: 0010_results_keyset_indexes
+Revises: 0009_control_content_hash
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+revision = "0010_results_keyset_indexes"
+down_revision = "0009_control_content_hash"
+branch_labels = None
+depends_on = None
+
+# index name -> sort column; each is (run_id, column, id).  (run_id, id)
+# replaces the plain run_id index.
+INDEXES = {
+    "ix_results_run_id_id": None,
+    "ix_results_run_evaluated_at_id": "evaluated_at",
+    "ix_results_run_severity_id": "severity",
+    "ix_results_run_status_id": "status",
+    "ix_results_run_control_id_id": "control_id",
+    "ix_results_run_asset_id_id": "asset_id",
+}
+
+
+def _columns(column: str | None) -> list:
+    return ["run_id", "id"] if column is None else ["run_id", column, "id"]
+
+
+def upgrade() -> None:
+    for name, column in INDEXES.items():
+        op.create_index(name, "results", _columns(column), unique=False)
+    op.drop_index("ix_results_run_id", table_name="results")
+
+
+def downgrade() -> None:
+    op.create_index("ix_results_run_id", "results", ["run_id"], unique=False)
+    for name in INDEXES:
+        op.drop_index(name, table_name="results")
@@ -0,0 +1,48 @@
+"""per-run result rollups for /results/summary
+
+Revision ID: 0011_result_rollups
+Revises: 0010_results_keyset_indexes
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011_result_rollups"
+down_revision = "0010_results_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "evaluation_result_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("run_id", sa.String(), nullable=False),
+        sa.Column("framework", sa.String(), nullable=False, server_default=""),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("severity", sa.String(), nullable=False),
+        sa.Column("cloud", sa.String(), nullable=True),
+        sa.Column("type", sa.String(), nullable=True),
+        sa.Column("env", sa.String(), nullable=True),
+        sa.Column("category", sa.String(), nullable=True),
+        sa.Column("count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_index(
+        "ix_evaluation_result_rollups_run_framework",
+        "evaluation_result_rollups",
+        ["run_id", "framework"],
+    )
+    op.add_column(
+        "evaluation_runs",
+        sa.Column("rolled_up_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("evaluation_runs", "rolled_up_at")
+    op.drop_index(
+        "ix_evaluation_result_rollups_run_framework",
+        table_name="evaluation_result_rollups",
+    )
+    op.drop_table("evaluation_result_rollups")
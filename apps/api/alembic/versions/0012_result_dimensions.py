@@ -0,0 +1,73 @@
+"""asset and control dimensions copied onto results
+
+Revision ID: 0012_result_dimensions
+Revises: 0011_result_rollups
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012_result_dimensions"
+down_revision = "0011_result_rollups"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ("asset_type", "cloud", "region", "env", "category")
+
+INDEXES = {
+    "ix_results_run_status_severity": ["run_id", "status", "severity"],
+    "ix_results_run_cloud_asset_type": ["run_id", "cloud", "asset_type"],
+    "ix_results_run_env": ["run_id", "env"],
+    "ix_results_run_category": ["run_id", "category"],
+}
+
+
+def upgrade() -> None:
+    for column in COLUMNS:
+        op.add_column("results", sa.Column(column, sa.String(), nullable=True))
+
+    # Backfill from the assets and controls the results point at.
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            """
+            UPDATE results AS r
+            SET asset_type = a.type, cloud = a.cloud, region = a.region,
+                env = CAST(a.tags AS jsonb) ->> 'env'
+            FROM assets AS a
+            WHERE a.asset_id = r.asset_id
+            """
+        )
+        op.execute(
+            """
+            UPDATE results AS r SET category = c.category
+            FROM controls AS c
+            WHERE c.control_id = r.control_id
+            """
+        )
+    else:
+        asset = "SELECT {} FROM assets AS a WHERE a.asset_id = results.asset_id LIMIT 1"
+        op.execute(
+            "UPDATE results SET "
+            + ", ".join(
+                f"{column} = ({asset.format(source)})"
+                for column, source in (
+                    ("asset_type", "a.type"),
+                    ("cloud", "a.cloud"),
+                    ("region", "a.region"),
+                    ("env", "json_extract(a.tags, '$.env')"),
+                )
+            )
+            + ", category = (SELECT c.category FROM controls AS c"
+            " WHERE c.control_id = results.control_id LIMIT 1)"
+        )
+
+    for name, columns in INDEXES.items():
+        op.create_index(name, "results", columns, unique=False)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, table_name="results")
+    for column in COLUMNS:
+        op.drop_column("results", column)
@@ -1,34 +1,360 @@
-"""Background job helpers for evaluation."""
+"""Background job helpers for evaluation.
+
+With ``USE_QUEUE=true`` evaluations are stored as ``EvaluationJob`` rows and
+picked up by worker threads running inside the API process, so no external
+broker is needed.  ``EVALUATION_CONCURRENCY`` worker threads run at most that
+many evaluations at once per process; any process started with the queue
+enabled also drains jobs enqueued by other replicas.  Without the queue the
+evaluation runs inline, as before.
+"""
 
 from __future__ import annotations
 
+import logging
 import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
 from uuid import uuid4
 
-from app.services.evaluator import run_evaluation
+from sqlalchemy import select, update
+
+from app.models import db as models_db
+from app.models import jobs as job_m
+from app.models import runs as run_m
+from app.services.evaluator import EvaluationCancelled, ProgressCallback, run_evaluation
+
+logger = logging.getLogger(__name__)
+
+_ACTIVE = ("queued", "running")
+
+
+def queue_enabled() -> bool:
+    return os.getenv("USE_QUEUE", "false").lower() == "true"
+
+
+def _job_dict(job: job_m.EvaluationJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.job_id,
+        "run_id": job.run_id,
+        "status": job.status,
+        "params": job.params,
+        "controls_done": job.controls_done,
+        "controls_total": job.controls_total,
+        "cancel_requested": job.cancel_requested,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
 
 
 def enqueue(
     controls: list[str] | None = None,
     assets: list[str] | None = None,
     dry_run: bool = False,
+    incremental: bool | None = None,
 ) -> dict:
-    """Run evaluation either via queue or inline depending on USE_QUEUE."""
+    """Queue an evaluation when USE_QUEUE is set, otherwise run it inline.
+
+    Queued evaluations return immediately with the job id and the id of the
+    (pre-created) run so clients can poll either.
+    """
     job_id = str(uuid4())
-    if os.getenv("USE_QUEUE", "false").lower() == "true":
-        # In a full implementation this would enqueue the job in a task queue
+    if not queue_enabled():
         return run_evaluation(
             job_id=job_id,
             controls_scope=controls,
             assets_scope=assets,
             dry_run=dry_run,
+            incremental=incremental,
         )
-    return run_evaluation(
-        job_id=job_id,
-        controls_scope=controls,
-        assets_scope=assets,
-        dry_run=dry_run,
+    run_id = str(uuid4())
+    session = models_db.SessionLocal()
+    try:
+        session.add(run_m.EvaluationRun(run_id=run_id, status="queued"))
+        session.add(
+            job_m.EvaluationJob(
+                job_id=job_id,
+                run_id=run_id,
+                status="queued",
+                params={
+                    "controls": controls,
+                    "assets": assets,
+                    "dry_run": dry_run,
+                    "incremental": incremental,
+                },
+            )
+        )
+        session.commit()
+    finally:
+        session.close()
+    get_runner().wake()
+    return {"job_id": job_id, "run_id": run_id, "status": "queued"}
+
+
+def get_job(job_id: str) -> Dict[str, Any] | None:
+    session = models_db.SessionLocal()
+    try:
+        job = session.get(job_m.EvaluationJob, job_id)
+        return _job_dict(job) if job else None
+    finally:
+        session.close()
+
+
+def list_jobs(limit: int = 50) -> List[Dict[str, Any]]:
+    session = models_db.SessionLocal()
+    try:
+        jobs = session.scalars(
+            select(job_m.EvaluationJob)
+            .order_by(job_m.EvaluationJob.created_at.desc())
+            .limit(limit)
+        ).all()
+        return [_job_dict(j) for j in jobs]
+    finally:
+        session.close()
+
+
+def cancel_job(job_id: str) -> Dict[str, Any] | None:
+    """Cancel a queued job or ask a running one to stop after its current control."""
+
+    session = models_db.SessionLocal()
+    try:
+        job = session.get(job_m.EvaluationJob, job_id)
+        if job is None:
+            return None
+        now = datetime.utcnow()
+        dequeued = session.execute(
+            update(job_m.EvaluationJob)
+            .where(
+                job_m.EvaluationJob.job_id == job_id,
+                job_m.EvaluationJob.status == "queued",
+            )
+            .values(status="cancelled", cancel_requested=True, finished_at=now)
+        ).rowcount
+        if dequeued:
+            _finish_run(session, job.run_id, "cancelled", "Cancelled before start")
+        elif job.status == "running":
+            job.cancel_requested = True
+        session.commit()
+        session.refresh(job)
+        return _job_dict(job)
+    finally:
+        session.close()
+
+
+def _finish_run(session, run_id: str, status: str, error: str | None) -> None:
+    session.execute(
+        update(run_m.EvaluationRun)
+        .where(
+            run_m.EvaluationRun.run_id == run_id,
+            run_m.EvaluationRun.status.in_(_ACTIVE),
+        )
+        .values(status=status, error=error, finished_at=datetime.utcnow())
     )
 
 
-__all__ = ["enqueue"]
+def _single_writer() -> bool:
+    session = models_db.SessionLocal()
+    try:
+        return session.get_bind().dialect.name == "sqlite"
+    finally:
+        session.close()
+
+
+class JobRunner:
+    """Worker threads draining the ``evaluation_jobs`` table."""
+
+    def __init__(
+        self,
+        concurrency: int = 1,
+        *,
+        poll_interval: float = 5.0,
+        heartbeat_interval: float = 1.0,
+        stale_after: float = 900.0,
+    ) -> None:
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self.recover_stale()
+        for i in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._loop, name=f"evaluation-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stop.clear()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                worked = self.process_next()
+            except Exception:  # pragma: no cover - keep the worker alive
+                logger.exception("Evaluation worker error")
+                worked = False
+            if not worked:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def recover_stale(self) -> int:
+        """Fail running jobs whose worker stopped sending heartbeats."""
+
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        session = models_db.SessionLocal()
+        try:
+            stale = session.scalars(
+                select(job_m.EvaluationJob).where(
+                    job_m.EvaluationJob.status == "running",
+                    job_m.EvaluationJob.heartbeat_at < cutoff,
+                )
+            ).all()
+            for job in stale:
+                job.status = "failed"
+                job.error = "Worker lost"
+                job.finished_at = datetime.utcnow()
+                _finish_run(session, job.run_id, "failed", "Worker lost")
+            session.commit()
+            return len(stale)
+        finally:
+            session.close()
+
+    def _claim(self) -> job_m.EvaluationJob | None:
+        session = models_db.SessionLocal()
+        try:
+            for job in session.scalars(
+                select(job_m.EvaluationJob)
+                .where(job_m.EvaluationJob.status == "queued")
+                .order_by(job_m.EvaluationJob.created_at, job_m.EvaluationJob.job_id)
+                .limit(self.concurrency + 1)
+            ).all():
+                now = datetime.utcnow()
+                claimed = session.execute(
+                    update(job_m.EvaluationJob)
+                    .where(
+                        job_m.EvaluationJob.job_id == job.job_id,
+                        job_m.EvaluationJob.status == "queued",
+                    )
+                    .values(status="running", started_at=now, heartbeat_at=now)
+                ).rowcount
+                session.commit()
+                if claimed:
+                    session.refresh(job)
+                    session.expunge(job)
+                    return job
+            return None
+        finally:
+            session.close()
+
+    def process_next(self) -> bool:
+        """Run the oldest queued job in this thread; False if none was queued."""
+
+        job = self._claim()
+        if job is None:
+            return False
+        params = job.params or {}
+        status, error = "completed", None
+        try:
+            run_evaluation(
+                job_id=job.job_id,
+                run_id=job.run_id,
+                controls_scope=params.get("controls"),
+                assets_scope=params.get("assets"),
+                dry_run=bool(params.get("dry_run")),
+                incremental=params.get("incremental"),
+                progress=self._progress(job.job_id),
+                # SQLite allows one writer: a heartbeat would wait on the
+                # run's open transaction, so the run commits every batch.
+                commit_batches=True if _single_writer() else None,
+            )
+        except EvaluationCancelled:
+            status, error = "cancelled", "Cancelled by user"
+        except Exception as exc:
+            logger.exception("Evaluation job %s failed", job.job_id)
+            status, error = "failed", str(exc) or exc.__class__.__name__
+        session = models_db.SessionLocal()
+        try:
+            session.execute(
+                update(job_m.EvaluationJob)
+                .where(job_m.EvaluationJob.job_id == job.job_id)
+                .values(status=status, error=error, finished_at=datetime.utcnow())
+            )
+            if status != "completed":
+                _finish_run(session, job.run_id, status, error)
+            session.commit()
+        finally:
+            session.close()
+        return True
+
+    def _progress(self, job_id: str) -> ProgressCallback:
+        last = [0.0]
+
+        def callback(run_id: str, done: int, total: int) -> None:
+            now = time.monotonic()
+            if 0 < done < total and now - last[0] < self.heartbeat_interval:
+                return
+            last[0] = now
+            session = models_db.SessionLocal()
+            try:
+                job = session.get(job_m.EvaluationJob, job_id)
+                if job is None:
+                    return
+                job.controls_done = done
+                job.controls_total = total
+                job.heartbeat_at = datetime.utcnow()
+                cancel = job.cancel_requested
+                session.commit()
+            finally:
+                session.close()
+            if cancel:
+                raise EvaluationCancelled("Cancelled by user")
+
+        return callback
+
+
+_runner: JobRunner | None = None
+_runner_lock = threading.Lock()
+
+
+def get_runner() -> JobRunner:
+    """Return the process-wide runner, starting its threads on first use."""
+
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner(
+                int(os.getenv("EVALUATION_CONCURRENCY", "1")),
+                poll_interval=float(os.getenv("EVALUATION_JOB_POLL_SECONDS", "5")),
+                stale_after=float(os.getenv("EVALUATION_JOB_STALE_SECONDS", "900")),
+            )
+            _runner.start()
+        return _runner
+
+
+__all__ = [
+    "queue_enabled",
+    "enqueue",
+    "get_job",
+    "list_jobs",
+    "cancel_job",
+    "JobRunner",
+    "get_runner",
+]
@@ -22,6 +22,22 @@ results_total = Counter(
     "raybeam_results_total", "Total evaluation results", ["status"]
 )
 
+evaluate_operator_evaluations_total = Counter(
+    "raybeam_evaluate_operator_evaluations_total",
+    "Operator evaluations scheduled by evaluation runs (before short-circuiting)",
+    ["op"],
+)
+
+evaluate_asset_rows_total = Counter(
+    "raybeam_evaluate_asset_rows_total", "Asset rows fetched by evaluation runs"
+)
+
+shared_expression_evaluations_total = Counter(
+    "raybeam_shared_expression_evaluations_total",
+    "Evaluations of sub-expressions shared between controls",
+    ["outcome"],  # "evaluated" or "reused"
+)
+
 # Histograms
 request_duration_seconds = Histogram(
     "raybeam_request_duration_seconds",
@@ -33,6 +49,18 @@ evaluate_duration_seconds = Histogram(
     "raybeam_evaluate_duration_seconds", "Evaluation duration in seconds"
 )
 
+evaluate_phase_seconds = Histogram(
+    "raybeam_evaluate_phase_seconds",
+    "Evaluation phase duration in seconds",
+    ["phase"],
+)
+
+evaluate_control_duration_seconds = Histogram(
+    "raybeam_evaluate_control_duration_seconds",
+    "Per-control evaluation duration in seconds",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
 
 router = APIRouter()
 
@@ -49,7 +77,12 @@ __all__ = [
     "http_requests_total",
     "evaluate_runs_total",
     "results_total",
+    "evaluate_operator_evaluations_total",
+    "evaluate_asset_rows_total",
+    "shared_expression_evaluations_total",
     "request_duration_seconds",
     "evaluate_duration_seconds",
+    "evaluate_phase_seconds",
+    "evaluate_control_duration_seconds",
     "router",
 ]
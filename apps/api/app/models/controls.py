@@ -16,3 +16,5 @@ class Control(Base):
     logic: Mapped[dict] = mapped_column(JSON, default=dict)
     frameworks: Mapped[dict] = mapped_column(JSON, default=dict)
     fix: Mapped[dict] = mapped_column(JSON, default=dict)
+    # Hash of the columns above, set when applied from a rule pack.
+    content_hash: Mapped[str | None] = mapped_column(String, nullable=True)
@@ -0,0 +1,20 @@
+from sqlalchemy import Index, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .db import Base
+
+
+class EvaluationFingerprint(Base):
+    """Content hash of an asset or control as seen by an evaluation run."""
+
+    __tablename__ = "evaluation_fingerprints"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    run_id: Mapped[str] = mapped_column(String)
+    kind: Mapped[str] = mapped_column(String)  # "asset" or "control"
+    key: Mapped[str] = mapped_column(String)
+    fingerprint: Mapped[str] = mapped_column(String)
+
+    __table_args__ = (
+        Index("ix_evaluation_fingerprints_run_kind", "run_id", "kind"),
+    )
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from .db import Base
+
+
+class OperandOrder(Base):
+    """Profiled cost and selectivity of one ``and``/``or`` node's operands."""
+
+    __tablename__ = "evaluation_operand_orders"
+
+    # rule_compiler.logic_hash of the node
+    node_hash: Mapped[str] = mapped_column(String, primary_key=True)
+    op: Mapped[str] = mapped_column(String)
+    logic: Mapped[dict] = mapped_column(JSON)
+    # operand positions in evaluation order
+    order: Mapped[list] = mapped_column(JSON)
+    samples: Mapped[int] = mapped_column(Integer, default=0)
+    # per operand, summed over (decayed) samples
+    seconds: Mapped[list] = mapped_column(JSON)
+    stops: Mapped[list] = mapped_column(JSON)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
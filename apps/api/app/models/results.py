@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import JSON, String, DateTime
+from sqlalchemy import JSON, String, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql import func
 
@@ -21,5 +21,28 @@ class Result(Base):
     evaluated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
-    run_id: Mapped[str] = mapped_column(String, index=True)
+    run_id: Mapped[str] = mapped_column(String)
     meta: Mapped[dict] = mapped_column(JSON, default=dict)
+    # Asset and control dimensions as of the evaluation, so results are
+    # filtered and summarised without joining assets and controls.
+    asset_type: Mapped[str | None] = mapped_column(String)
+    cloud: Mapped[str | None] = mapped_column(String)
+    region: Mapped[str | None] = mapped_column(String)
+    env: Mapped[str | None] = mapped_column(String)
+    category: Mapped[str | None] = mapped_column(String)
+
+    # Keyset pagination of a run's results: (run_id, id) for
+    # ``/evaluate/results`` and (run_id, sort column, id) for each
+    # ``/results`` sort key.
+    __table_args__ = (
+        Index("ix_results_run_id_id", "run_id", "id"),
+        Index("ix_results_run_evaluated_at_id", "run_id", "evaluated_at", "id"),
+        Index("ix_results_run_severity_id", "run_id", "severity", "id"),
+        Index("ix_results_run_status_id", "run_id", "status", "id"),
+        Index("ix_results_run_control_id_id", "run_id", "control_id", "id"),
+        Index("ix_results_run_asset_id_id", "run_id", "asset_id", "id"),
+        Index("ix_results_run_status_severity", "run_id", "status", "severity"),
+        Index("ix_results_run_cloud_asset_type", "run_id", "cloud", "asset_type"),
+        Index("ix_results_run_env", "run_id", "env"),
+        Index("ix_results_run_category", "run_id", "category"),
+    )
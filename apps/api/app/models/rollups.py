@@ -0,0 +1,29 @@
+from sqlalchemy import Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .db import Base
+
+
+class ResultRollup(Base):
+    """Result count of a run for one combination of summary dimensions.
+
+    Rows with ``framework == ""`` count each result once; the others count
+    the occurrences of that framework in the results' framework lists.
+    """
+
+    __tablename__ = "evaluation_result_rollups"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    run_id: Mapped[str] = mapped_column(String)
+    framework: Mapped[str] = mapped_column(String, default="")
+    status: Mapped[str] = mapped_column(String)
+    severity: Mapped[str] = mapped_column(String)
+    cloud: Mapped[str | None] = mapped_column(String)
+    type: Mapped[str | None] = mapped_column(String)
+    env: Mapped[str | None] = mapped_column(String)
+    category: Mapped[str | None] = mapped_column(String)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+    __table_args__ = (
+        Index("ix_evaluation_result_rollups_run_framework", "run_id", "framework"),
+    )
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, Integer, DateTime, Text
+from sqlalchemy import JSON, String, Integer, DateTime, Text
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql import func
 
@@ -17,5 +17,13 @@ class EvaluationRun(Base):
     controls_count: Mapped[int] = mapped_column(Integer, default=0)
     assets_count: Mapped[int] = mapped_column(Integer, default=0)
     results_count: Mapped[int] = mapped_column(Integer, default=0)
+    reused_count: Mapped[int] = mapped_column(Integer, default=0)
+    recomputed_count: Mapped[int] = mapped_column(Integer, default=0)
     status: Mapped[str] = mapped_column(String, default="running")
     error: Mapped[str | None] = mapped_column(Text)
+    # phase name -> seconds, see app.services.timings.PHASES
+    timings: Mapped[dict | None] = mapped_column(JSON)
+    # app.services.shared_expressions.SharedExpressions.stats()
+    shared_stats: Mapped[dict | None] = mapped_column(JSON)
+    # set once app.services.run_stats has written the run's rollups
+    rolled_up_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
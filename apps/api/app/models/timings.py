@@ -0,0 +1,20 @@
+from sqlalchemy import Float, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .db import Base
+
+
+class ControlTiming(Base):
+    """Time spent evaluating one control's logic during a run."""
+
+    __tablename__ = "evaluation_control_timings"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    run_id: Mapped[str] = mapped_column(String)
+    control_id: Mapped[str] = mapped_column(String)
+    seconds: Mapped[float] = mapped_column(Float)
+    assets_count: Mapped[int] = mapped_column(Integer, default=0)
+
+    __table_args__ = (
+        Index("ix_evaluation_control_timings_run_seconds", "run_id", "seconds"),
+    )
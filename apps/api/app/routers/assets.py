@@ -6,7 +6,6 @@ from sqlalchemy.orm import Session
 
 from app.dependencies import get_db
 from app.models import assets as asset_m
-from app.models import controls as control_m
 from app.models import results as result_m
 from app.models import runs as run_m
 from app.ingest.parsers import get_parser
@@ -101,36 +100,29 @@ def get_asset(
     if run_id is None:
         results: list[dict] = []
     else:
-        query = (
-            db.query(result_m.Result, control_m.Control)
-            .join(
-                control_m.Control,
-                control_m.Control.control_id == result_m.Result.control_id,
-            )
-            .filter(
-                result_m.Result.asset_id == asset_id,
-                result_m.Result.run_id == run_id,
-            )
+        query = db.query(result_m.Result).filter(
+            result_m.Result.asset_id == asset_id,
+            result_m.Result.run_id == run_id,
         )
         results = [
             {
                 "control_id": r.control_id,
                 "control_title": r.control_title,
-                "category": c.category,
+                "category": r.category,
                 "severity": r.severity,
                 "frameworks": list(r.frameworks or []),
                 "asset_id": r.asset_id,
-                "type": asset.type,
-                "cloud": asset.cloud,
-                "region": asset.region,
-                "env": (asset.tags or {}).get("env"),
+                "type": r.asset_type,
+                "cloud": r.cloud,
+                "region": r.region,
+                "env": r.env,
                 "status": r.status,
                 "evidence": r.evidence,
                 "fix": r.fix,
                 "evaluated_at": r.evaluated_at,
                 "run_id": r.run_id,
             }
-            for r, c in query.all()
+            for r in query.all()
         ]
     asset_data = {
         "asset_id": asset.asset_id,
@@ -2,20 +2,22 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.dependencies import get_db
-from app.jobs.evaluation import enqueue
+from app.jobs.evaluation import cancel_job, enqueue, get_job, list_jobs
 from app.services.audit import record
 from app.core.license import license_required
-from app.models import assets as asset_m
-from app.models import controls as control_m
+from app.models import operand_orders as order_m
 from app.models import results as result_m
 from app.models import runs as run_m
+from app.services.pagination import decode_cursor, encode_cursor
 
 router = APIRouter(prefix="/evaluate", tags=["evaluate"])
 
@@ -25,8 +27,11 @@ def run_evaluation(
     controls: Optional[List[str]] = None,
     assets: Optional[List[str]] = None,
     dry_run: bool = False,
+    incremental: Optional[bool] = None,
 ):
-    result = enqueue(controls=controls, assets=assets, dry_run=dry_run)
+    result = enqueue(
+        controls=controls, assets=assets, dry_run=dry_run, incremental=incremental
+    )
     record(
         "EVALUATE_RUN",
         resource=result.get("run_id"),
@@ -35,8 +40,31 @@ def run_evaluation(
     return result
 
 
+@router.get("/jobs")
+def list_evaluation_jobs(limit: int = Query(50, ge=1, le=500)):
+    return list_jobs(limit)
+
+
+@router.get("/jobs/{job_id}")
+def get_evaluation_job(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_evaluation_job(job_id: str):
+    job = cancel_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    record("EVALUATE_CANCEL", resource=job_id, details={"status": job["status"]})
+    return job
+
+
 @router.get("/results")
 def list_results(
+    response: Response,
     status: str | None = Query(None),
     severity: str | None = Query(None),
     env: str | None = Query(None),
@@ -48,9 +76,46 @@ def list_results(
     run_id: str | None = Query(None),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None),
     db: Session = Depends(get_db),
 ):
+    """Results in id order.
+
+    The ``X-Next-Cursor`` and ``X-Prev-Cursor`` headers hold the ``cursor``
+    for the neighbouring pages, when there are any.  A cursor only works with
+    the filters it was issued for, and ``offset`` is ignored when one is
+    given.
+    """
+
+    filters = {
+        "status": status,
+        "severity": severity,
+        "env": env,
+        "cloud": cloud,
+        "category": category,
+        "framework": framework,
+        "control_id": control_id,
+        "type": type,
+        "run_id": run_id,
+    }
+    signature = hashlib.sha1(
+        json.dumps(filters, sort_keys=True).encode()
+    ).hexdigest()[:16]
     query = db.query(result_m.Result)
+    backward = False
+    if cursor is not None:
+        try:
+            key = decode_cursor(cursor)
+            if key.get("f") != signature:
+                raise ValueError("Cursor does not match this query")
+            backward = bool(key.get("b"))
+            last_id = int(key["id"])
+        except (ValueError, KeyError, TypeError) as exc:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+        query = query.filter(
+            result_m.Result.id < last_id if backward else result_m.Result.id > last_id
+        )
+        offset = 0
     if status:
         query = query.filter(result_m.Result.status == status)
     if severity:
@@ -61,22 +126,29 @@ def list_results(
         query = query.filter(result_m.Result.frameworks.contains([framework]))
     if run_id:
         query = query.filter(result_m.Result.run_id == run_id)
-    if env or cloud or type or category:
-        query = query.join(asset_m.Asset, result_m.Result.asset_id == asset_m.Asset.asset_id)
     if env:
-        query = query.filter(asset_m.Asset.tags["env"].astext == env)
+        query = query.filter(result_m.Result.env == env)
     if cloud:
-        query = query.filter(asset_m.Asset.cloud == cloud)
+        query = query.filter(result_m.Result.cloud == cloud)
     if type:
-        query = query.filter(asset_m.Asset.type == type)
+        query = query.filter(result_m.Result.asset_type == type)
     if category:
-        query = query.join(
-            control_m.Control,
-            result_m.Result.control_id == control_m.Control.control_id,
-        ).filter(control_m.Control.category == category)
-    rows = (
-        query.order_by(result_m.Result.id).offset(offset).limit(limit).all()
-    )
+        query = query.filter(result_m.Result.category == category)
+    order = result_m.Result.id.desc() if backward else result_m.Result.id
+    rows = query.order_by(order).offset(offset).limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    if rows:
+        if more or backward:
+            response.headers["X-Next-Cursor"] = encode_cursor(
+                {"f": signature, "id": rows[-1].id}
+            )
+        if more if backward else (cursor is not None or offset > 0):
+            response.headers["X-Prev-Cursor"] = encode_cursor(
+                {"f": signature, "id": rows[0].id, "b": 1}
+            )
     return [
         {
             "control_id": r.control_id,
@@ -105,10 +177,43 @@ def list_runs(db: Session = Depends(get_db)):
             "controls_count": r.controls_count,
             "assets_count": r.assets_count,
             "results_count": r.results_count,
+            "reused_count": r.reused_count,
+            "recomputed_count": r.recomputed_count,
             "status": r.status,
+            "timings": r.timings,
+            "shared_stats": r.shared_stats,
         }
         for r in runs
     ]
 
 
+@router.get("/operand-orders")
+def list_operand_orders(
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """and/or nodes profiled with ``EVALUATION_REORDER`` and the operand
+    order later runs evaluate them in."""
+
+    rows = db.scalars(
+        select(order_m.OperandOrder)
+        .order_by(order_m.OperandOrder.updated_at.desc())
+        .limit(limit)
+    ).all()
+    return [
+        {
+            "node_hash": r.node_hash,
+            "op": r.op,
+            "logic": r.logic,
+            "order": r.order,
+            "reordered": r.order != sorted(r.order),
+            "samples": r.samples,
+            "mean_seconds": [s / r.samples for s in r.seconds] if r.samples else r.seconds,
+            "stop_rates": [s / r.samples for s in r.stops] if r.samples else r.stops,
+            "updated_at": r.updated_at,
+        }
+        for r in rows
+    ]
+
+
 __all__ = ["router"]
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from app.dependencies import get_db
 from app.models import runs as run_m
+from app.models import timings as timing_m
 
 router = APIRouter(prefix="/evaluate/runs", tags=["evaluate"])
 
@@ -20,5 +21,67 @@ def get_latest_run(db: Session = Depends(get_db)):
         "controls_count": r.controls_count,
         "assets_count": r.assets_count,
         "results_count": r.results_count,
+        "reused_count": r.reused_count,
+        "recomputed_count": r.recomputed_count,
         "status": r.status,
+        "timings": r.timings,
+        "shared_stats": r.shared_stats,
     }
+
+
+@router.get("/{run_id}")
+def get_run(run_id: str, db: Session = Depends(get_db)):
+    r = db.get(run_m.EvaluationRun, run_id)
+    if not r:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {
+        "run_id": r.run_id,
+        "started_at": r.started_at,
+        "finished_at": r.finished_at,
+        "controls_count": r.controls_count,
+        "assets_count": r.assets_count,
+        "results_count": r.results_count,
+        "reused_count": r.reused_count,
+        "recomputed_count": r.recomputed_count,
+        "status": r.status,
+        "error": r.error,
+        "timings": r.timings,
+        "shared_stats": r.shared_stats,
+    }
+
+
+@router.get("/{run_id}/slowest-controls")
+def get_slowest_controls(
+    run_id: str,
+    limit: int = Query(10, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    """Return the controls whose logic took longest to evaluate in a run.
+
+    ``run_id`` may be ``latest`` for the most recent completed run.
+    """
+    if run_id == "latest":
+        run_id = db.execute(
+            select(run_m.EvaluationRun.run_id)
+            .where(run_m.EvaluationRun.status == "completed")
+            .order_by(run_m.EvaluationRun.started_at.desc())
+        ).scalars().first()
+    if not run_id or db.get(run_m.EvaluationRun, run_id) is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    rows = db.execute(
+        select(timing_m.ControlTiming)
+        .where(timing_m.ControlTiming.run_id == run_id)
+        .order_by(timing_m.ControlTiming.seconds.desc())
+        .limit(limit)
+    ).scalars().all()
+    return [
+        {
+            "control_id": t.control_id,
+            "seconds": t.seconds,
+            "assets_count": t.assets_count,
+            "ms_per_asset": (
+                round(t.seconds * 1000 / t.assets_count, 6) if t.assets_count else None
+            ),
+        }
+        for t in rows
+    ]
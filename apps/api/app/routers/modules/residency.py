@@ -11,6 +11,7 @@ from sqlalchemy.orm import Session
 from app.dependencies import get_db
 from app.models import assets as asset_m
 from app.models import results as result_m
+from app.services.evaluator import _asset_env
 
 router = APIRouter(prefix="/modules/residency", tags=["modules"])
 
@@ -47,6 +48,11 @@ def check_residency(db: Session = Depends(get_db)) -> dict:
             evidence={"asset_region": a.region, "allowed": allowed},
             fix={},
             run_id="residency",
+            asset_type=a.type,
+            cloud=a.cloud,
+            region=a.region,
+            env=_asset_env(a),
+            category="residency",
         )
         results.append(res)
     db.bulk_save_objects(results)
@@ -1,95 +1,23 @@
-
-from __future__ import annotations
-
 """Results endpoints."""
 
-from fastapi.responses import JSONResponse
-from app.dependencies import get_db
-from fastapi import APIRouter, Depends, Query
-router = APIRouter(prefix="/results", tags=["results"])
-
-@router.get("/export.json")
-def export_results_json(
-    *,
-    status: ResultStatus | None = Query(None),
-    severity: Severity | None = Query(None),
-    env: str | None = Query(None),
-    cloud: CloudEnum | None = Query(None),
-    category: str | None = Query(None),
-    framework: str | None = Query(None),
-    control_id: str | None = Query(None),
-    type: str | None = Query(None, alias="type"),
-    asset_id: str | None = Query(None),
-    run_id: str | None = Query(None),
-    evaluated_from: datetime | None = Query(None),
-    evaluated_to: datetime | None = Query(None),
-    db: Session = Depends(get_db),
-) -> JSONResponse:
-    query, actual_run_id = _build_query(
-        db,
-        run_id=run_id,
-        status=status,
-        severity=severity,
-        env=env,
-        cloud=cloud,
-        category=category,
-        framework=framework,
-        control_id=control_id,
-        type_=type,
-        asset_id=asset_id,
-        evaluated_from=evaluated_from,
-        evaluated_to=evaluated_to,
-    )
-    results = []
-    controls_meta = {}
-    for r, a, c in query.all():
-        results.append({
-            "run_id": r.run_id,
-            "evaluated_at": r.evaluated_at.isoformat(),
-            "status": r.status,
-            "severity": r.severity,
-            "category": c.category,
-            "framework_ids": r.frameworks,
-            "control_id": r.control_id,
-            "control_title": r.control_title,
-            "asset_id": r.asset_id,
-            "asset_type": a.type,
-            "cloud": a.cloud,
-            "region": a.region,
-            "env": (a.tags or {}).get("env"),
-            "evidence_source": (r.evidence or {}).get("source"),
-            "evidence_pointer": (r.evidence or {}).get("pointer"),
-            "fix": (r.fix or {}).get("short"),
-        })
-        if c.control_id not in controls_meta:
-            controls_meta[c.control_id] = {
-                "control_id": c.control_id,
-                "title": c.title,
-                "category": c.category,
-                "severity": c.severity,
-            }
-    bundle = {
-        "run_id": actual_run_id or "",
-        "results": results,
-        "controls": list(controls_meta.values()),
-    }
-
+from __future__ import annotations
 
+from collections import Counter
 from datetime import datetime
 from enum import Enum
 from typing import Any, Dict, Iterable, List
 
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy import asc, desc
 from sqlalchemy.orm import Session
 
 from app.dependencies import get_db
-from app.models import assets as asset_m
-from app.models import controls as control_m
 from app.models import results as result_m
 from app.models import runs as run_m
+from app.services import columnar_export, result_export, run_stats
+from app.services.pagination import after, cursor_value, decode_cursor, encode_cursor
 
 
 class ResultStatus(str, Enum):
@@ -148,11 +76,21 @@ class ResultsPage(BaseModel):
     items: List[ResultItem]
     page: int
     page_size: int
-    total_items: int
-    total_pages: int
+    total_items: int | None = None
+    total_pages: int | None = None
     run_id: str
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
 
 
+_SORT_COLUMNS = {
+    SortBy.evaluated_at: result_m.Result.evaluated_at,
+    SortBy.severity: result_m.Result.severity,
+    SortBy.status: result_m.Result.status,
+    SortBy.control_id: result_m.Result.control_id,
+    SortBy.asset_id: result_m.Result.asset_id,
+}
+
 router = APIRouter(prefix="/results", tags=["results"])
 
 
@@ -186,15 +124,15 @@ def _apply_filters(
     if asset_id:
         query = query.filter(result_m.Result.asset_id == asset_id)
     if category:
-        query = query.filter(control_m.Control.category == category)
+        query = query.filter(result_m.Result.category == category)
     if framework:
         query = query.filter(result_m.Result.frameworks.contains([framework]))
     if cloud:
-        query = query.filter(asset_m.Asset.cloud == cloud)
+        query = query.filter(result_m.Result.cloud == cloud)
     if type_:
-        query = query.filter(asset_m.Asset.type == type_)
+        query = query.filter(result_m.Result.asset_type == type_)
     if env:
-        query = query.filter(asset_m.Asset.tags["env"].as_string() == env)
+        query = query.filter(result_m.Result.env == env)
     if evaluated_from:
         query = query.filter(result_m.Result.evaluated_at >= evaluated_from)
     if evaluated_to:
@@ -222,17 +160,8 @@ def _build_query(
         run_id = _latest_run_id(db)
     if run_id is None:
         return db.query(result_m.Result).filter(False), None
-    query = (
-        db.query(result_m.Result, asset_m.Asset, control_m.Control)
-        .join(asset_m.Asset, asset_m.Asset.asset_id == result_m.Result.asset_id)
-        .join(
-            control_m.Control,
-            control_m.Control.control_id == result_m.Result.control_id,
-        )
-        .filter(result_m.Result.run_id == run_id)
-    )
     query = _apply_filters(
-        query,
+        run_stats.run_rows(db, run_id),
         status=status,
         severity=severity,
         env=env,
@@ -248,18 +177,46 @@ def _build_query(
     return query, run_id
 
 
-def _serialize(res: result_m.Result, asset: asset_m.Asset, control: control_m.Control) -> ResultItem:
+def _rollup_filters(
+    db: Session,
+    run_id: str,
+    *,
+    framework: str | None,
+    control_id: str | None,
+    asset_id: str | None,
+    evaluated_from: datetime | None,
+    evaluated_to: datetime | None,
+    **dims: Enum | str | None,
+) -> Dict[str, str] | None:
+    """Rollup filters equivalent to the query filters, if the run has rollups.
+
+    ``None`` when a filter is not a rollup dimension, so the live rows must be
+    counted instead.
+    """
+
+    if framework or control_id or asset_id or evaluated_from or evaluated_to:
+        return None
+    if not run_stats.rolled_up(db, run_id):
+        return None
+    return {
+        dim: value.value if isinstance(value, Enum) else value
+        for dim, value in dims.items()
+        if value
+    }
+
+
+def _serialize(res: result_m.Result) -> ResultItem:
     return ResultItem(
         control_id=res.control_id,
         control_title=res.control_title,
-        category=control.category,
+        category=res.category,
         severity=res.severity,
         frameworks=list(res.frameworks or []),
         asset_id=res.asset_id,
-        type=asset.type,
-        cloud=asset.cloud,
-        region=asset.region,
-        env=(asset.tags or {}).get("env"),
+        type=res.asset_type,
+        cloud=res.cloud,
+        region=res.region,
+        env=res.env,
         status=res.status,
         evidence=res.evidence,
         fix=res.fix,
@@ -287,8 +244,18 @@ def list_results(
     page_size: int = Query(50, ge=1, le=1000),
     sort_by: SortBy = Query(SortBy.evaluated_at),
     sort_dir: SortDir = Query(SortDir.desc),
+    cursor: str | None = Query(None),
+    include_total: bool | None = Query(None),
     db: Session = Depends(get_db),
 ) -> ResultsPage:
+    """List results a page at a time.
+
+    Pass ``next_cursor``/``prev_cursor`` from a previous page as ``cursor``
+    to page by key instead of ``page`` (which uses ``OFFSET``).  The total
+    is counted unless ``include_total`` is false; with a cursor it is only
+    counted when ``include_total`` is true.
+    """
+
     query, actual_run_id = _build_query(
         db,
         run_id=run_id,
@@ -304,36 +271,149 @@ def list_results(
         evaluated_from=evaluated_from,
         evaluated_to=evaluated_to,
     )
+    if include_total is None:
+        include_total = cursor is None
     if actual_run_id is None:
         return ResultsPage(
             items=[],
             page=page,
             page_size=page_size,
-            total_items=0,
-            total_pages=0,
+            total_items=0 if include_total else None,
+            total_pages=0 if include_total else None,
             run_id="",
         )
-    sort_column_map = {
-        SortBy.evaluated_at: result_m.Result.evaluated_at,
-        SortBy.severity: result_m.Result.severity,
-        SortBy.status: result_m.Result.status,
-        SortBy.control_id: result_m.Result.control_id,
-        SortBy.asset_id: result_m.Result.asset_id,
-    }
-    sort_col = sort_column_map.get(sort_by, result_m.Result.evaluated_at)
-    order = desc(sort_col) if sort_dir == SortDir.desc else asc(sort_col)
-    query = query.order_by(order)
-    total_items = query.count()
-    query = query.offset((page - 1) * page_size).limit(page_size)
-    items = [_serialize(r, a, c) for r, a, c in query.all()]
-    total_pages = (total_items + page_size - 1) // page_size
+    sort_col = _SORT_COLUMNS[sort_by]
+    descending = sort_dir == SortDir.desc
+    backward = False
+    total_items = None
+    if include_total:
+        rollup = _rollup_filters(
+            db,
+            actual_run_id,
+            status=status,
+            severity=severity,
+            env=env,
+            cloud=cloud,
+            category=category,
+            type=type,
+            framework=framework,
+            control_id=control_id,
+            asset_id=asset_id,
+            evaluated_from=evaluated_from,
+            evaluated_to=evaluated_to,
+        )
+        if rollup is None:
+            total_items = query.count()
+        else:
+            counts = run_stats.rollup_counts(db, actual_run_id, rollup)
+            total_items = sum(n for key, n in counts.items() if not key[0])
+    if cursor is not None:
+        try:
+            key = decode_cursor(cursor)
+            if (key.get("s"), key.get("d"), key.get("r")) != (
+                sort_by.value,
+                sort_dir.value,
+                actual_run_id,
+            ):
+                raise ValueError("Cursor does not match this query")
+            backward = bool(key.get("b"))
+            query = query.filter(
+                after(
+                    sort_col,
+                    result_m.Result.id,
+                    cursor_value(key["v"]),
+                    int(key["id"]),
+                    descending != backward,
+                )
+            )
+        except (ValueError, KeyError, TypeError) as exc:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+    direction = desc if descending != backward else asc
+    query = query.order_by(direction(sort_col), direction(result_m.Result.id))
+    if cursor is None and page > 1:
+        query = query.offset((page - 1) * page_size)
+    rows = query.limit(page_size + 1).all()
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backward:
+        rows.reverse()
+
+    def token(res: result_m.Result, back: bool) -> str:
+        key = {
+            "s": sort_by.value,
+            "d": sort_dir.value,
+            "r": actual_run_id,
+            "v": getattr(res, sort_col.key),
+            "id": res.id,
+        }
+        if back:
+            key["b"] = 1
+        return encode_cursor(key)
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if more or backward:
+            next_cursor = token(rows[-1], False)
+        has_prev = more if backward else (cursor is not None or page > 1)
+        if has_prev:
+            prev_cursor = token(rows[0], True)
+    items = [_serialize(r) for r in rows]
     return ResultsPage(
         items=items,
         page=page,
         page_size=page_size,
         total_items=total_items,
-        total_pages=total_pages,
+        total_pages=(
+            (total_items + page_size - 1) // page_size
+            if total_items is not None
+            else None
+        ),
         run_id=actual_run_id,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+    )
+
+
+def _export_rows(
+    db: Session,
+    query,  # type: ignore
+    run_id: str | None,
+    sort_by: SortBy,
+    sort_dir: SortDir,
+) -> Iterable[Any]:
+    if run_id is None:
+        return []
+    sort_col = _SORT_COLUMNS[sort_by]
+    direction = desc if sort_dir == SortDir.desc else asc
+    query = query.order_by(direction(sort_col), direction(result_m.Result.id))
+    return result_export.chunks(db, query)
+
+
+def _attachment(run_id: str | None, fmt: str) -> Dict[str, str]:
+    filename = f"raybeam_results_{run_id or 'latest'}.{fmt}"
+    return {"Content-Disposition": f"attachment; filename=\"{filename}\""}
+
+
+def _export(
+    db: Session,
+    query,  # type: ignore
+    run_id: str | None,
+    fmt: str,
+    sort_by: SortBy,
+    sort_dir: SortDir,
+    accept_encoding: str | None,
+) -> StreamingResponse:
+    """Stream *query* in *fmt*, gzipped if the client accepts it."""
+
+    body = result_export.encode(
+        fmt, _export_rows(db, query, run_id, sort_by, sort_dir), run_id or ""
+    )
+    headers = {**_attachment(run_id, fmt), "Vary": "Accept-Encoding"}
+    if result_export.accepts_gzip(accept_encoding):
+        body = result_export.gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        body, media_type=result_export.MEDIA_TYPES[fmt], headers=headers
     )
 
 
@@ -354,6 +434,7 @@ def export_results(
     evaluated_to: datetime | None = Query(None),
     sort_by: SortBy = Query(SortBy.evaluated_at),
     sort_dir: SortDir = Query(SortDir.desc),
+    accept_encoding: str | None = Header(None),
     db: Session = Depends(get_db),
 ) -> StreamingResponse:
     query, actual_run_id = _build_query(
@@ -371,79 +452,210 @@ def export_results(
         evaluated_from=evaluated_from,
         evaluated_to=evaluated_to,
     )
-    if actual_run_id is None:
-        actual_run_id = ""
-    sort_column_map = {
-        SortBy.evaluated_at: result_m.Result.evaluated_at,
-        SortBy.severity: result_m.Result.severity,
-        SortBy.status: result_m.Result.status,
-        SortBy.control_id: result_m.Result.control_id,
-        SortBy.asset_id: result_m.Result.asset_id,
-    }
-    sort_col = sort_column_map.get(sort_by, result_m.Result.evaluated_at)
-    order = desc(sort_col) if sort_dir == SortDir.desc else asc(sort_col)
-    query = query.order_by(order)
-
-    headers = [
-        "run_id",
-        "evaluated_at",
-        "status",
-        "severity",
-        "category",
-        "framework_ids",
-        "control_id",
-        "control_title",
-        "asset_id",
-        "asset_type",
-        "cloud",
-        "region",
-        "env",
-        "evidence_source",
-        "evidence_pointer",
-        "fix",
-    ]
-
-    def row_iter() -> Iterable[str]:
-        import csv
-        import io
-
-        buf = io.StringIO()
-        writer = csv.writer(buf)
-        writer.writerow(headers)
-        yield buf.getvalue()
-        buf.seek(0)
-        buf.truncate(0)
-        for r, a, c in query.yield_per(100):
-            row = [
-                r.run_id,
-                r.evaluated_at.isoformat(),
-                r.status,
-                r.severity,
-                c.category,
-                "|".join(r.frameworks or []),
-                r.control_id,
-                r.control_title,
-                r.asset_id,
-                a.type,
-                a.cloud,
-                a.region,
-                (a.tags or {}).get("env"),
-                (r.evidence or {}).get("source"),
-                (r.evidence or {}).get("pointer"),
-                (r.fix or {}).get("short"),
-            ]
-            writer.writerow(row)
-            yield buf.getvalue()
-            buf.seek(0)
-            buf.truncate(0)
-
-    filename = f"raybeam_results_{actual_run_id or 'latest'}.csv"
-    return StreamingResponse(
-        row_iter(),
-        media_type="text/csv; charset=utf-8",
-        headers={
-            "Content-Disposition": f"attachment; filename=\"{filename}\"",
-        },
+    return _export(
+        db, query, actual_run_id, "csv", sort_by, sort_dir, accept_encoding
+    )
+
+
+@router.get("/export.json")
+def export_results_json(
+    *,
+    status: ResultStatus | None = Query(None),
+    severity: Severity | None = Query(None),
+    env: str | None = Query(None),
+    cloud: CloudEnum | None = Query(None),
+    category: str | None = Query(None),
+    framework: str | None = Query(None),
+    control_id: str | None = Query(None),
+    type: str | None = Query(None, alias="type"),
+    asset_id: str | None = Query(None),
+    run_id: str | None = Query(None),
+    evaluated_from: datetime | None = Query(None),
+    evaluated_to: datetime | None = Query(None),
+    sort_by: SortBy = Query(SortBy.evaluated_at),
+    sort_dir: SortDir = Query(SortDir.desc),
+    accept_encoding: str | None = Header(None),
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    query, actual_run_id = _build_query(
+        db,
+        run_id=run_id,
+        status=status,
+        severity=severity,
+        env=env,
+        cloud=cloud,
+        category=category,
+        framework=framework,
+        control_id=control_id,
+        type_=type,
+        asset_id=asset_id,
+        evaluated_from=evaluated_from,
+        evaluated_to=evaluated_to,
+    )
+    return _export(
+        db, query, actual_run_id, "json", sort_by, sort_dir, accept_encoding
+    )
+
+
+@router.get("/export.ndjson")
+def export_results_ndjson(
+    *,
+    status: ResultStatus | None = Query(None),
+    severity: Severity | None = Query(None),
+    env: str | None = Query(None),
+    cloud: CloudEnum | None = Query(None),
+    category: str | None = Query(None),
+    framework: str | None = Query(None),
+    control_id: str | None = Query(None),
+    type: str | None = Query(None, alias="type"),
+    asset_id: str | None = Query(None),
+    run_id: str | None = Query(None),
+    evaluated_from: datetime | None = Query(None),
+    evaluated_to: datetime | None = Query(None),
+    sort_by: SortBy = Query(SortBy.evaluated_at),
+    sort_dir: SortDir = Query(SortDir.desc),
+    accept_encoding: str | None = Header(None),
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    query, actual_run_id = _build_query(
+        db,
+        run_id=run_id,
+        status=status,
+        severity=severity,
+        env=env,
+        cloud=cloud,
+        category=category,
+        framework=framework,
+        control_id=control_id,
+        type_=type,
+        asset_id=asset_id,
+        evaluated_from=evaluated_from,
+        evaluated_to=evaluated_to,
+    )
+    return _export(
+        db, query, actual_run_id, "ndjson", sort_by, sort_dir, accept_encoding
+    )
+
+
+def _export_columnar(
+    db: Session,
+    query,  # type: ignore
+    run_id: str | None,
+    fmt: str,
+    sort_by: SortBy,
+    sort_dir: SortDir,
+    whole_run: bool,
+) -> Response:
+    """Stream *query* as Parquet or Arrow; *whole_run* exports may be cached."""
+
+    if not columnar_export.available:
+        raise HTTPException(
+            status_code=501, detail="Parquet and Arrow exports require pyarrow"
+        )
+    media_type = columnar_export.MEDIA_TYPES[fmt]
+    headers = _attachment(run_id, fmt)
+    path = None
+    if run_id is not None and whole_run:
+        run = db.get(run_m.EvaluationRun, run_id)
+        if run is not None and run.status == "completed":
+            path = columnar_export.cache_path(run_id, fmt)
+    if path is not None and path.exists():
+        return FileResponse(path, media_type=media_type, headers=headers)
+    body = columnar_export.encode(
+        fmt, _export_rows(db, query, run_id, sort_by, sort_dir)
+    )
+    if path is not None:
+        body = columnar_export.tee(body, path)
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
+@router.get("/export.parquet")
+def export_results_parquet(
+    *,
+    status: ResultStatus | None = Query(None),
+    severity: Severity | None = Query(None),
+    env: str | None = Query(None),
+    cloud: CloudEnum | None = Query(None),
+    category: str | None = Query(None),
+    framework: str | None = Query(None),
+    control_id: str | None = Query(None),
+    type: str | None = Query(None, alias="type"),
+    asset_id: str | None = Query(None),
+    run_id: str | None = Query(None),
+    evaluated_from: datetime | None = Query(None),
+    evaluated_to: datetime | None = Query(None),
+    sort_by: SortBy = Query(SortBy.evaluated_at),
+    sort_dir: SortDir = Query(SortDir.desc),
+    db: Session = Depends(get_db),
+) -> Response:
+    query, actual_run_id = _build_query(
+        db,
+        run_id=run_id,
+        status=status,
+        severity=severity,
+        env=env,
+        cloud=cloud,
+        category=category,
+        framework=framework,
+        control_id=control_id,
+        type_=type,
+        asset_id=asset_id,
+        evaluated_from=evaluated_from,
+        evaluated_to=evaluated_to,
+    )
+    filters = (status, severity, env, cloud, category, framework, control_id)
+    filters += (type, asset_id, evaluated_from, evaluated_to)
+    whole_run = not any(filters) and (sort_by, sort_dir) == (
+        SortBy.evaluated_at,
+        SortDir.desc,
+    )
+    return _export_columnar(
+        db, query, actual_run_id, "parquet", sort_by, sort_dir, whole_run
+    )
+
+
+@router.get("/export.arrow")
+def export_results_arrow(
+    *,
+    status: ResultStatus | None = Query(None),
+    severity: Severity | None = Query(None),
+    env: str | None = Query(None),
+    cloud: CloudEnum | None = Query(None),
+    category: str | None = Query(None),
+    framework: str | None = Query(None),
+    control_id: str | None = Query(None),
+    type: str | None = Query(None, alias="type"),
+    asset_id: str | None = Query(None),
+    run_id: str | None = Query(None),
+    evaluated_from: datetime | None = Query(None),
+    evaluated_to: datetime | None = Query(None),
+    sort_by: SortBy = Query(SortBy.evaluated_at),
+    sort_dir: SortDir = Query(SortDir.desc),
+    db: Session = Depends(get_db),
+) -> Response:
+    query, actual_run_id = _build_query(
+        db,
+        run_id=run_id,
+        status=status,
+        severity=severity,
+        env=env,
+        cloud=cloud,
+        category=category,
+        framework=framework,
+        control_id=control_id,
+        type_=type,
+        asset_id=asset_id,
+        evaluated_from=evaluated_from,
+        evaluated_to=evaluated_to,
+    )
+    filters = (status, severity, env, cloud, category, framework, control_id)
+    filters += (type, asset_id, evaluated_from, evaluated_to)
+    whole_run = not any(filters) and (sort_by, sort_dir) == (
+        SortBy.evaluated_at,
+        SortDir.desc,
+    )
+    return _export_columnar(
+        db, query, actual_run_id, "arrow", sort_by, sort_dir, whole_run
     )
 
 
@@ -479,17 +691,32 @@ def summary_results(
         evaluated_from=evaluated_from,
         evaluated_to=evaluated_to,
     )
-    by_status: Dict[str, int] = {s.value: 0 for s in ResultStatus}
-    by_severity: Dict[str, int] = {s.value: 0 for s in Severity}
-    by_framework: Dict[str, int] = {}
-    for r, a, c in query.all():
-        by_status[r.status] = by_status.get(r.status, 0) + 1
-        by_severity[r.severity] = by_severity.get(r.severity, 0) + 1
-        for fw in r.frameworks or []:
-            by_framework[fw] = by_framework.get(fw, 0) + 1
+    counts: Counter = Counter()
+    if actual_run_id is not None:
+        rollup = _rollup_filters(
+            db,
+            actual_run_id,
+            status=status,
+            severity=severity,
+            env=env,
+            cloud=cloud,
+            category=category,
+            type=type,
+            framework=framework,
+            control_id=control_id,
+            asset_id=asset_id,
+            evaluated_from=evaluated_from,
+            evaluated_to=evaluated_to,
+        )
+        if rollup is None:
+            counts = run_stats.grouped_counts(query)
+        else:
+            counts = run_stats.rollup_counts(db, actual_run_id, rollup)
     return {
-        "by_status": by_status,
-        "by_severity": by_severity,
-        "by_framework": by_framework,
+        **run_stats.summarize(
+            counts,
+            [s.value for s in ResultStatus],
+            [s.value for s in Severity],
+        ),
         "run_id": actual_run_id or "",
     }
@@ -2,22 +2,28 @@
 from __future__ import annotations
 """Rules endpoints for rule-pack management."""
 
-import io
-import tarfile
-import tempfile
+import hashlib
+import os
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional
 
 import yaml
 from fastapi import APIRouter, File, HTTPException, UploadFile, Depends, Query
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
 from ..dependencies import get_db
-from ..models import controls as control_m, meta as meta_m
+from ..models import meta as meta_m
+from ..models import db as models_db
 from packages.rules.engine import ControlTemplate, RuleEngine
 from packages.rules.frameworks import Framework
-from packages.shared.crypto import verify_signature
+from packages.rules.operators import OPERATORS
+from app.services import rulepack_artifact as artifact
+from app.services import rulepack_reader as reader
 from app.services.audit import record
+from app.services.rulepack_apply import ControlDiff, apply_controls
+from app.services.rulepack_artifact import CompiledPack, requirement_index
+from app.services.simulation import simulate
 
 router = APIRouter(prefix="/rules", tags=["rules"])
 
@@ -38,28 +44,35 @@ REQUIRED_MAPPINGS = {
 }
 
 
-def _parse_pack(data: bytes) -> tuple[dict, List[dict], List[str]]:
-    """Validate *data* tarball and return (meta, controls, frameworks)."""
-    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
-        try:
-            meta_bytes = tar.extractfile("rules/meta.yaml").read()
-            sig = tar.extractfile("rules/signatures/meta.sig").read().decode().strip()
-        except Exception as exc:  # pragma: no cover - defensive
-            raise ValueError("Missing meta or signature") from exc
-        verify_signature(meta_bytes, sig)
-        meta = yaml.safe_load(meta_bytes)
-        tmpdir = tempfile.mkdtemp()
-        tar.extractall(tmpdir)
-    rule_dir = Path(tmpdir) / "rules"
-    templates_dir = rule_dir / "templates"
-    mappings_dir = rule_dir / "mappings"
-    expansions = yaml.safe_load((rule_dir / "expansions.yaml").read_text())
+def _parse_pack(data: bytes) -> CompiledPack:
+    """Validate *data* tarball and return the compiled pack."""
+    files = reader.read_pack(data)
+    try:
+        meta = reader.load_yaml(files[reader.META])
+        # Custom operators the pack's templates rely on must be registered.
+        missing = OPERATORS.missing(meta.get("operators") or [])
+        if missing:
+            raise ValueError(f"Unsupported operators: {', '.join(missing)}")
+        pack = _compile_files(files, meta)
+    except yaml.YAMLError as exc:
+        raise ValueError(f"Invalid YAML in rule pack: {exc}") from exc
+    pack.meta_yaml = files[reader.META].decode()
+    pack.meta_sig = files[reader.SIGNATURE].decode().strip()
+    pack.source_sha256 = hashlib.sha256(data).hexdigest()
+    return pack
+
+
+def _compile_files(files: Dict[str, bytes], meta: dict) -> CompiledPack:
+    if reader.EXPANSIONS not in files:
+        raise ValueError("Missing expansions.yaml")
+    expansions = reader.load_yaml(files[reader.EXPANSIONS])
     envs = expansions.get("envs", [])
     types = expansions.get("types", [])
     params = expansions.get("params", [{}])
+    names = sorted(n for n in files if n.startswith(reader.TEMPLATES))
+    workers = int(os.getenv("RULEPACK_PARSE_WORKERS", "1"))
     templates: List[ControlTemplate] = []
-    for p in templates_dir.glob("*.y*ml"):
-        t = yaml.safe_load(p.read_text())
+    for t in reader.load_many([files[n] for n in names], workers=workers):
         templates.append(
             ControlTemplate(
                 template_id=t["template_id"],
@@ -69,41 +82,70 @@ def _parse_pack(data: bytes) -> tuple[dict, List[dict], List[str]]:
             )
         )
     engine = RuleEngine(templates)
-    controls = engine.expand(envs, types, params)
-    control_ids = {c["control_id"] for c in controls}
+    controls: List[dict] = []
+    control_ids = set()
+    workers = int(os.getenv("RULEPACK_EXPAND_WORKERS", "1"))
+    for control in engine.expand_iter(envs, types, params, workers=workers):
+        controls.append(control)
+        control_ids.add(control["control_id"])
     frameworks: List[str] = []
+    mappings: Dict[str, Any] = {}
     for name in REQUIRED_MAPPINGS:
-        mp = mappings_dir / f"{name}.yaml"
-        if not mp.exists():
+        mp = f"{reader.MAPPINGS}{name}.yaml"
+        if mp not in files:
             raise ValueError(f"Missing mapping: {name}.yaml")
-        data = yaml.safe_load(mp.read_text())
+        data = reader.load_yaml(files[mp])
         for cid in data.get("mapped_controls", []):
             if cid not in control_ids:
                 raise ValueError(f"Mapping {name} references unknown control {cid}")
+        mappings[name] = data
         frameworks.append(name.upper())
-    return meta, controls, frameworks
-
-
-def _apply_pack(meta: dict, controls: List[dict], session: Session) -> None:
-    session.query(control_m.Control).delete()
-    for c in controls:
-        obj = control_m.Control(
-            control_id=c["control_id"],
-            title=c["title"],
-            category="",
-            severity="",
-            applies_to=c.get("applies_to", {}),
-            logic=c.get("logic", {}),
-            frameworks=c.get("frameworks", []),
-            fix={},
-        )
-        session.add(obj)
+    return CompiledPack(
+        meta=meta,
+        controls=controls,
+        frameworks=frameworks,
+        mappings=mappings,
+        requirements=requirement_index(mappings),
+    )
+
+
+def _load_pack(version: str) -> CompiledPack:
+    """Load *version* from its artifact, re-parsing the tarball (and
+    rewriting the artifact) when there is no valid one."""
+
+    pack = artifact.load(RULEPACK_DIR, version)
+    if pack is None:
+        pack = _parse_pack((RULEPACK_DIR / f"{version}.tar.gz").read_bytes())
+        artifact.save(pack, RULEPACK_DIR)
+    return pack
+
+
+def _apply_pack(pack: CompiledPack, session: Session) -> ControlDiff:
+    """Apply *pack*'s controls as a diff and make it the active pack."""
+
+    diff = apply_controls(session, pack.controls)
     existing = session.get(meta_m.Meta, "active_rulepack_version")
     if existing:
-        existing.value = meta["version"]
+        existing.value = pack.version
     else:
-        session.add(meta_m.Meta(key="active_rulepack_version", value=meta["version"]))
+        session.add(meta_m.Meta(key="active_rulepack_version", value=pack.version))
     session.commit()
+    return diff
+
+
+def warm_active_pack() -> int:
+    """Compile the active pack's logic from its artifact (at startup).
+
+    Returns the number of distinct expressions compiled.
+    """
+
+    session = models_db.SessionLocal()
+    try:
+        obj = session.get(meta_m.Meta, "active_rulepack_version")
+    finally:
+        session.close()
+    pack = artifact.load(RULEPACK_DIR, obj.value) if obj else None
+    return artifact.warm(pack) if pack is not None else 0
 
 
 @router.post("/upload")
@@ -114,18 +156,27 @@ async def upload_rulepack(
 ) -> dict:
     data = await file.read()
     try:
-        meta, controls, frameworks = _parse_pack(data)
+        pack = _parse_pack(data)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
-    version = meta["version"]
+    version = pack.version
     RULEPACK_DIR.mkdir(parents=True, exist_ok=True)
     (RULEPACK_DIR / f"{version}.tar.gz").write_bytes(data)
+    artifact.save(pack, RULEPACK_DIR)
+    diff = None
     if apply:
-        _apply_pack(meta, controls, db)
+        try:
+            diff = _apply_pack(pack, db)
+        except ValueError as exc:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=str(exc))
         packs = sorted(RULEPACK_DIR.glob("*.tar.gz"), key=lambda p: p.stat().st_mtime, reverse=True)
         for p in packs[3:]:
             p.unlink()
-    result = {"version": version, "control_count": len(controls), "frameworks": frameworks}
+            artifact.artifact_path(RULEPACK_DIR, p.name[: -len(".tar.gz")]).unlink(missing_ok=True)
+    result = {"version": version, "control_count": len(pack.controls), "frameworks": pack.frameworks}
+    if diff is not None:
+        result["diff"] = diff.as_dict()
     record("RULEPACK_UPLOAD", resource=version, details=result)
     return result
 
@@ -135,13 +186,21 @@ async def rollback_rulepack(version: str, db: Session = Depends(get_db)) -> dict
     path = RULEPACK_DIR / f"{version}.tar.gz"
     if not path.exists():
         raise HTTPException(status_code=404, detail="Version not found")
-    data = path.read_bytes()
     try:
-        meta, controls, frameworks = _parse_pack(data)
+        pack = _load_pack(version)
     except ValueError as exc:  # pragma: no cover - should not happen if pack saved
         raise HTTPException(status_code=400, detail=str(exc))
-    _apply_pack(meta, controls, db)
-    result = {"version": version, "control_count": len(controls), "frameworks": frameworks}
+    try:
+        diff = _apply_pack(pack, db)
+    except ValueError as exc:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(exc))
+    result = {
+        "version": version,
+        "control_count": len(pack.controls),
+        "frameworks": pack.frameworks,
+        "diff": diff.as_dict(),
+    }
     record("RULEPACK_ROLLBACK", resource=version, details=result)
     return result
 
@@ -152,3 +211,38 @@ async def rulepack_status(db: Session = Depends(get_db)) -> dict:
     current = obj.value if obj else None
     available = sorted([p.stem for p in RULEPACK_DIR.glob("*.tar.gz")])
     return {"current": current, "available": available}
+
+
+class AssetFilter(BaseModel):
+    types: Optional[List[str]] = None
+    clouds: Optional[List[str]] = None
+    regions: Optional[List[str]] = None
+    env: Optional[str] = None
+    asset_ids: Optional[List[str]] = None
+
+
+class SimulateRequest(BaseModel):
+    logic: Dict[str, Any]
+    filter: AssetFilter = Field(default_factory=AssetFilter)
+    sample_size: int = Field(500, ge=1, le=10_000)
+    time_budget_ms: int = Field(2000, ge=10, le=30_000)
+    examples: int = Field(5, ge=0, le=100)
+    seed: Optional[int] = None
+
+
+@router.post("/simulate")
+def simulate_rule(req: SimulateRequest, db: Session = Depends(get_db)) -> dict:
+    """Dry-run draft *logic* on a stratified sample of assets; nothing is stored."""
+
+    try:
+        return simulate(
+            db,
+            req.logic,
+            req.filter.model_dump(),
+            sample_size=req.sample_size,
+            time_budget=req.time_budget_ms / 1000,
+            examples=req.examples,
+            seed=req.seed,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
@@ -0,0 +1,167 @@
+"""Evaluation-scoped, in-memory index of assets grouped by type."""
+
+from __future__ import annotations
+
+import heapq
+import logging
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from sqlalchemy import cast, func, select, true
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session, defer
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.models import assets as asset_m
+from app.services.projection import ConfigProjection
+
+logger = logging.getLogger(__name__)
+
+_by_asset_id = attrgetter("asset_id")
+
+
+class AssetIndex:
+    """Load the assets an evaluation run needs once and serve them by type.
+
+    All assets whose ``type`` is in *types* (and whose ``asset_id`` is in
+    *assets_scope*, when given) are streamed in a single query and detached
+    from *session* so the per-control commits in ``run_evaluation`` do not
+    expire them.  When more than *max_rows* assets match, nothing is cached
+    and :meth:`assets_for` falls back to querying per type set.
+
+    With a *projection* each asset's ``config`` only holds the projected
+    fields.  The value is set as if loaded, so it is never flushed back.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        types: Iterable[str],
+        *,
+        assets_scope: List[str] | None = None,
+        max_rows: int = 200_000,
+        chunk_size: int = 1000,
+        projection: ConfigProjection | None = None,
+    ) -> None:
+        self.session = session
+        self.types = list(dict.fromkeys(t for t in types if t))
+        self.assets_scope = assets_scope
+        self.chunk_size = chunk_size
+        self.projection = projection
+        self._in_sql = (
+            projection is not None
+            and session.get_bind().dialect.name == "postgresql"
+        )
+        self._by_type: Dict[str, List[asset_m.Asset]] = {}
+        self._merged: Dict[Tuple[str, ...], List[asset_m.Asset]] = {}
+        self.rows_loaded = 0
+        self.queries = 0
+
+        total = self._count() if self.types else 0
+        self.streaming = total > max_rows
+        if self.streaming:
+            logger.info(
+                "Asset index disabled: %d assets exceed cap of %d", total, max_rows
+            )
+        elif self.types:
+            self._load()
+
+    def _filters(self, types: List[str]) -> list:
+        filters = [asset_m.Asset.type.in_(types)]
+        if self.assets_scope:
+            filters.append(asset_m.Asset.asset_id.in_(self.assets_scope))
+        return filters
+
+    def _select(self, types: List[str]):
+        if self._in_sql:
+            # Each ``OFFSET 0`` subquery is evaluated once per row: the json
+            # is cast to jsonb once and only the projected document reaches
+            # the sort.
+            doc = (
+                select(cast(asset_m.Asset.config, JSONB).label("doc"))
+                .correlate(asset_m.Asset)
+                .offset(0)
+                .subquery()
+            )
+            projected = (
+                select(self.projection.jsonb(doc.c.doc).label("config"))
+                .correlate(asset_m.Asset)
+                .offset(0)
+                .lateral()
+            )
+            stmt = (
+                select(asset_m.Asset, projected.c.config)
+                .join(projected, true())
+                .options(defer(asset_m.Asset.config))
+            )
+        else:
+            stmt = select(asset_m.Asset)
+        return stmt.where(*self._filters(types))
+
+    def _rows(self, stmt) -> Iterator[asset_m.Asset]:
+        if self._in_sql:
+            for asset, config in self.session.execute(stmt):
+                set_committed_value(asset, "config", config)
+                yield asset
+            return
+        for asset in self.session.scalars(stmt):
+            if self.projection is not None:
+                set_committed_value(
+                    asset, "config", self.projection.prune(asset.config)
+                )
+            yield asset
+
+    def _count(self) -> int:
+        stmt = select(func.count(asset_m.Asset.id)).where(*self._filters(self.types))
+        self.queries += 1
+        return int(self.session.scalar(stmt) or 0)
+
+    def _load(self) -> None:
+        stmt = (
+            self._select(self.types)
+            .order_by(asset_m.Asset.asset_id, asset_m.Asset.id)
+            .execution_options(yield_per=self.chunk_size)
+        )
+        self.queries += 1
+        loaded: List[asset_m.Asset] = []
+        for asset in self._rows(stmt):
+            self._by_type.setdefault(asset.type, []).append(asset)
+            loaded.append(asset)
+        for asset in loaded:
+            self.session.expunge(asset)
+        self.rows_loaded = len(loaded)
+
+    def cached_assets(self) -> List[asset_m.Asset]:
+        """Return every cached asset (empty when streaming)."""
+
+        return [asset for group in self._by_type.values() for asset in group]
+
+    def assets_for(self, types: Iterable[str] | None) -> List[asset_m.Asset]:
+        """Return assets of *types* ordered by ``asset_id``."""
+
+        key = tuple(sorted(set(t for t in (types or []) if t)))
+        if not key:
+            return []
+        if self.streaming:
+            return self._query(list(key))
+        if len(key) == 1:
+            return self._by_type.get(key[0], [])
+        merged = self._merged.get(key)
+        if merged is None:
+            merged = list(
+                heapq.merge(
+                    *(self._by_type.get(t, []) for t in key), key=_by_asset_id
+                )
+            )
+            self._merged[key] = merged
+        return merged
+
+    def _query(self, types: List[str]) -> List[asset_m.Asset]:
+        stmt = self._select(types).order_by(asset_m.Asset.asset_id)
+        self.queries += 1
+        rows = list(self._rows(stmt.execution_options(yield_per=self.chunk_size)))
+        self.rows_loaded += len(rows)
+        return rows
+
+
+__all__ = ["AssetIndex"]
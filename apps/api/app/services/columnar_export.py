@@ -0,0 +1,203 @@
+"""Parquet and Arrow IPC exports of results.
+
+The rows come from the same server-side cursor chunks as the text exports
+(:func:`app.services.result_export.chunks`); each chunk becomes one record
+batch -- one Parquet row group -- and the bytes the writer produced for it
+are sent before the next chunk is read.  ``status``, ``severity``,
+``control_id`` and ``cloud`` are dictionary-encoded.  Arrow output is the
+IPC *stream* format, which allows each batch its own dictionaries.
+
+When ``RESULTS_EXPORT_CACHE_DIR`` is set, the unfiltered export of a
+completed run is also written there as ``<run_id>.<format>`` while it is
+streamed, and served from that file afterwards.
+
+``pyarrow`` is a dependency of the API; :data:`available` is ``False`` if it
+is missing all the same.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pq = None
+
+from app.services.result_export import FIELDS
+
+available = pa is not None
+
+CACHE_DIR = os.getenv("RESULTS_EXPORT_CACHE_DIR")
+COMPRESSION = os.getenv("RESULTS_EXPORT_COMPRESSION", "zstd")
+
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# (field, index in an export row, dictionary-encoded)
+_STRINGS = (
+    ("run_id", 0, False),
+    ("status", 2, True),
+    ("severity", 3, True),
+    ("category", 4, False),
+    ("control_id", 6, True),
+    ("control_title", 7, False),
+    ("asset_id", 8, False),
+    ("asset_type", 9, False),
+    ("cloud", 10, True),
+    ("region", 11, False),
+    ("env", 12, False),
+)
+
+
+def schema() -> "pa.Schema":
+    """Arrow schema of an export, in the column order of the text exports."""
+
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    types = {
+        name: dictionary if encoded else pa.string() for name, _, encoded in _STRINGS
+    }
+    types["evaluated_at"] = pa.timestamp("us", tz="UTC")
+    types["framework_ids"] = pa.list_(pa.string())
+    return pa.schema([(name, types.get(name, pa.string())) for name in FIELDS])
+
+
+def _text(value: Any) -> str | None:
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def record_batch(
+    rows: Sequence[Sequence[Any]], schema_: "pa.Schema"
+) -> "pa.RecordBatch":
+    """One record batch from export rows (see ``result_export.chunks``)."""
+
+    columns = {}
+    for name, index, encoded in _STRINGS:
+        column = pa.array([_text(row[index]) for row in rows], pa.string())
+        columns[name] = column.dictionary_encode() if encoded else column
+    columns["evaluated_at"] = pa.array(
+        [row[1] for row in rows], pa.timestamp("us", tz="UTC")
+    )
+    columns["framework_ids"] = pa.array(
+        [[_text(fw) for fw in row[5] or []] for row in rows], pa.list_(pa.string())
+    )
+    evidence = [row[13] or {} for row in rows]
+    columns["evidence_source"] = pa.array(
+        [_text(e.get("source")) for e in evidence], pa.string()
+    )
+    columns["evidence_pointer"] = pa.array(
+        [_text(e.get("pointer")) for e in evidence], pa.string()
+    )
+    columns["fix"] = pa.array(
+        [_text((row[14] or {}).get("short")) for row in rows], pa.string()
+    )
+    return pa.RecordBatch.from_arrays(
+        [columns[name] for name in schema_.names], schema=schema_
+    )
+
+
+class _Pipe:
+    """Write-only file object whose contents are drained after each batch."""
+
+    closed = False
+
+    def __init__(self) -> None:
+        self._parts: List[bytes] = []
+        self._size = 0
+
+    def write(self, data: Any) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._size += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._size
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def encode(fmt: str, rows: Iterable[Sequence[Sequence[Any]]]) -> Iterator[bytes]:
+    """Encode export row chunks as a Parquet file or an Arrow IPC stream."""
+
+    schema_ = schema()
+    pipe = _Pipe()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(pipe, schema_, compression=COMPRESSION)
+    else:
+        writer = pa.ipc.new_stream(
+            pipe, schema_, options=pa.ipc.IpcWriteOptions(compression=COMPRESSION)
+        )
+    for chunk in rows:
+        if not chunk:
+            continue
+        writer.write_batch(record_batch(chunk, schema_))
+        data = pipe.drain()
+        if data:
+            yield data
+    writer.close()
+    yield pipe.drain()
+
+
+def cache_path(run_id: str, fmt: str) -> Path | None:
+    """Where the unfiltered export of *run_id* is cached, if caching is on."""
+
+    if not CACHE_DIR or not re.fullmatch(r"[\w-]+", run_id):
+        return None
+    return Path(CACHE_DIR) / f"{run_id}.{fmt}"
+
+
+def tee(data: Iterable[bytes], path: Path) -> Iterator[bytes]:
+    """Yield *data* while writing it to *path*, which only appears complete."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fh = tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", delete=False
+    )
+    tmp = Path(fh.name)
+    try:
+        with fh:
+            for piece in data:
+                fh.write(piece)
+                yield piece
+        tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def evict(run_ids: Iterable[str]) -> None:
+    """Drop the cached exports of *run_ids*."""
+
+    for run_id in run_ids:
+        for fmt in MEDIA_TYPES:
+            path = cache_path(run_id, fmt)
+            if path is not None:
+                path.unlink(missing_ok=True)
+
+
+__all__ = [
+    "MEDIA_TYPES",
+    "available",
+    "cache_path",
+    "encode",
+    "evict",
+    "record_batch",
+    "schema",
+    "tee",
+]
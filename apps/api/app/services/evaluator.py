@@ -4,95 +4,56 @@ from __future__ import annotations
 
 import logging
 import os
-import re
 import time
+from contextlib import closing
 from datetime import date, datetime
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
 from uuid import uuid4
 
-from sqlalchemy import select
+from sqlalchemy import delete, select, update
 from sqlalchemy.orm import Session
 
-from packages.rules.engine import evaluate_logic as base_evaluate_logic
+from packages.rules.operators import NA, OPERATORS
 
 from app.models import assets as asset_m
 from app.models import controls as control_m
 from app.models import exceptions as exc_m
+from app.models import fingerprints as fp_m
 from app.models import results as result_m
+from app.models import rollups as rollup_m
 from app.models import runs as run_m
+from app.models import timings as timing_m
 from app.models.db import SessionLocal
+from app.services.asset_index import AssetIndex
+from app.services.exception_index import ExceptionIndex
+from app.services.operand_order import OperandProfiler, load_orders
+from app.services.incremental import ControlPlan, FingerprintTracker
+from app.services.parallel import evaluate_parallel, portable_operators
+from app.services.projection import ConfigProjection
+from app.services.result_sink import ResultRow, make_result_sink
+from app.services.shared_expressions import SharedExpressions
+from app.services.sql_pushdown import SqlPushdown, pushdown_enabled
+from app.services import columnar_export, run_stats, vectorized
+from app.services.rule_compiler import (
+    CompiledRule,
+    compile_logic,
+    operator_counts,
+    set_operand_orders,
+)
+from app.services.timings import RunTimings
 from app.metrics import (
     evaluate_duration_seconds,
     evaluate_runs_total,
     results_total,
+    shared_expression_evaluations_total,
 )
 
 logger = logging.getLogger(__name__)
 
 
-def _get_var(data: Dict[str, Any], path: str) -> Any:
-    current: Any = data
-    for part in path.split("."):
-        if isinstance(current, dict) and part in current:
-            current = current[part]
-        else:
-            raise KeyError(path)
-    return current
-
-
-def _evaluate(rule: Any, data: Dict[str, Any]) -> Any:
-    if not isinstance(rule, dict):
-        return rule
-    if not rule:
-        return rule
-    op, values = next(iter(rule.items()))
-
-    if op == "var":
-        return _get_var(data, values)
-    if op == "exists":
-        try:
-            _get_var(data, values)
-            return True
-        except KeyError:
-            return False
-    if op == "regex":
-        val = _evaluate(values[0], data)
-        pattern = _evaluate(values[1], data)
-        return bool(re.search(str(pattern), str(val)))
-    if op == "contains":
-        arr = _evaluate(values[0], data)
-        val = _evaluate(values[1], data)
-        return val in arr
-    if op == "==":
-        a, b = values
-        return _evaluate(a, data) == _evaluate(b, data)
-    if op == "!=":
-        a, b = values
-        return _evaluate(a, data) != _evaluate(b, data)
-    if op == ">":
-        a, b = values
-        return _evaluate(a, data) > _evaluate(b, data)
-    if op == ">=":
-        a, b = values
-        return _evaluate(a, data) >= _evaluate(b, data)
-    if op == "<":
-        a, b = values
-        return _evaluate(a, data) < _evaluate(b, data)
-    if op == "<=":
-        a, b = values
-        return _evaluate(a, data) <= _evaluate(b, data)
-    if op == "in":
-        a, b = values
-        return _evaluate(a, data) in _evaluate(b, data)
-    if op == "and":
-        return all(_evaluate(v, data) for v in values)
-    if op == "or":
-        return any(_evaluate(v, data) for v in values)
-    if op == "!":
-        return not _evaluate(values, data)
-
-    # Fallback to base evaluator for other ops
-    return base_evaluate_logic(rule, data)
+# Interpreter for logic the compiler does not handle; raises ``KeyError`` for
+# missing values (reported as NA).
+_evaluate = OPERATORS.evaluator(NA)
 
 
 def _build_context(asset: asset_m.Asset) -> Dict[str, Any]:
@@ -106,34 +67,119 @@ def _build_context(asset: asset_m.Asset) -> Dict[str, Any]:
     }
 
 
+def _control_types(control: control_m.Control) -> List[str]:
+    applies_to = control.applies_to or {}
+    types = applies_to.get("types")
+    if not types and applies_to.get("type"):
+        types = [applies_to.get("type")]
+    return list(types or [])
+
+
+def _status(rule: CompiledRule, ctx: Dict[str, Any]) -> str:
+    try:
+        return "PASS" if rule(ctx) else "FAIL"
+    except KeyError:
+        return "NA"
+
+
+def control_statuses(logic: Any, contexts: Iterable[Dict[str, Any]]) -> List[str]:
+    """Return PASS/FAIL/NA for *logic* against each asset context."""
+
+    rule = compile_logic(logic)
+    return [_status(rule, ctx) for ctx in contexts]
+
+
+def _asset_env(asset: asset_m.Asset) -> str | None:
+    env = (asset.tags or {}).get("env")
+    return env if env is None or isinstance(env, str) else str(env)
+
+
+def _make_result(
+    control: control_m.Control, asset: asset_m.Asset, status: str
+) -> result_m.Result:
+    return result_m.Result(
+        control_id=control.control_id,
+        control_title=control.title,
+        asset_id=asset.asset_id,
+        status=status,
+        severity=control.severity,
+        frameworks=control.frameworks,
+        evidence={
+            "asset_id": asset.asset_id,
+            "control_id": control.control_id,
+            "source": (asset.evidence or {}).get("source"),
+            "pointer": (asset.evidence or {}).get("pointer"),
+        },
+        fix=control.fix,
+        asset_type=asset.type,
+        cloud=asset.cloud,
+        region=asset.region,
+        env=_asset_env(asset),
+        category=control.category,
+    )
+
+
+def _result_row(
+    run_id: str,
+    control: control_m.Control,
+    asset: asset_m.Asset,
+    status: str,
+    meta: Dict[str, Any],
+) -> ResultRow:
+    evidence = asset.evidence or {}
+    return (
+        run_id,
+        control.control_id,
+        control.title,
+        asset.asset_id,
+        status,
+        control.severity,
+        control.frameworks,
+        {
+            "asset_id": asset.asset_id,
+            "control_id": control.control_id,
+            "source": evidence.get("source"),
+            "pointer": evidence.get("pointer"),
+        },
+        control.fix,
+        meta,
+        asset.type,
+        asset.cloud,
+        asset.region,
+        _asset_env(asset),
+        control.category,
+    )
+
+
 def evaluate_control(
     control: control_m.Control, assets: List[asset_m.Asset]
 ) -> List[result_m.Result]:
-    results: List[result_m.Result] = []
-    for asset in assets:
-        ctx = _build_context(asset)
-        try:
-            outcome = _evaluate(control.logic, ctx)
-            status = "PASS" if outcome else "FAIL"
-        except KeyError:
-            status = "NA"
-        res = result_m.Result(
-            control_id=control.control_id,
-            control_title=control.title,
-            asset_id=asset.asset_id,
-            status=status,
-            severity=control.severity,
-            frameworks=control.frameworks,
-            evidence={
-                "asset_id": asset.asset_id,
-                "control_id": control.control_id,
-                "source": (asset.evidence or {}).get("source"),
-                "pointer": (asset.evidence or {}).get("pointer"),
-            },
-            fix=control.fix,
+    statuses = control_statuses(control.logic, map(_build_context, assets))
+    return [
+        _make_result(control, asset, status)
+        for asset, status in zip(assets, statuses)
+    ]
+
+
+def _evaluate_serial(
+    plans: Iterable[ControlPlan],
+    shared: SharedExpressions | None = None,
+    columns: vectorized.ColumnBatch | None = None,
+) -> Iterator[Tuple[ControlPlan, List[str]]]:
+    for plan in plans:
+        if columns is not None:
+            statuses = columns.statuses(plan.control.logic, plan.pending())
+            if statuses is not None:
+                if shared is not None:
+                    shared.release(plan.control.logic)
+                yield plan, statuses
+                continue
+        if shared is not None:
+            yield plan, shared.statuses(plan.control.logic, plan.pending())
+            continue
+        yield plan, control_statuses(
+            plan.control.logic, map(_build_context, plan.pending())
         )
-        results.append(res)
-    return results
 
 
 def _exception_matches(exc: exc_m.Exception, asset: asset_m.Asset) -> bool:
@@ -150,6 +196,14 @@ def _exception_matches(exc: exc_m.Exception, asset: asset_m.Asset) -> bool:
     return True
 
 
+class EvaluationCancelled(Exception):
+    """Raised by a progress callback to stop a running evaluation."""
+
+
+# Called as ``progress(run_id, controls_done, controls_total)``.
+ProgressCallback = Callable[[str, int, int], None]
+
+
 @evaluate_duration_seconds.time()
 def run_evaluation(
     job_id: str | None = None,
@@ -157,18 +211,94 @@ def run_evaluation(
     controls_scope: List[str] | None = None,
     assets_scope: List[str] | None = None,
     dry_run: bool = False,
+    workers: int | None = None,
+    incremental: bool | None = None,
+    run_id: str | None = None,
+    progress: ProgressCallback | None = None,
+    commit_batches: bool | None = None,
 ) -> Dict[str, Any]:
+    """Evaluate controls against assets and persist the results as a run.
+
+    *run_id* lets a job queue pre-create the ``EvaluationRun`` row.
+    *commit_batches* overrides ``EVALUATION_COMMIT_BATCHES``.  On failure or
+    cancellation any results already committed are deleted and the run's
+    ``status`` and ``error`` are updated before the exception propagates.
+    """
+
     start = time.perf_counter()
     session: Session = SessionLocal()
-    run_id = str(uuid4())
-    run = run_m.EvaluationRun(run_id=run_id, status="running")
-    session.add(run)
+    run = session.get(run_m.EvaluationRun, run_id) if run_id else None
+    if run is None:
+        run = run_m.EvaluationRun(run_id=run_id or str(uuid4()), status="running")
+        session.add(run)
+    else:
+        run.status = "running"
+    session.commit()
+    run_id = run.run_id
+    timings = RunTimings()
+
+    try:
+        summary = _execute_run(
+            session,
+            run,
+            timings,
+            controls_scope=controls_scope,
+            assets_scope=assets_scope,
+            dry_run=dry_run,
+            workers=workers,
+            incremental=incremental,
+            progress=progress,
+            commit_batches=commit_batches,
+        )
+    except Exception as exc:
+        session.rollback()
+        session.execute(delete(result_m.Result).where(result_m.Result.run_id == run_id))
+        status = "cancelled" if isinstance(exc, EvaluationCancelled) else "failed"
+        error = str(exc) or exc.__class__.__name__
+        run.status = status
+        run.error = error
+        run.finished_at = datetime.utcnow()
+        session.commit()
+        session.close()
+        logger.warning("Evaluation run %s %s: %s", run_id, status, error)
+        raise
+
+    with timings.phase("cleanup"):
+        _cleanup_runs(session)
+    session.execute(
+        update(run_m.EvaluationRun)
+        .where(run_m.EvaluationRun.run_id == run_id)
+        .values(timings=timings.as_dict())
+    )
     session.commit()
+    session.close()
+    timings.observe()
+    summary["timings"] = timings.as_dict()
+    duration = time.perf_counter() - start
+    logger.info("Evaluation run %s completed in %.2fs", run_id, duration)
+    return summary
 
+
+def _execute_run(
+    session: Session,
+    run: run_m.EvaluationRun,
+    timings: RunTimings,
+    *,
+    controls_scope: List[str] | None,
+    assets_scope: List[str] | None,
+    dry_run: bool,
+    workers: int | None,
+    incremental: bool | None,
+    progress: ProgressCallback | None,
+    commit_batches: bool | None,
+) -> Dict[str, Any]:
+    run_id = run.run_id
     today = date.today()
-    exceptions = session.scalars(
-        select(exc_m.Exception).where(exc_m.Exception.expires_at >= today)
-    ).all()
+    with timings.phase("exception_load"):
+        active_exceptions = session.scalars(
+            select(exc_m.Exception).where(exc_m.Exception.expires_at >= today)
+        ).all()
+        exception_index = ExceptionIndex(active_exceptions)
 
     controls_query = (
         session.query(control_m.Control).order_by(control_m.Control.control_id)
@@ -177,76 +307,276 @@ def run_evaluation(
         controls_query = controls_query.filter(
             control_m.Control.control_id.in_(controls_scope)
         )
-    controls_list = controls_query.all()
+    profiler: OperandProfiler | None = None
+    with timings.phase("control_load"):
+        controls_list = controls_query.all()
+        # and/or operand orders profiled by earlier runs
+        if os.getenv("EVALUATION_REORDER", "false").lower() == "true":
+            set_operand_orders(load_orders(session))
+            profiler = OperandProfiler()
+        else:
+            set_operand_orders({})
+    controls_total = len(controls_list)
 
     results_count = 0
     assets_count = 0
     status_counts: Dict[str, int] = {}
 
-    for control in controls_list:
-        types = control.applies_to.get("types")
-        if not types and control.applies_to.get("type"):
-            types = [control.applies_to.get("type")]
-        asset_query = session.query(asset_m.Asset).filter(
-            asset_m.Asset.type.in_(types or [])
+    if progress is not None:
+        progress(run_id, 0, controls_total)
+    sink = make_result_sink(
+        session,
+        batch_size=int(os.getenv("EVALUATION_BATCH_SIZE", "5000")),
+        commit_batches=(
+            commit_batches
+            if commit_batches is not None
+            else os.getenv("EVALUATION_COMMIT_BATCHES", "false").lower() == "true"
+        ),
+    )
+
+    pushed = 0
+    if not dry_run and pushdown_enabled(session):
+        # Controls the SQL compiler supports never load asset rows into
+        # Python; the rest continue below.
+        pushdown = SqlPushdown(
+            session,
+            run_id,
+            active_exceptions,
+            exception_index,
+            sink,
+            assets_scope=assets_scope,
         )
-        if assets_scope:
-            asset_query = asset_query.filter(
-                asset_m.Asset.asset_id.in_(assets_scope)
+        python_controls = []
+        for control in controls_list:
+            start = time.perf_counter()
+            counts = pushdown.evaluate(control, _control_types(control))
+            if counts is None:
+                python_controls.append(control)
+                continue
+            evaluated_rows = sum(counts.values())
+            timings.control(
+                control.control_id,
+                time.perf_counter() - start,
+                evaluated_rows,
+                operator_counts(control.logic),
             )
-        assets_list = asset_query.order_by(asset_m.Asset.asset_id).all()
-        assets_count += len(assets_list)
-        control_results = evaluate_control(control, assets_list)
-        for res, asset in zip(control_results, assets_list):
-            for exc in exceptions:
-                if exc.control_id == control.control_id and _exception_matches(exc, asset):
-                    res.meta = {"prev_status": res.status}
-                    res.status = "WAIVED"
-                    break
+            assets_count += evaluated_rows
+            results_count += evaluated_rows
+            for status, count in counts.items():
+                status_counts[status] = status_counts.get(status, 0) + count
+            pushed += 1
+            if progress is not None:
+                progress(run_id, pushed, controls_total)
+        logger.info(
+            "Evaluated %d of %d controls in SQL (%d guarded rows in Python)",
+            pushed,
+            controls_total,
+            pushdown.python_rows,
+        )
+        controls_list = python_controls
+
+    projection: ConfigProjection | None = None
+    if os.getenv("EVALUATION_PROJECTION", "true").lower() == "true":
+        projection = ConfigProjection.for_logics(c.logic for c in controls_list)
+        if projection is not None:
+            logger.info(
+                "Loading %d config paths for %d controls",
+                len(projection.paths()),
+                len(controls_list),
+            )
+    with timings.phase("asset_fetch"):
+        asset_index = AssetIndex(
+            session,
+            (t for control in controls_list for t in _control_types(control)),
+            assets_scope=assets_scope,
+            max_rows=int(os.getenv("EVALUATION_ASSET_CACHE_ROWS", "200000")),
+            projection=projection,
+        )
+
+    tracker: FingerprintTracker | None = None
+    if not dry_run and not asset_index.streaming:
+        tracker = FingerprintTracker(
+            session, asset_index.cached_assets(), controls_list
+        )
+        if incremental is None:
+            incremental = os.getenv("EVALUATION_INCREMENTAL", "false").lower() == "true"
+        if incremental and tracker.load_base():
+            logger.info("Incremental evaluation against run %s", tracker.base_run_id)
+
+    def plans() -> Iterator[ControlPlan]:
+        for control in controls_list:
+            with timings.phase("asset_fetch"):
+                assets = asset_index.assets_for(_control_types(control))
+            if profiler is not None:
+                profiler.observe(control.logic, assets)
+            if tracker is None:
+                yield ControlPlan(control, assets)
+            else:
+                yield tracker.plan(control, assets)
+
+    workers = (
+        workers
+        if workers is not None
+        else int(os.getenv("EVALUATION_WORKERS", "1"))
+    )
+    if workers > 1 and portable_operators() is None:
+        logger.warning(
+            "Custom operators cannot be pickled for worker processes; "
+            "evaluating serially"
+        )
+        workers = 1
+    shared: SharedExpressions | None = None
+    columns: vectorized.ColumnBatch | None = None
+    if workers > 1 and not asset_index.streaming:
+        evaluated = evaluate_parallel(
+            plans(),
+            asset_index,
+            workers=workers,
+            chunk_size=int(os.getenv("EVALUATION_CHUNK_SIZE", "5000")),
+        )
+    else:
+        # Sub-expression memos are keyed by asset, so they need the cached
+        # (stable) asset objects.
+        if (
+            not asset_index.streaming
+            and os.getenv("EVALUATION_SHARED_EXPRESSIONS", "true").lower() == "true"
+        ):
+            shared = SharedExpressions(
+                (control.logic for control in controls_list),
+                max_entries=int(
+                    os.getenv("EVALUATION_SHARED_MEMO_ENTRIES", "5000000")
+                ),
+            )
+        # Columns pin the asset lists they were built from; streamed lists
+        # are fresh ORM objects per control and would outgrow the cache cap.
+        if (
+            vectorized.available
+            and not asset_index.streaming
+            and os.getenv("EVALUATION_VECTORIZED", "true").lower() == "true"
+        ):
+            columns = vectorized.ColumnBatch()
+        evaluated = _evaluate_serial(plans(), shared, columns)
+
+    # Evaluation time per control is the time spent waiting for the next
+    # (plan, statuses) pair, minus the asset fetches done while planning it.
+    # With worker processes this is the wait for that control's shards.
+    mark = time.perf_counter()
+    fetched = timings.phases["asset_fetch"]
+    with closing(evaluated):
+        for done, (plan, computed) in enumerate(evaluated, start=1):
+            control, assets_list = plan.control, plan.assets
+            now = time.perf_counter()
+            timings.control(
+                control.control_id,
+                now - mark - (timings.phases["asset_fetch"] - fetched),
+                len(computed),
+                operator_counts(control.logic),
+            )
+            statuses = plan.merge(computed)
+            assets_count += len(assets_list)
+            results_count += len(assets_list)
             if not dry_run:
-                res.run_id = run_id
-        results_count += len(control_results)
-        if not dry_run and control_results:
-            session.bulk_save_objects(control_results)
-            session.commit()
-            for r in control_results:
-                status_counts[r.status] = status_counts.get(r.status, 0) + 1
-
-    run.controls_count = len(controls_list)
+                metas: List[Dict[str, Any]] = [{}] * len(assets_list)
+                if control.control_id in exception_index:
+                    with timings.phase("exception_apply"):
+                        statuses = list(statuses)
+                        metas = list(metas)
+                        for i, asset in enumerate(assets_list):
+                            if exception_index.match(control.control_id, asset):
+                                metas[i] = {"prev_status": statuses[i]}
+                                statuses[i] = "WAIVED"
+                with timings.phase("persistence"):
+                    for asset, status, meta in zip(assets_list, statuses, metas):
+                        sink.add(_result_row(run_id, control, asset, status, meta))
+                        status_counts[status] = status_counts.get(status, 0) + 1
+            if progress is not None:
+                progress(run_id, pushed + done, controls_total)
+            mark = time.perf_counter()
+            fetched = timings.phases["asset_fetch"]
+    timings.asset_rows = asset_index.rows_loaded
+    if columns is not None:
+        logger.info(
+            "Evaluated %d controls column-wise, %d per asset",
+            columns.vectorized,
+            columns.fallbacks,
+        )
+    if profiler is not None and not dry_run:
+        with timings.phase("profiling"):
+            changed = profiler.save(session)
+        logger.info("Profiled and/or operands, %d orders changed", changed)
+    with timings.phase("persistence"):
+        sink.close()
+        if tracker is not None:
+            tracker.save(run_id)
+        timings.save(session, run_id)
+    if not dry_run:
+        with timings.phase("rollups"):
+            run_stats.write_rollups(session, run_id)
+
+    run.controls_count = controls_total
     run.assets_count = assets_count
     run.results_count = results_count
+    reused_count = tracker.reused if tracker else 0
+    run.reused_count = reused_count
+    run.recomputed_count = results_count - reused_count
     run.finished_at = datetime.utcnow()
     run.status = "completed"
-    session.commit()
+    run.timings = timings.as_dict()
+    shared_stats = shared.stats() if shared is not None else None
+    run.shared_stats = shared_stats
+    with timings.phase("persistence"):
+        session.commit()
 
     evaluate_runs_total.inc()
     for status, count in status_counts.items():
         results_total.labels(status=status).inc(count)
+    if shared_stats:
+        shared_expression_evaluations_total.labels(outcome="evaluated").inc(
+            shared_stats["evaluations"]
+        )
+        shared_expression_evaluations_total.labels(outcome="reused").inc(
+            shared_stats["reused"]
+        )
+
+    return {
+        "run_id": run_id,
+        "controls_count": controls_total,
+        "assets_count": assets_count,
+        "results_count": results_count,
+        "reused_count": reused_count,
+        "recomputed_count": results_count - reused_count,
+        "shared_stats": shared_stats,
+    }
+
+
+def _cleanup_runs(session: Session) -> None:
+    """Drop all but the newest ``EVALUATION_KEEP`` finished runs."""
 
-    # Cleanup old runs
     keep = int(os.getenv("EVALUATION_KEEP", "3"))
     run_ids = session.scalars(
-        select(run_m.EvaluationRun.run_id).order_by(run_m.EvaluationRun.started_at.desc())
+        select(run_m.EvaluationRun.run_id)
+        .where(run_m.EvaluationRun.status.not_in(["queued", "running"]))
+        .order_by(run_m.EvaluationRun.started_at.desc())
     ).all()
     if len(run_ids) > keep:
         old_ids = run_ids[keep:]
         session.query(result_m.Result).filter(
             result_m.Result.run_id.in_(old_ids)
         ).delete(synchronize_session=False)
+        session.query(fp_m.EvaluationFingerprint).filter(
+            fp_m.EvaluationFingerprint.run_id.in_(old_ids)
+        ).delete(synchronize_session=False)
+        session.query(timing_m.ControlTiming).filter(
+            timing_m.ControlTiming.run_id.in_(old_ids)
+        ).delete(synchronize_session=False)
+        session.query(rollup_m.ResultRollup).filter(
+            rollup_m.ResultRollup.run_id.in_(old_ids)
+        ).delete(synchronize_session=False)
         session.query(run_m.EvaluationRun).filter(
             run_m.EvaluationRun.run_id.in_(old_ids)
         ).delete(synchronize_session=False)
         session.commit()
-
-    session.close()
-    duration = time.perf_counter() - start
-    logger.info("Evaluation run %s completed in %.2fs", run_id, duration)
-    return {
-        "run_id": run_id,
-        "controls_count": len(controls_list),
-        "assets_count": assets_count,
-        "results_count": results_count,
-    }
+        columnar_export.evict(old_ids)
 
 
-__all__ = ["run_evaluation", "evaluate_control"]
+__all__ = ["run_evaluation", "evaluate_control", "EvaluationCancelled"]
@@ -0,0 +1,114 @@
+"""Per-run index of active exceptions for constant-time waiver lookup."""
+
+from __future__ import annotations
+
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from app.models import assets as asset_m
+from app.models import exceptions as exc_m
+
+# Selector dimensions, in the order ``_exception_matches`` checks them.
+DIMENSIONS = ("asset_id", "type", "env", "cloud")
+
+_Key = Tuple[Any, ...]
+_Hit = Tuple[int, exc_m.Exception]
+
+
+def _asset_values(asset: asset_m.Asset) -> _Key:
+    return (
+        asset.asset_id,
+        asset.type,
+        (asset.tags or {}).get("env"),
+        asset.cloud,
+    )
+
+
+def _key_getter(dims: Tuple[int, ...]) -> Callable[[_Key], _Key]:
+    if not dims:
+        return lambda values: ()
+    if len(dims) == 1:
+        (i,) = dims
+        return lambda values: (values[i],)
+    return itemgetter(*dims)
+
+
+class _ControlExceptions:
+    __slots__ = ("tables", "unindexed")
+
+    def __init__(self) -> None:
+        # selector shape (indices of the dimensions it sets) -> key getter and
+        # a table from the selected values to the first exception using them
+        self.tables: Dict[Tuple[int, ...], Tuple[Callable, Dict[_Key, _Hit]]] = {}
+        self.unindexed: List[_Hit] = []
+
+
+class ExceptionIndex:
+    """Index exceptions by ``control_id`` and selector dimensions.
+
+    :meth:`match` returns the same exception a linear scan over *exceptions*
+    with ``evaluator._exception_matches`` would return first, but only probes
+    the selector shapes (which of asset_id/type/env/cloud are set) that exist
+    for the control, so lookups no longer grow with the number of waivers.
+    """
+
+    def __init__(self, exceptions: Iterable[exc_m.Exception]) -> None:
+        self._controls: Dict[str, _ControlExceptions] = {}
+        self.size = 0
+        for position, exc in enumerate(exceptions):
+            self._add(position, exc)
+            self.size += 1
+
+    def _add(self, position: int, exc: exc_m.Exception) -> None:
+        entry = self._controls.get(exc.control_id)
+        if entry is None:
+            entry = self._controls[exc.control_id] = _ControlExceptions()
+        sel = exc.selector or {}
+        # Falsy selector values are ignored by ``_exception_matches``.
+        values = tuple(sel.get(dim) or None for dim in DIMENSIONS)
+        dims = tuple(i for i, v in enumerate(values) if v is not None)
+        key = tuple(values[i] for i in dims)
+        try:
+            hash(key)
+        except TypeError:
+            entry.unindexed.append((position, exc))
+            return
+        table = entry.tables.get(dims)
+        if table is None:
+            table = entry.tables[dims] = (_key_getter(dims), {})
+        # Only the first exception per key can ever be the first match.
+        table[1].setdefault(key, (position, exc))
+
+    def __contains__(self, control_id: str) -> bool:
+        return control_id in self._controls
+
+    def match(
+        self, control_id: str, asset: asset_m.Asset
+    ) -> exc_m.Exception | None:
+        """Return the first active exception for *control_id* covering *asset*."""
+
+        entry = self._controls.get(control_id)
+        if entry is None:
+            return None
+        values = _asset_values(asset)
+        best: _Hit | None = None
+        for getter, table in entry.tables.values():
+            try:
+                hit = table.get(getter(values))
+            except TypeError:  # unhashable asset attribute, never equal
+                continue
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = hit
+        if entry.unindexed:
+            from app.services.evaluator import _exception_matches
+
+            for position, exc in entry.unindexed:
+                if best is not None and position > best[0]:
+                    break
+                if _exception_matches(exc, asset):
+                    best = (position, exc)
+                    break
+        return best[1] if best else None
+
+
+__all__ = ["ExceptionIndex", "DIMENSIONS"]
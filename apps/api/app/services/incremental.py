@@ -0,0 +1,205 @@
+"""Fingerprint-based incremental evaluation.
+
+Every non-dry run records a content hash of each asset it evaluated
+(type/cloud/region/tags/config) and of each control (logic/applies_to).  An
+incremental run compares the current hashes with those of the most recent
+completed run that recorded them and only re-evaluates (control, asset) pairs
+where either side changed; the raw PASS/FAIL/NA of every other pair is carried
+forward from that run's results.  Controls using a volatile operator (such
+as ``days_since``) are always re-evaluated.  Exceptions are applied afresh
+either way.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from packages.rules.operators import OPERATORS
+
+from app.models import assets as asset_m
+from app.models import controls as control_m
+from app.models import fingerprints as fp_m
+from app.models import results as result_m
+from app.models import runs as run_m
+from app.services.rule_compiler import logic_hash, operator_counts
+
+logger = logging.getLogger(__name__)
+
+# Bump when evaluation semantics change so stale results are not reused.
+FINGERPRINT_VERSION = "1"
+
+
+class ControlPlan(NamedTuple):
+    """A control, its ordered assets and any statuses carried forward.
+
+    ``carried`` is aligned with ``assets``; ``None`` entries (or a ``None``
+    list) mark assets that still need evaluating.
+    """
+
+    control: control_m.Control
+    assets: List[asset_m.Asset]
+    carried: List[str | None] | None = None
+
+    def pending(self) -> List[asset_m.Asset]:
+        if self.carried is None:
+            return self.assets
+        return [a for a, s in zip(self.assets, self.carried) if s is None]
+
+    def merge(self, computed: List[str]) -> List[str]:
+        """Interleave freshly *computed* statuses with the carried ones."""
+
+        if self.carried is None:
+            return computed
+        it = iter(computed)
+        return [s if s is not None else next(it) for s in self.carried]
+
+
+def asset_fingerprint(asset: asset_m.Asset) -> str:
+    """Hash *asset* as loaded for the run.
+
+    With a ``ConfigProjection`` only the projected config fields are hashed.
+    That is enough: a reused control reads only projected paths, and a
+    different projection can only cause recomputation.
+    """
+
+    raw = json.dumps(
+        [asset.type, asset.cloud, asset.region, asset.tags or {}, asset.config or {}],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def control_fingerprint(control: control_m.Control) -> str:
+    applies_to = json.dumps(
+        control.applies_to or {}, sort_keys=True, separators=(",", ":"), default=str
+    )
+    raw = f"{FINGERPRINT_VERSION}:{logic_hash(control.logic)}:{applies_to}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class FingerprintTracker:
+    """Compute this run's fingerprints and plan reuse against a base run."""
+
+    def __init__(
+        self,
+        session: Session,
+        assets: Iterable[asset_m.Asset],
+        controls: Iterable[control_m.Control],
+    ) -> None:
+        self.session = session
+        assets = list(assets)
+        # Results are keyed by asset_id, so ambiguous ids are never reused.
+        dupes = {k for k, n in Counter(a.asset_id for a in assets).items() if n > 1}
+        self.assets: Dict[str, str] = {
+            a.asset_id: asset_fingerprint(a) for a in assets if a.asset_id not in dupes
+        }
+        self.controls: Dict[str, str] = {
+            c.control_id: control_fingerprint(c) for c in controls
+        }
+        self.base_run_id: str | None = None
+        self._base_assets: Dict[str, str] = {}
+        self._base_controls: Dict[str, str] = {}
+        self.reused = 0
+        self.recomputed = 0
+
+    def load_base(self) -> str | None:
+        """Select the latest completed run that recorded fingerprints."""
+
+        recorded = select(fp_m.EvaluationFingerprint.run_id).where(
+            fp_m.EvaluationFingerprint.kind == "control"
+        )
+        self.base_run_id = self.session.scalars(
+            select(run_m.EvaluationRun.run_id)
+            .where(
+                run_m.EvaluationRun.status == "completed",
+                run_m.EvaluationRun.run_id.in_(recorded),
+            )
+            .order_by(run_m.EvaluationRun.started_at.desc())
+            .limit(1)
+        ).first()
+        if self.base_run_id is None:
+            return None
+        rows = self.session.execute(
+            select(
+                fp_m.EvaluationFingerprint.kind,
+                fp_m.EvaluationFingerprint.key,
+                fp_m.EvaluationFingerprint.fingerprint,
+            ).where(fp_m.EvaluationFingerprint.run_id == self.base_run_id)
+        )
+        for kind, key, fingerprint in rows:
+            target = self._base_assets if kind == "asset" else self._base_controls
+            target[key] = fingerprint
+        return self.base_run_id
+
+    def plan(
+        self, control: control_m.Control, assets: List[asset_m.Asset]
+    ) -> ControlPlan:
+        carried = self._carried(control, assets)
+        reused = 0 if carried is None else sum(s is not None for s in carried)
+        self.reused += reused
+        self.recomputed += len(assets) - reused
+        return ControlPlan(control, assets, carried)
+
+    def _carried(
+        self, control: control_m.Control, assets: List[asset_m.Asset]
+    ) -> List[str | None] | None:
+        cid = control.control_id
+        if (
+            self.base_run_id is None
+            or not assets
+            or self._base_controls.get(cid) != self.controls.get(cid)
+            or OPERATORS.is_volatile(operator_counts(control.logic))
+        ):
+            return None
+        previous: Dict[str, str | None] = {}
+        rows = self.session.execute(
+            select(
+                result_m.Result.asset_id, result_m.Result.status, result_m.Result.meta
+            ).where(
+                result_m.Result.run_id == self.base_run_id,
+                result_m.Result.control_id == cid,
+            )
+        )
+        for asset_id, status, meta in rows:
+            if status == "WAIVED":
+                status = (meta or {}).get("prev_status")
+            previous[asset_id] = None if asset_id in previous else status
+        carried: List[str | None] = []
+        for asset in assets:
+            fp = self.assets.get(asset.asset_id)
+            if fp is not None and self._base_assets.get(asset.asset_id) == fp:
+                carried.append(previous.get(asset.asset_id))
+            else:
+                carried.append(None)
+        return carried
+
+    def save(self, run_id: str, batch_size: int = 5000) -> None:
+        """Record this run's fingerprints (in the caller's transaction)."""
+
+        table = fp_m.EvaluationFingerprint.__table__
+        rows = [
+            {"run_id": run_id, "kind": "control", "key": k, "fingerprint": v}
+            for k, v in self.controls.items()
+        ] + [
+            {"run_id": run_id, "kind": "asset", "key": k, "fingerprint": v}
+            for k, v in self.assets.items()
+        ]
+        for start in range(0, len(rows), batch_size):
+            self.session.execute(insert(table), rows[start : start + batch_size])
+
+
+__all__ = [
+    "ControlPlan",
+    "FingerprintTracker",
+    "asset_fingerprint",
+    "control_fingerprint",
+]
@@ -0,0 +1,193 @@
+"""Order ``and``/``or`` operands by profiled cost and selectivity.
+
+``and`` stops at the first falsy operand and ``or`` at the first truthy one,
+so evaluating cheap operands that usually stop first saves the others.
+:class:`OperandProfiler` times every operand of each distinct ``and``/``or``
+node on a sample of the run's assets and counts how often it stops
+evaluation.  Stats accumulate in ``evaluation_operand_orders`` and the order
+derived from them is installed with ``rule_compiler.set_operand_orders`` for
+the next runs, which compile those nodes to the cheaper order while keeping
+file-order results (see ``rule_compiler._compile_ordered``).
+"""
+
+from __future__ import annotations
+
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import operand_orders as order_m
+from app.services.rule_compiler import compile_logic, logic_hash, raise_free_paths
+
+
+def bool_nodes(logic: Any) -> Iterator[Dict[str, Any]]:
+    """Yield the ``and``/``or`` nodes of *logic* with two or more operands."""
+
+    if isinstance(logic, list):
+        for item in logic:
+            yield from bool_nodes(item)
+        return
+    if not isinstance(logic, dict) or not logic:
+        return
+    op, values = next(iter(logic.items()))
+    if op in ("and", "or") and isinstance(values, list) and len(values) > 1:
+        yield logic
+    yield from bool_nodes(values)
+
+
+def expected_cost(
+    order: Sequence[int], costs: Sequence[float], stop_rates: Sequence[float]
+) -> float:
+    """Mean cost of evaluating the operands in *order*, assuming independence."""
+
+    total, reach = 0.0, 1.0
+    for i in order:
+        total += reach * costs[i]
+        reach *= 1.0 - stop_rates[i]
+    return total
+
+
+def choose_order(
+    costs: Sequence[float],
+    stop_rates: Sequence[float],
+    safe: Sequence[bool],
+    min_gain: float = 0.1,
+) -> List[int]:
+    """Return the operand order to use, or the file order if none is cheaper.
+
+    Operands go by ascending cost per stop.  An operand that may raise
+    (``safe[i]`` false) is evaluated anyway when a later operand decides, so
+    nothing is moved ahead of it.  A new order must beat the file order's
+    expected cost by *min_gain*.
+    """
+
+    identity = list(range(len(costs)))
+
+    def rank(i: int) -> float:
+        return costs[i] / stop_rates[i] if stop_rates[i] > 0 else float("inf")
+
+    order: List[int] = []
+    pending = list(identity)
+    while pending:
+        barrier = next((i for i in pending if not safe[i]), None)
+        ready = [i for i in pending if barrier is None or i <= barrier]
+        best = min(ready, key=lambda i: (rank(i), i))
+        order.append(best)
+        pending.remove(best)
+    if expected_cost(order, costs, stop_rates) < (1.0 - min_gain) * expected_cost(
+        identity, costs, stop_rates
+    ):
+        return order
+    return identity
+
+
+def load_orders(session: Session) -> Dict[str, List[int]]:
+    rows = session.execute(
+        select(order_m.OperandOrder.node_hash, order_m.OperandOrder.order)
+    )
+    return {node_hash: order for node_hash, order in rows}
+
+
+class OperandProfiler:
+    """Profile the ``and``/``or`` operands of the controls seen in a run.
+
+    ``observe`` keeps an evenly spread sample of assets for each distinct
+    node the first time it is seen; ``save`` times the operands over those
+    samples and merges the outcome into the stored stats.  Earlier runs
+    count for half as much on every merge (*decay*) so orders follow the
+    asset population.
+    """
+
+    def __init__(
+        self, sample_size: int = 200, decay: float = 0.5, min_gain: float = 0.1
+    ) -> None:
+        self.sample_size = sample_size
+        self.decay = decay
+        self.min_gain = min_gain
+        self._samples: Dict[str, Tuple[Dict[str, Any], List[Any]]] = {}
+
+    def observe(self, logic: Any, assets: Sequence[Any]) -> None:
+        if not assets:
+            return
+        for node in bool_nodes(logic):
+            key = logic_hash(node)
+            if key not in self._samples:
+                step = max(1, len(assets) // self.sample_size)
+                self._samples[key] = (node, list(assets[::step][: self.sample_size]))
+
+    def profile(self) -> Dict[str, Tuple[Dict[str, Any], List[float], List[int], int]]:
+        """Return ``{node_hash: (node, seconds, stops, samples)}`` for this run."""
+
+        from app.services.evaluator import _build_context
+
+        out = {}
+        for key, (node, assets) in self._samples.items():
+            op, operands = next(iter(node.items()))
+            stop_on = op == "or"
+            contexts = [_build_context(asset) for asset in assets]
+            seconds: List[float] = []
+            stops: List[int] = []
+            for operand in operands:
+                fn = compile_logic(operand)
+                stopped = 0
+                start = time.perf_counter()
+                for ctx in contexts:
+                    try:
+                        if bool(fn(ctx)) == stop_on:
+                            stopped += 1
+                    except Exception:
+                        stopped += 1
+                seconds.append(time.perf_counter() - start)
+                stops.append(stopped)
+            out[key] = (node, seconds, stops, len(contexts))
+        return out
+
+    def save(self, session: Session) -> int:
+        """Merge this run's profile into the stored stats (not committed).
+
+        Returns the number of nodes whose operand order changed.
+        """
+
+        profiled = self.profile()
+        if not profiled:
+            return 0
+        stored = {
+            row.node_hash: row
+            for row in session.scalars(
+                select(order_m.OperandOrder).where(
+                    order_m.OperandOrder.node_hash.in_(list(profiled))
+                )
+            )
+        }
+        changed = 0
+        for key, (node, seconds, stops, samples) in profiled.items():
+            op, operands = next(iter(node.items()))
+            row = stored.get(key)
+            if row is None:
+                row = order_m.OperandOrder(node_hash=key, order=list(range(len(seconds))))
+                session.add(row)
+            else:
+                seconds = [self.decay * a + b for a, b in zip(row.seconds, seconds)]
+                stops = [self.decay * a + b for a, b in zip(row.stops, stops)]
+                samples = self.decay * row.samples + samples
+            order = choose_order(
+                [s / samples for s in seconds],
+                [s / samples for s in stops],
+                [raise_free_paths(operand) is not None for operand in operands],
+                self.min_gain,
+            )
+            changed += order != row.order
+            row.op = op
+            row.logic = node
+            row.order = order
+            row.samples = round(samples)
+            row.seconds = seconds
+            row.stops = stops
+            row.updated_at = datetime.utcnow()
+        return changed
+
+
+__all__ = ["OperandProfiler", "bool_nodes", "choose_order", "expected_cost", "load_orders"]
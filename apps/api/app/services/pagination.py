@@ -0,0 +1,65 @@
+"""Keyset (cursor) pagination helpers.
+
+A page is fetched with ``WHERE (sort_col, id) > (last_value, last_id)``
+(``<`` when descending) instead of ``OFFSET``, so deep pages cost the same as
+the first one when a composite index on the sort key exists.  Cursors are
+opaque to clients: URL-safe base64 of a small JSON object holding the key of
+the boundary row, the sort the page was produced with and whether it points
+backwards (a ``prev_cursor``).
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict
+
+from sqlalchemy import bindparam, tuple_
+
+
+def encode_cursor(data: Dict[str, Any]) -> str:
+    raw = json.dumps(data, separators=(",", ":"), default=_default).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Dict[str, Any]:
+    """Decode *token*; raises ``ValueError`` if it is not a valid cursor."""
+
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(data, dict):
+        raise ValueError("Invalid cursor")
+    return data
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def cursor_value(value: Any) -> Any:
+    """Inverse of the datetime encoding used by :func:`encode_cursor`."""
+
+    if isinstance(value, dict) and set(value) == {"dt"}:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def after(column: Any, id_column: Any, value: Any, last_id: int, descending: bool):
+    """Filter for rows strictly after ``(value, last_id)`` in sort order."""
+
+    key = tuple_(column, id_column)
+    bound = tuple_(
+        bindparam(None, value, type_=column.type),
+        bindparam(None, last_id, type_=id_column.type),
+    )
+    return key < bound if descending else key > bound
+
+
+__all__ = ["after", "cursor_value", "decode_cursor", "encode_cursor"]
@@ -0,0 +1,133 @@
+"""Process-pool evaluation of controls across CPU cores.
+
+The parent ships every cached asset context to each worker once (via the pool
+initializer) and then submits compact shards: a control's ``logic`` plus an
+array of asset positions.  Workers return one status code per position, and the
+parent reassembles the shards in submission order, so the output is identical
+to the serial path.
+
+Workers start from a fresh interpreter, so custom operators registered at
+runtime are shipped to them by the initializer as well; that needs the
+operator functions to be picklable (defined at module level).
+:func:`portable_operators` tells whether they are.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import pickle
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from packages.rules.operators import OPERATORS
+
+from app.services.asset_index import AssetIndex
+from app.services.incremental import ControlPlan
+from app.services.rule_compiler import compile_logic, operand_orders, set_operand_orders
+
+# Runs are evaluated on JobRunner threads, and forking a threaded process can
+# deadlock a child on a lock another thread held; start workers from a clean
+# fork server (or spawn them where there is none) instead.
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_CODES = {"PASS": "P", "FAIL": "F", "NA": "N"}
+_STATUSES = {code: status for status, code in _CODES.items()}
+
+# Asset contexts installed in each worker process by ``_init_worker``.
+_CONTEXTS: List[Dict[str, Any]] = []
+
+
+# name -> (function, volatile)
+Operators = Dict[str, Tuple[Callable[..., Any], bool]]
+
+
+def portable_operators() -> Operators | None:
+    """The registry's custom operators, or ``None`` if one cannot be pickled."""
+
+    operators = {
+        name: (fn, name in OPERATORS.volatile) for name, fn in OPERATORS.custom.items()
+    }
+    try:
+        pickle.dumps(operators)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return None
+    return operators
+
+
+def _init_worker(
+    contexts: List[Dict[str, Any]],
+    orders: Dict[str, Tuple[int, ...]],
+    operators: Operators,
+) -> None:
+    global _CONTEXTS
+    _CONTEXTS = contexts
+    set_operand_orders(orders)
+    for name, (fn, volatile) in operators.items():
+        if OPERATORS.custom.get(name) is not fn:
+            OPERATORS.register(name, fn, volatile=volatile)
+
+
+def _run_shard(shard: Tuple[Any, array]) -> str:
+    from app.services.evaluator import _status
+
+    logic, positions = shard
+    rule = compile_logic(logic)
+    contexts = _CONTEXTS
+    return "".join(_CODES[_status(rule, contexts[i])] for i in positions)
+
+
+def evaluate_parallel(
+    plans: Iterable[ControlPlan],
+    asset_index: AssetIndex,
+    *,
+    workers: int,
+    chunk_size: int = 5000,
+) -> Iterator[Tuple[ControlPlan, List[str]]]:
+    """Evaluate the pending assets of *plans* in *workers* processes.
+
+    Yields ``(plan, statuses)`` in the order of *plans*, like
+    ``evaluator._evaluate_serial``.  Each plan's pending assets are split into
+    shards of at most *chunk_size* assets.  Raises ``ValueError`` if a custom
+    operator cannot be sent to the workers (see :func:`portable_operators`).
+    """
+
+    operators = portable_operators()
+    if operators is None:
+        raise ValueError("Custom operators cannot be pickled for worker processes")
+
+    from app.services.evaluator import _build_context
+
+    cached = asset_index.cached_assets()
+    positions = {id(asset): i for i, asset in enumerate(cached)}
+    contexts = [_build_context(asset) for asset in cached]
+
+    submitted: List[Tuple[ControlPlan, int]] = []
+    shards: List[Tuple[Any, array]] = []
+    for plan in plans:
+        idx = array("l", (positions[id(asset)] for asset in plan.pending()))
+        count = 0
+        for start in range(0, len(idx), chunk_size):
+            shards.append((plan.control.logic, idx[start : start + chunk_size]))
+            count += 1
+        submitted.append((plan, count))
+
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=_MP_CONTEXT,
+        initializer=_init_worker,
+        initargs=(contexts, operand_orders(), operators),
+    )
+    try:
+        outcomes = pool.map(_run_shard, shards)
+        for plan, count in submitted:
+            codes = "".join(next(outcomes) for _ in range(count))
+            yield plan, [_STATUSES[code] for code in codes]
+    finally:
+        # Drop queued shards if the consumer stops early (e.g. cancellation).
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+__all__ = ["evaluate_parallel", "portable_operators"]
@@ -0,0 +1,121 @@
+"""Load only the ``config`` fields the controls of a run read.
+
+:func:`rule_compiler.referenced_paths` collects each control's ``var`` and
+``exists`` paths; :class:`ConfigProjection` merges the ``config.*`` ones into
+a tree of keys.  ``AssetIndex`` then loads every asset's ``config`` reduced to
+those sub-fields -- built with JSONB operators on PostgreSQL, pruned in
+Python right after loading elsewhere -- so memory and transfer scale with the
+referenced fields rather than the size of the stored document.
+
+Pruning keeps every value a projected path can reach (and any non-object
+value met on the way), so walking such a path over the pruned document gives
+the same value, or the same ``KeyError``, as over the full one.
+"""
+
+from __future__ import annotations
+
+from functools import reduce
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import String, case, func, literal
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.services.rule_compiler import referenced_paths
+
+# Tree value marking a key whose whole value is kept.
+_LEAF = None
+
+_Tree = Dict[str, Any]
+
+
+def _merge(tree: _Tree, parts: List[str]) -> None:
+    key, rest = parts[0], parts[1:]
+    if not rest:
+        tree[key] = _LEAF
+        return
+    if key in tree and tree[key] is _LEAF:
+        return
+    _merge(tree.setdefault(key, {}), rest)
+
+
+def _prune(doc: Dict[str, Any], tree: _Tree) -> Dict[str, Any]:
+    out = {}
+    for key, sub in tree.items():
+        if key in doc:
+            value = doc[key]
+            out[key] = _prune(value, sub) if sub is not _LEAF and isinstance(value, dict) else value
+    return out
+
+
+def _jsonb_project(doc: Any, tree: _Tree) -> Any:
+    parts = []
+    for key, sub in tree.items():
+        value = doc.op("->", return_type=JSONB)(literal(key, String))
+        kept = value
+        if sub is not _LEAF:
+            kept = case(
+                (func.jsonb_typeof(value) == "object", _jsonb_project(value, sub)),
+                else_=value,
+            )
+        parts.append(
+            case(
+                (value.is_not(None), func.jsonb_build_object(literal(key, String), kept)),
+                else_=func.jsonb_build_object(),
+            )
+        )
+    if not parts:
+        return func.jsonb_build_object()
+    return reduce(lambda a, b: a.op("||", return_type=JSONB)(b), parts)
+
+
+class ConfigProjection:
+    """The ``config`` sub-fields a set of controls can read."""
+
+    def __init__(self, paths: Iterable[str]) -> None:
+        self.tree: _Tree = {}
+        for path in sorted(paths):
+            _merge(self.tree, path.split("."))
+
+    @classmethod
+    def for_logics(cls, logics: Iterable[Any]) -> "ConfigProjection | None":
+        """Return the projection for *logics*, or ``None`` if the full
+        ``config`` may be read (see :func:`referenced_paths`)."""
+
+        paths = set()
+        for logic in logics:
+            found = referenced_paths(logic)
+            if found is None or "config" in found:
+                return None
+            paths.update(p[len("config."):] for p in found if p.startswith("config."))
+        return cls(paths)
+
+    def paths(self) -> List[str]:
+        out: List[str] = []
+
+        def walk(tree: _Tree, prefix: str) -> None:
+            for key, sub in tree.items():
+                if sub is _LEAF:
+                    out.append(prefix + key)
+                else:
+                    walk(sub, f"{prefix}{key}.")
+
+        walk(self.tree, "")
+        return sorted(out)
+
+    def prune(self, config: Any) -> Any:
+        """Return *config* reduced to the projected fields."""
+
+        if not isinstance(config, dict):
+            return config
+        return _prune(config, self.tree)
+
+    def jsonb(self, doc: Any) -> Any:
+        """SQL expression for ``prune(doc)`` on PostgreSQL (*doc* is ``jsonb``)."""
+
+        return case(
+            (func.jsonb_typeof(doc) == "object", _jsonb_project(doc, self.tree)),
+            else_=doc,
+        )
+
+
+__all__ = ["ConfigProjection"]
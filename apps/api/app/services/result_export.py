@@ -0,0 +1,218 @@
+"""Stream result exports as CSV, JSON or NDJSON.
+
+Only the exported columns of the results are selected, and they are read
+through a server-side cursor (``yield_per``) in chunks of
+``RESULTS_EXPORT_CHUNK_ROWS`` rows.  Each chunk is encoded into one piece of
+the response -- with ``orjson`` when it is installed -- so memory stays flat
+however large the run is.  The JSON export is the ``{"run_id", "results",
+"controls"}`` bundle written incrementally; only the metadata of the
+controls seen so far is kept for the trailing ``controls`` array.
+
+:func:`gzip_chunks` compresses the stream on the fly at
+``RESULTS_EXPORT_GZIP_LEVEL`` for clients that send
+``Accept-Encoding: gzip``.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+from sqlalchemy.orm import Query, Session
+
+from app.models import results as result_m
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+CHUNK_ROWS = int(os.getenv("RESULTS_EXPORT_CHUNK_ROWS", "5000"))
+GZIP_LEVEL = int(os.getenv("RESULTS_EXPORT_GZIP_LEVEL", "6"))
+
+FIELDS = (
+    "run_id",
+    "evaluated_at",
+    "status",
+    "severity",
+    "category",
+    "framework_ids",
+    "control_id",
+    "control_title",
+    "asset_id",
+    "asset_type",
+    "cloud",
+    "region",
+    "env",
+    "evidence_source",
+    "evidence_pointer",
+    "fix",
+)
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _columns() -> List[Any]:
+    Result = result_m.Result
+    return [
+        Result.run_id,
+        Result.evaluated_at,
+        Result.status,
+        Result.severity,
+        Result.category,
+        Result.frameworks,
+        Result.control_id,
+        Result.control_title,
+        Result.asset_id,
+        Result.asset_type,
+        Result.cloud,
+        Result.region,
+        Result.env,
+        Result.evidence,
+        Result.fix,
+    ]
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def chunks(
+    session: Session, query: Query, chunk_rows: int | None = None
+) -> Iterator[Sequence[Any]]:
+    """Yield the export rows of a results query in chunks."""
+
+    stmt = query.with_entities(*_columns()).statement
+    result = session.execute(
+        stmt.execution_options(yield_per=chunk_rows or CHUNK_ROWS)
+    )
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def _record(row: Sequence[Any]) -> Dict[str, Any]:
+    evidence = row[13] or {}
+    return {
+        "run_id": row[0],
+        "evaluated_at": row[1].isoformat(),
+        "status": row[2],
+        "severity": row[3],
+        "category": row[4],
+        "framework_ids": row[5],
+        "control_id": row[6],
+        "control_title": row[7],
+        "asset_id": row[8],
+        "asset_type": row[9],
+        "cloud": row[10],
+        "region": row[11],
+        "env": row[12],
+        "evidence_source": evidence.get("source"),
+        "evidence_pointer": evidence.get("pointer"),
+        "fix": (row[14] or {}).get("short"),
+    }
+
+
+def encode_csv(rows: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(FIELDS)
+    for chunk in rows:
+        for row in chunk:
+            record = _record(row)
+            record["framework_ids"] = "|".join(record["framework_ids"] or [])
+            writer.writerow(record.values())
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate(0)
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+def encode_ndjson(rows: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+    for chunk in rows:
+        if chunk:
+            yield b"\n".join(dumps(_record(row)) for row in chunk) + b"\n"
+
+
+def encode_json(rows: Iterable[Sequence[Any]], run_id: str) -> Iterator[bytes]:
+    yield b'{"run_id":' + dumps(run_id) + b',"results":['
+    controls: Dict[str, Dict[str, Any]] = {}
+    first = True
+    for chunk in rows:
+        if not chunk:
+            continue
+        for row in chunk:
+            if row[6] not in controls:
+                controls[row[6]] = {
+                    "control_id": row[6],
+                    "title": row[7],
+                    "category": row[4],
+                    "severity": row[3],
+                }
+        # One array encodes faster than a dump per row; drop its brackets.
+        body = dumps([_record(row) for row in chunk])[1:-1]
+        yield body if first else b"," + body
+        first = False
+    yield b'],"controls":' + dumps(list(controls.values())) + b"}"
+
+
+def encode(
+    fmt: str, rows: Iterable[Sequence[Any]], run_id: str = ""
+) -> Iterator[bytes]:
+    if fmt == "csv":
+        return encode_csv(rows)
+    if fmt == "ndjson":
+        return encode_ndjson(rows)
+    return encode_json(rows, run_id)
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """Whether an ``Accept-Encoding`` header allows a gzip response."""
+
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "x-gzip"):
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def gzip_chunks(data: Iterable[bytes], level: int | None = None) -> Iterator[bytes]:
+    compressor = zlib.compressobj(
+        GZIP_LEVEL if level is None else level, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+    )
+    for piece in data:
+        out = compressor.compress(piece)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+__all__ = [
+    "CHUNK_ROWS",
+    "FIELDS",
+    "MEDIA_TYPES",
+    "accepts_gzip",
+    "chunks",
+    "dumps",
+    "encode",
+    "gzip_chunks",
+]
@@ -0,0 +1,149 @@
+"""Bulk writers for evaluation results.
+
+``run_evaluation`` feeds plain row tuples (see :data:`COLUMNS`) to a sink
+instead of building one ORM ``Result`` per (control, asset) pair.  Rows are
+buffered and written in batches: Postgres streams each batch with
+``COPY ... FROM STDIN``, other databases use a Core ``insert()`` executemany.
+By default everything is written inside the caller's transaction and only
+committed by the caller, once per run.
+"""
+
+from __future__ import annotations
+
+import abc
+import io
+import json
+from typing import Any, List, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models import results as result_m
+
+COLUMNS = (
+    "run_id",
+    "control_id",
+    "control_title",
+    "asset_id",
+    "status",
+    "severity",
+    "frameworks",
+    "evidence",
+    "fix",
+    "meta",
+    "asset_type",
+    "cloud",
+    "region",
+    "env",
+    "category",
+)
+_JSON_COLUMNS = {"frameworks", "evidence", "fix", "meta"}
+
+ResultRow = Tuple[Any, ...]
+
+
+class ResultSink(abc.ABC):
+    """Buffer result rows and write them in batches of *batch_size*.
+
+    With *commit_batches* the session is committed after every batch, which
+    makes partial results visible during long runs at the cost of many small
+    transactions.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        *,
+        batch_size: int = 5000,
+        commit_batches: bool = False,
+    ) -> None:
+        self.session = session
+        self.batch_size = max(1, batch_size)
+        self.commit_batches = commit_batches
+        self.rows_written = 0
+        self.batches = 0
+        self._buffer: List[ResultRow] = []
+
+    def add(self, row: ResultRow) -> None:
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def extend(self, rows: List[ResultRow]) -> None:
+        for row in rows:
+            self.add(row)
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        self._write(rows)
+        self.rows_written += len(rows)
+        self.batches += 1
+        if self.commit_batches:
+            self.session.commit()
+
+    def close(self) -> None:
+        self.flush()
+
+    @abc.abstractmethod
+    def _write(self, rows: List[ResultRow]) -> None:
+        """Write one batch of *rows* in the session's transaction."""
+
+
+class InsertResultSink(ResultSink):
+    """Batched Core ``INSERT`` (executemany); works on every dialect."""
+
+    def _write(self, rows: List[ResultRow]) -> None:
+        self.session.execute(
+            insert(result_m.Result.__table__),
+            [dict(zip(COLUMNS, row)) for row in rows],
+        )
+
+
+def _csv_field(column: str, value: Any) -> str:
+    if column in _JSON_COLUMNS:
+        value = json.dumps(value, separators=(",", ":"))
+    elif value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class CopyResultSink(ResultSink):
+    """Stream batches into Postgres with ``COPY results FROM STDIN``."""
+
+    _sql = "COPY results ({}) FROM STDIN WITH (FORMAT csv)".format(", ".join(COLUMNS))
+
+    def _write(self, rows: List[ResultRow]) -> None:
+        buf = io.StringIO()
+        for row in rows:
+            buf.write(",".join(_csv_field(c, v) for c, v in zip(COLUMNS, row)))
+            buf.write("\n")
+        buf.seek(0)
+        cursor = self.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(self._sql, buf)
+        finally:
+            cursor.close()
+
+
+def make_result_sink(
+    session: Session, *, batch_size: int = 5000, commit_batches: bool = False
+) -> ResultSink:
+    """Return the fastest sink available for *session*'s database."""
+
+    bind = session.get_bind()
+    if bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2":
+        cls: type[ResultSink] = CopyResultSink
+    else:
+        cls = InsertResultSink
+    return cls(session, batch_size=batch_size, commit_batches=commit_batches)
+
+
+__all__ = [
+    "COLUMNS",
+    "ResultSink",
+    "InsertResultSink",
+    "CopyResultSink",
+    "make_result_sink",
+]
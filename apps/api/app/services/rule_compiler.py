@@ -0,0 +1,481 @@
+"""Compile control JsonLogic into nested Python closures.
+
+The evaluator used to re-walk each control's ``logic`` dict for every asset.
+``compile_logic`` performs that walk once: operator dispatch is resolved up
+front, ``var`` paths are pre-split, constant sub-expressions are folded and
+constant ``regex`` patterns are pre-compiled.  The resulting callable takes the
+asset context dict and behaves exactly like ``evaluator._evaluate`` -- a missing
+``var`` still raises ``KeyError`` (reported as ``NA``) and anything the compiler
+does not understand is delegated to the interpreter unchanged.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from typing import Any, Callable, Dict, List, Sequence, Set, Tuple
+
+from packages.rules.operators import NA, OPERATORS
+
+CompiledRule = Callable[[Dict[str, Any]], Any]
+
+# (is_constant, payload) -- payload is the folded value or a callable
+_Node = Tuple[bool, Any]
+
+_CACHE: Dict[str, CompiledRule] = {}
+_CACHE_MAX = 4096
+
+_evaluate_na = OPERATORS.evaluator(NA)
+
+# and/or node hash -> operand evaluation order, see ``set_operand_orders``
+_ORDERS: Dict[str, Tuple[int, ...]] = {}
+
+_KNOWN_OPS = {
+    "var",
+    "exists",
+    "regex",
+    "contains",
+    "==",
+    "!=",
+    ">",
+    ">=",
+    "<",
+    "<=",
+    "in",
+    "and",
+    "or",
+    "!",
+}
+
+_COMPARATORS: Dict[str, Callable[[Any, Any], Any]] = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    "in": lambda a, b: a in b,
+}
+
+
+def logic_hash(logic: Any) -> str:
+    """Return a stable content hash for *logic*.
+
+    Key order is preserved because only the first key of a JsonLogic node is
+    significant.
+    """
+
+    raw = json.dumps(logic, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _interpret(rule: Any) -> CompiledRule:
+    return lambda data: _evaluate_na(rule, data)
+
+
+def _compile_path(path: str) -> CompiledRule:
+    parts = tuple(path.split("."))
+
+    if len(parts) == 1:
+        key = parts[0]
+
+        def get_one(data: Dict[str, Any]) -> Any:
+            if key in data:
+                return data[key]
+            raise KeyError(path)
+
+        return get_one
+
+    def get_path(data: Dict[str, Any]) -> Any:
+        current: Any = data
+        for part in parts:
+            if isinstance(current, dict) and part in current:
+                current = current[part]
+            else:
+                raise KeyError(path)
+        return current
+
+    return get_path
+
+
+def _as_callable(node: _Node) -> CompiledRule:
+    is_const, payload = node
+    if is_const:
+        return lambda data: payload
+    return payload
+
+
+def _compile_node(rule: Any, memo: Any = None) -> _Node:
+    node = _compile_op(rule, memo)
+    if memo is not None and not node[0]:
+        return False, memo.wrap(rule, node[1])
+    return node
+
+
+def _compile_op(rule: Any, memo: Any) -> _Node:
+    if not isinstance(rule, dict) or not rule:
+        return True, rule
+    op, values = next(iter(rule.items()))
+
+    if op not in _KNOWN_OPS:
+        custom = OPERATORS.custom.get(op)
+        if custom is None:
+            return False, lambda data: _evaluate_na(rule, data)
+        return _compile_custom(custom, values, memo)
+
+    if op in ("var", "exists"):
+        if not isinstance(values, str):
+            return False, _interpret(rule)
+        getter = _compile_path(values)
+        if op == "var":
+            return False, getter
+
+        def exists(data: Dict[str, Any]) -> bool:
+            try:
+                getter(data)
+                return True
+            except KeyError:
+                return False
+
+        return False, exists
+
+    if op == "!":
+        is_const, payload = _compile_node(values, memo)
+        if is_const:
+            return True, not payload
+        return False, lambda data: not payload(data)
+
+    if op in ("and", "or"):
+        if not isinstance(values, list):
+            return False, _interpret(rule)
+        return _compile_bool(op, values, memo)
+
+    if not isinstance(values, list) or len(values) < 2:
+        return False, _interpret(rule)
+
+    if op == "regex":
+        return _compile_regex(values, memo)
+
+    if op == "contains":
+        arr_node = _compile_node(values[0], memo)
+        val_node = _compile_node(values[1], memo)
+        return _compile_binary(arr_node, val_node, lambda arr, val: val in arr)
+
+    if len(values) != 2:
+        # ``a, b = values`` raises at evaluation time; keep that behaviour.
+        return False, _interpret(rule)
+    return _compile_binary(
+        _compile_node(values[0], memo),
+        _compile_node(values[1], memo),
+        _COMPARATORS[op],
+    )
+
+
+def _compile_binary(
+    left: _Node, right: _Node, fn: Callable[[Any, Any], Any]
+) -> _Node:
+    if left[0] and right[0]:
+        try:
+            return True, fn(left[1], right[1])
+        except Exception:  # leave the error for evaluation time
+            pass
+    if right[0]:
+        lf, rv = _as_callable(left), right[1]
+        return False, lambda data: fn(lf(data), rv)
+    if left[0]:
+        lv, rf = left[1], right[1]
+        return False, lambda data: fn(lv, rf(data))
+    lf, rf = left[1], right[1]
+    return False, lambda data: fn(lf(data), rf(data))
+
+
+def _compile_custom(fn: Callable[..., Any], values: Any, memo: Any) -> _Node:
+    # Never folded: custom operators may depend on more than their arguments
+    # (``days_since`` reads the clock).
+    args = tuple(
+        _as_callable(_compile_node(value, memo))
+        for value in (values if isinstance(values, list) else [values])
+    )
+    return False, lambda data: fn(*[arg(data) for arg in args])
+
+
+def _compile_regex(values: List[Any], memo: Any) -> _Node:
+    val_node = _compile_node(values[0], memo)
+    pat_node = _compile_node(values[1], memo)
+    if pat_node[0]:
+        try:
+            search = re.compile(str(pat_node[1])).search
+        except re.error:
+            # Invalid patterns must only fail for assets that reach them.
+            search = None
+        if search is not None:
+            if val_node[0]:
+                return True, bool(search(str(val_node[1])))
+            vf = val_node[1]
+            return False, lambda data: bool(search(str(vf(data))))
+    vf = _as_callable(val_node)
+    pf = _as_callable(pat_node)
+
+    def regex(data: Dict[str, Any]) -> bool:
+        val = vf(data)
+        return bool(re.search(str(pf(data)), str(val)))
+
+    return False, regex
+
+
+def _compile_bool(op: str, values: List[Any], memo: Any) -> _Node:
+    # ``all`` stops at the first falsy operand and ``any`` at the first truthy
+    # one; constants that cannot stop evaluation are dropped and a constant
+    # that does stop it truncates the operand list.
+    stop_on = op == "or"
+    funcs: List[CompiledRule] = []
+    positions: List[int] = []
+    for position, value in enumerate(values):
+        is_const, payload = _compile_node(value, memo)
+        if not is_const:
+            funcs.append(payload)
+            positions.append(position)
+            continue
+        if bool(payload) == stop_on:
+            if not funcs:
+                return True, stop_on
+            terminal = stop_on
+            prefix = tuple(funcs)
+
+            def run_prefix(data: Dict[str, Any]) -> bool:
+                for fn in prefix:
+                    if bool(fn(data)) == terminal:
+                        return terminal
+                return terminal
+
+            return False, run_prefix
+    if not funcs:
+        return True, not stop_on
+    if len(funcs) == 1:
+        only = funcs[0]
+        return False, lambda data: bool(only(data))
+    order = _ORDERS.get(logic_hash({op: values})) if _ORDERS else None
+    if order is not None and sorted(order) == list(range(len(values))):
+        order = tuple(positions.index(i) for i in order if i in positions)
+        if order != tuple(range(len(funcs))):
+            return False, _compile_ordered(
+                stop_on, funcs, order, [values[i] for i in positions]
+            )
+    ops = tuple(funcs)
+    if stop_on:
+        return False, lambda data: any(fn(data) for fn in ops)
+    return False, lambda data: all(fn(data) for fn in ops)
+
+
+def raise_free_paths(rule: Any) -> Set[str] | None:
+    """Return the ``var`` paths whose absence is the only way *rule* can raise.
+
+    ``None`` means *rule* may raise something else (an ordering comparison,
+    ``in`` over a value that is not a list, an invalid pattern, ...).
+    """
+
+    if not isinstance(rule, dict) or not rule:
+        return set()
+    op, values = next(iter(rule.items()))
+    if op in ("var", "exists"):
+        if not isinstance(values, str):
+            return None
+        return {values} if op == "var" else set()
+    if op == "!":
+        return raise_free_paths(values)
+    if not isinstance(values, list):
+        return None
+    operands: List[Any]
+    if op in ("and", "or"):
+        operands = values
+    elif op in ("==", "!=") and len(values) == 2:
+        operands = values
+    elif op == "in" and len(values) == 2 and isinstance(values[1], list):
+        operands = values[:1]
+    elif op == "contains" and len(values) >= 2 and isinstance(values[0], list):
+        operands = values[1:2]
+    elif op == "regex" and len(values) >= 2 and not isinstance(values[1], dict):
+        try:
+            re.compile(str(values[1]))
+        except re.error:
+            return None
+        operands = values[:1]
+    else:
+        return None
+    paths: Set[str] = set()
+    for operand in operands:
+        found = raise_free_paths(operand)
+        if found is None:
+            return None
+        paths |= found
+    return paths
+
+
+def _compile_ordered(
+    stop_on: bool, funcs: List[CompiledRule], order: Tuple[int, ...], rules: List[Any]
+) -> CompiledRule:
+    """``any``/``all`` over *funcs* evaluated in *order*, with file-order results.
+
+    In file order the first operand that stops evaluation (or raises) decides.
+    When a reordered operand decides, the operands before it in file order
+    that were not evaluated yet run first, in file order.  Those that cannot
+    raise for this asset are skipped unless an operand after them may raise.
+    """
+
+    checks: List[CompiledRule | None] = []
+    for rule in rules:
+        paths = raise_free_paths(rule)
+        if paths is None:
+            checks.append(None)
+            continue
+        getters = tuple(_compile_path(path) for path in sorted(paths))
+
+        def present(data: Dict[str, Any], getters=getters) -> bool:
+            try:
+                for getter in getters:
+                    getter(data)
+            except KeyError:
+                return False
+            return True
+
+        checks.append(present)
+
+    def settle(data: Dict[str, Any], k: int, seen: int, exc: Exception | None) -> bool:
+        skipped: List[int] = []
+        for i in range(k):
+            if seen >> i & 1:
+                continue
+            check = checks[i]
+            if exc is None and check is not None and check(data):
+                skipped.append(i)
+                continue
+            # Operand ``i`` may raise, so it only runs if none before it stops.
+            for j in skipped:
+                if bool(funcs[j](data)) == stop_on:
+                    return stop_on
+            skipped = []
+            if bool(funcs[i](data)) == stop_on:
+                return stop_on
+        if exc is not None:
+            raise exc
+        return stop_on
+
+    def ordered(data: Dict[str, Any]) -> bool:
+        seen = 0
+        for i in order:
+            try:
+                value = funcs[i](data)
+            except Exception as exc:
+                return settle(data, i, seen, exc)
+            if bool(value) == stop_on:
+                return settle(data, i, seen, None)
+            seen |= 1 << i
+        return not stop_on
+
+    return ordered
+
+
+def compile_logic(logic: Any, memo: Any = None) -> CompiledRule:
+    """Return a callable evaluating *logic* against an asset context.
+
+    Compiled rules are cached by :func:`logic_hash`, so controls expanded from
+    the same template share a single closure.  With *memo* (see
+    ``shared_expressions.SharedExpressions``) every compiled sub-expression
+    is passed through ``memo.wrap(rule, fn)`` and the result is not cached.
+    """
+
+    if memo is not None:
+        return _as_callable(_compile_node(logic, memo))
+    key = logic_hash(logic)
+    compiled = _CACHE.get(key)
+    if compiled is None:
+        compiled = _as_callable(_compile_node(logic))
+        if len(_CACHE) >= _CACHE_MAX:
+            _CACHE.clear()
+        _CACHE[key] = compiled
+    return compiled
+
+
+def operator_counts(logic: Any) -> Dict[str, int]:
+    """Return how often each operator occurs in *logic*.
+
+    This is a static count: short-circuiting ``and``/``or`` may skip some of
+    these operators for a given asset.
+    """
+
+    counts: Dict[str, int] = {}
+    stack = [logic]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict) and node:
+            op, values = next(iter(node.items()))
+            counts[op] = counts.get(op, 0) + 1
+            if op not in ("var", "exists"):
+                stack.append(values)
+    return counts
+
+
+def referenced_paths(logic: Any) -> Set[str] | None:
+    """Return every ``var``/``exists`` path *logic* can read.
+
+    Returns ``None`` when that cannot be determined statically (a ``var``
+    whose argument is not a plain path, or an operator the compiler does
+    not know), in which case callers must assume the whole context is read.
+    """
+
+    paths: Set[str] = set()
+    stack = [logic]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict) and node:
+            op, values = next(iter(node.items()))
+            if op not in _KNOWN_OPS and op not in OPERATORS.custom:
+                return None
+            if op in ("var", "exists"):
+                if not isinstance(values, str):
+                    return None
+                paths.add(values)
+            else:
+                stack.append(values)
+    return paths
+
+
+def set_operand_orders(orders: Dict[str, Sequence[int]]) -> None:
+    """Evaluate the operands of matching and/or nodes in the given order.
+
+    *orders* maps :func:`logic_hash` of an ``and``/``or`` node to a
+    permutation of its operand positions.  Results are unchanged; only the
+    evaluation order (and so the cost) differs.
+    """
+
+    new = {key: tuple(order) for key, order in orders.items()}
+    if new != _ORDERS:
+        _ORDERS.clear()
+        _ORDERS.update(new)
+        _CACHE.clear()
+
+
+def operand_orders() -> Dict[str, Tuple[int, ...]]:
+    return dict(_ORDERS)
+
+
+def clear_cache() -> None:
+    _CACHE.clear()
+
+
+__all__ = [
+    "CompiledRule",
+    "compile_logic",
+    "logic_hash",
+    "operator_counts",
+    "raise_free_paths",
+    "referenced_paths",
+    "operand_orders",
+    "set_operand_orders",
+    "clear_cache",
+]
@@ -0,0 +1,169 @@
+"""Apply a rule pack's controls to the ``controls`` table as a diff.
+
+Each control row carries a ``content_hash`` of the columns a pack sets.
+Applying a pack reads only ``(control_id, content_hash)`` for the existing
+rows, classifies every control as added, changed, removed or unchanged, and
+writes just the difference: a bulk insert, an ``executemany`` update keyed by
+``control_id`` and chunked deletes.  Unchanged and changed rows keep their
+primary key, so the exceptions referencing them (``ON DELETE CASCADE``)
+survive an upgrade; only removed controls take their exceptions with them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import controls as control_m
+
+# Columns a rule pack sets, in hashing order.
+CONTENT_COLUMNS = (
+    "title",
+    "category",
+    "severity",
+    "applies_to",
+    "logic",
+    "frameworks",
+    "fix",
+)
+
+
+@dataclass
+class ControlDiff:
+    """Control ids added, changed and removed by an apply."""
+
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    # stored rows that had no content hash
+    unhashed: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "added": len(self.added),
+            "changed": len(self.changed),
+            "removed": len(self.removed),
+            "unchanged": self.unchanged,
+        }
+
+
+def control_row(control: Dict[str, Any]) -> Dict[str, Any]:
+    """Column values for an expanded pack *control*, hash included."""
+
+    row = {
+        "control_id": control["control_id"],
+        "title": control["title"],
+        "category": control.get("category", ""),
+        "severity": control.get("severity", ""),
+        "applies_to": control.get("applies_to", {}),
+        "logic": control.get("logic", {}),
+        "frameworks": control.get("frameworks", []),
+        "fix": control.get("fix", {}),
+    }
+    row["content_hash"] = content_hash(row)
+    return row
+
+
+def content_hash(row: Any) -> str:
+    """SHA-256 of the content columns of *row* (a dict or a ``Control``)."""
+
+    get = row.get if isinstance(row, dict) else lambda k: getattr(row, k)
+    # Key order is kept: only a node's first key is its operator.
+    raw = json.dumps(
+        [get(k) for k in CONTENT_COLUMNS], separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def diff_controls(session: Session, rows: List[Dict[str, Any]]) -> ControlDiff:
+    """Compare pack *rows* (from :func:`control_row`) with the stored controls."""
+
+    Control = control_m.Control
+    stored: Dict[str, str | None] = dict(
+        session.execute(select(Control.control_id, Control.content_hash)).all()
+    )
+    unhashed = [cid for cid, h in stored.items() if h is None]
+    if unhashed:
+        # Rows written outside a pack apply (or before hashes existed).
+        for ctrl in session.scalars(select(Control).where(Control.control_id.in_(unhashed))):
+            stored[ctrl.control_id] = content_hash(ctrl)
+    diff = ControlDiff(unhashed=unhashed)
+    for row in rows:
+        cid = row["control_id"]
+        if cid not in stored:
+            diff.added.append(cid)
+        elif stored[cid] != row["content_hash"]:
+            diff.changed.append(cid)
+        else:
+            diff.unchanged += 1
+    seen = {row["control_id"] for row in rows}
+    diff.removed = [cid for cid in stored if cid not in seen]
+    return diff
+
+
+def apply_controls(
+    session: Session, controls: List[Dict[str, Any]], batch_size: int = 1000
+) -> ControlDiff:
+    """Make the ``controls`` table match *controls* (not committed).
+
+    Raises ``ValueError`` if two controls share a ``control_id``.
+    """
+
+    rows = [control_row(c) for c in controls]
+    by_id = {row["control_id"]: row for row in rows}
+    if len(by_id) != len(rows):
+        counts = Counter(row["control_id"] for row in rows)
+        dupes = sorted(cid for cid, n in counts.items() if n > 1)
+        raise ValueError(f"Duplicate control ids: {', '.join(dupes[:5])}")
+    diff = diff_controls(session, rows)
+    table = control_m.Control.__table__
+    for chunk in _chunks(diff.removed, batch_size):
+        session.execute(delete(table).where(table.c.control_id.in_(chunk)))
+    # Bind names must differ from column names in an executemany UPDATE.
+    changed = [{f"b_{k}": v for k, v in by_id[cid].items()} for cid in diff.changed]
+    stmt = (
+        update(table)
+        .where(table.c.control_id == bindparam("b_control_id"))
+        .values({k: bindparam(f"b_{k}") for k in (*CONTENT_COLUMNS, "content_hash")})
+    )
+    for chunk in _chunks(changed, batch_size):
+        session.execute(stmt, chunk)
+    # Unchanged rows with no stored hash get one, so later diffs skip them.
+    skip = set(diff.changed)
+    backfill = [
+        {"b_control_id": cid, "b_content_hash": by_id[cid]["content_hash"]}
+        for cid in diff.unhashed
+        if cid in by_id and cid not in skip
+    ]
+    stmt = (
+        update(table)
+        .where(table.c.control_id == bindparam("b_control_id"))
+        .values(content_hash=bindparam("b_content_hash"))
+    )
+    for chunk in _chunks(backfill, batch_size):
+        session.execute(stmt, chunk)
+    for chunk in _chunks([by_id[cid] for cid in diff.added], batch_size):
+        session.execute(insert(table), chunk)
+    return diff
+
+
+__all__ = [
+    "CONTENT_COLUMNS",
+    "ControlDiff",
+    "apply_controls",
+    "content_hash",
+    "control_row",
+    "diff_controls",
+]
@@ -0,0 +1,190 @@
+"""Precompiled rule-pack artifacts stored beside each pack tarball.
+
+Parsing a pack means extracting the tarball, loading every YAML file,
+expanding the templates and validating the mappings.  The outcome of that
+work is saved next to ``<version>.tar.gz`` as ``<version>.pack.gz``: the
+expanded controls, the parsed mappings and the control -> requirement index,
+as gzipped JSON.  Rollback and startup load it instead of re-parsing the
+pack.  The artifact is plain data -- nothing in it is ever executed -- and
+the meta is re-read from the signed ``meta.yaml`` it carries.
+
+An artifact is only used when its HMAC (keyed with ``SECRET_KEY``) matches,
+it was written by this format version, built from the exact tarball beside
+it (SHA-256) and the pack's meta signature still verifies; otherwise callers
+fall back to parsing the tarball.  Packs whose content is not JSON-able get
+no artifact.
+"""
+
+from __future__ import annotations
+
+import gc
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List
+
+from packages.shared.crypto import verify_signature
+
+from app.core.config import settings
+from app.services.rule_compiler import compile_logic
+from app.services.rulepack_reader import load_yaml
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = 2
+SUFFIX = ".pack.gz"
+
+
+@dataclass
+class CompiledPack:
+    """A validated rule pack, ready to apply."""
+
+    meta: Dict[str, Any]
+    controls: List[Dict[str, Any]]
+    frameworks: List[str]
+    # mapping file name (e.g. "pci") -> parsed YAML
+    mappings: Dict[str, Any] = field(default_factory=dict)
+    # control_id -> [[MAPPING, requirement_id], ...]
+    requirements: Dict[str, List[List[str]]] = field(default_factory=dict)
+    meta_yaml: str = ""
+    meta_sig: str = ""
+    source_sha256: str = ""
+
+    @property
+    def version(self) -> str:
+        return self.meta["version"]
+
+
+def requirement_index(mappings: Dict[str, Any]) -> Dict[str, List[List[str]]]:
+    """Map each control id to the ``[MAPPING, requirement_id]`` pairs citing it."""
+
+    index: Dict[str, List[List[str]]] = {}
+    for name, data in sorted(mappings.items()):
+        for item in data if isinstance(data, list) else [data]:
+            if not isinstance(item, dict):
+                continue
+            for cid in item.get("mapped_controls", []):
+                index.setdefault(cid, []).append([name.upper(), str(item.get("requirement_id"))])
+    return index
+
+
+def artifact_path(directory: Path, version: str) -> Path:
+    return directory / f"{version}{SUFFIX}"
+
+
+def _sign(body: bytes) -> str:
+    return hmac.new(settings.SECRET_KEY.encode(), body, hashlib.sha256).hexdigest()
+
+
+def _encode(pack: CompiledPack) -> bytes:
+    # Controls expanded from one template share its ``logic`` object; it is
+    # stored once and controls refer to it by index.
+    logics: Dict[int, int] = {}
+    table: List[Any] = []
+    controls = []
+    for control in pack.controls:
+        logic = control.get("logic")
+        if id(logic) not in logics:
+            logics[id(logic)] = len(table)
+            table.append(logic)
+        controls.append({**control, "logic": logics[id(logic)]})
+    body = {
+        "format": ARTIFACT_FORMAT,
+        "version": pack.version,
+        "meta_yaml": pack.meta_yaml,
+        "meta_sig": pack.meta_sig,
+        "source_sha256": pack.source_sha256,
+        "frameworks": pack.frameworks,
+        "mappings": pack.mappings,
+        "requirements": pack.requirements,
+        "logics": table,
+        "controls": controls,
+    }
+    return json.dumps(body, separators=(",", ":")).encode()
+
+
+def save(pack: CompiledPack, directory: Path) -> Path | None:
+    """Write the artifact for *pack* beside its tarball in *directory*.
+
+    Returns ``None`` (and writes nothing) if the pack is not JSON-able.
+    """
+
+    path = artifact_path(directory, pack.version)
+    try:
+        body = _encode(pack)
+    except (TypeError, ValueError) as exc:
+        logger.warning("No rule-pack artifact for %s: %s", pack.version, exc)
+        return None
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(gzip.compress(_sign(body).encode() + b"\n" + body, compresslevel=6))
+    tmp.replace(path)
+    return path
+
+
+def load(directory: Path, version: str) -> CompiledPack | None:
+    """Load the artifact for *version*, or ``None`` if it is missing or not
+    valid for the tarball beside it."""
+
+    path = artifact_path(directory, version)
+    source = directory / f"{version}.tar.gz"
+    if not path.exists() or not source.exists():
+        return None
+    try:
+        mac, body = gzip.decompress(path.read_bytes()).split(b"\n", 1)
+        if not hmac.compare_digest(mac.decode(), _sign(body)):
+            raise ValueError("HMAC mismatch")
+        # Decoding allocates one container per control; skip the cyclic GC
+        # passes that would otherwise trigger many times along the way.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            data = json.loads(body)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        if data.get("format") != ARTIFACT_FORMAT or data.get("version") != version:
+            raise ValueError("format or version mismatch")
+        if data["source_sha256"] != hashlib.sha256(source.read_bytes()).hexdigest():
+            raise ValueError("built from a different tarball")
+        verify_signature(data["meta_yaml"].encode(), data["meta_sig"])
+        logics = data["logics"]
+        controls = [{**c, "logic": logics[c["logic"]]} for c in data["controls"]]
+        meta = load_yaml(data["meta_yaml"])
+    except (OSError, ValueError, KeyError, IndexError, TypeError, EOFError) as exc:
+        logger.warning("Ignoring rule-pack artifact %s: %s", path, exc)
+        return None
+    return CompiledPack(
+        meta=meta,
+        controls=controls,
+        frameworks=data["frameworks"],
+        mappings=data["mappings"],
+        requirements=data["requirements"],
+        meta_yaml=data["meta_yaml"],
+        meta_sig=data["meta_sig"],
+        source_sha256=data["source_sha256"],
+    )
+
+
+def warm(pack: CompiledPack) -> int:
+    """Compile every distinct ``logic`` of *pack* into the compiler cache."""
+
+    # Controls expanded from one template share its ``logic`` object.
+    logics = {id(c.get("logic")): c.get("logic", {}) for c in pack.controls}
+    for logic in logics.values():
+        compile_logic(logic)
+    return len(logics)
+
+
+__all__ = [
+    "ARTIFACT_FORMAT",
+    "CompiledPack",
+    "artifact_path",
+    "load",
+    "requirement_index",
+    "save",
+    "warm",
+]
@@ -0,0 +1,132 @@
+"""Read rule-pack tarballs in memory.
+
+The uploaded bytes are walked once as a tar stream and only the files a
+pack is made of are kept (``rules/meta.yaml``, ``rules/signatures/meta.sig``,
+``rules/expansions.yaml``, ``rules/templates/*.y*ml`` and
+``rules/mappings/*.yaml``); nothing is written to disk.  The meta signature
+is checked as soon as both files have been seen -- and always before any
+YAML is parsed -- so a forged pack is rejected without parsing its rules.
+Members larger than ``RULEPACK_MAX_MEMBER_BYTES``, archives expanding past
+``RULEPACK_MAX_BYTES`` or holding more than ``RULEPACK_MAX_MEMBERS`` entries
+are refused.
+
+YAML is parsed with libyaml's ``CSafeLoader`` when PyYAML was built with it.
+Template files can be parsed in ``RULEPACK_PARSE_WORKERS`` processes.
+"""
+
+from __future__ import annotations
+
+import io
+import multiprocessing
+import os
+import tarfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+import yaml
+
+from packages.shared.crypto import verify_signature
+
+META = "rules/meta.yaml"
+SIGNATURE = "rules/signatures/meta.sig"
+EXPANSIONS = "rules/expansions.yaml"
+TEMPLATES = "rules/templates/"
+MAPPINGS = "rules/mappings/"
+
+MAX_MEMBER_BYTES = int(os.getenv("RULEPACK_MAX_MEMBER_BYTES", str(16 * 1024 * 1024)))
+MAX_TOTAL_BYTES = int(os.getenv("RULEPACK_MAX_BYTES", str(512 * 1024 * 1024)))
+MAX_MEMBERS = int(os.getenv("RULEPACK_MAX_MEMBERS", "100000"))
+
+# ``load_many`` is called from request threads; a forked child could inherit
+# a lock some other thread held at the time.
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_yaml(data: bytes | str) -> Any:
+    return yaml.load(data, Loader=Loader)
+
+
+def _wanted(name: str) -> bool:
+    if name in (META, SIGNATURE, EXPANSIONS):
+        return True
+    for prefix in (TEMPLATES, MAPPINGS):
+        if name.startswith(prefix):
+            rest = name[len(prefix) :]
+            return "/" not in rest and rest.endswith((".yaml", ".yml"))
+    return False
+
+
+def read_pack(
+    data: bytes,
+    max_member_bytes: int | None = None,
+    max_total_bytes: int | None = None,
+    max_members: int | None = None,
+) -> Dict[str, bytes]:
+    """Return ``{member name: bytes}`` for the pack files in tarball *data*.
+
+    Raises ``ValueError`` if the archive is invalid or too large, or if the
+    meta signature is missing or does not verify.
+    """
+
+    max_member_bytes = max_member_bytes or MAX_MEMBER_BYTES
+    max_total_bytes = max_total_bytes or MAX_TOTAL_BYTES
+    max_members = max_members or MAX_MEMBERS
+    files: Dict[str, bytes] = {}
+    verified = False
+    total = 0
+    try:
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r|*") as tar:
+            for count, member in enumerate(tar, 1):
+                if count > max_members:
+                    raise ValueError(f"Rule pack has more than {max_members} members")
+                if not member.isfile():
+                    continue
+                if member.size > max_member_bytes:
+                    raise ValueError(f"Rule-pack member {member.name} is too large")
+                total += member.size
+                if total > max_total_bytes:
+                    raise ValueError("Rule pack is too large")
+                name = member.name[2:] if member.name.startswith("./") else member.name
+                if not _wanted(name):
+                    continue
+                files[name] = tar.extractfile(member).read()
+                if not verified and META in files and SIGNATURE in files:
+                    _verify(files)
+                    verified = True
+    except tarfile.TarError as exc:
+        raise ValueError("Invalid rule-pack archive") from exc
+    if not verified:
+        _verify(files)
+    return files
+
+
+def _verify(files: Dict[str, bytes]) -> None:
+    if META not in files or SIGNATURE not in files:
+        raise ValueError("Missing meta or signature")
+    verify_signature(files[META], files[SIGNATURE].decode().strip())
+
+
+def load_many(blobs: List[bytes], workers: int = 1) -> List[Any]:
+    """Parse each YAML document in *blobs*, in *workers* processes if > 1."""
+
+    if workers <= 1 or len(blobs) < 2:
+        return [load_yaml(blob) for blob in blobs]
+    chunksize = max(1, len(blobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT) as pool:
+        return list(pool.map(load_yaml, blobs, chunksize=chunksize))
+
+
+__all__ = [
+    "EXPANSIONS",
+    "MAPPINGS",
+    "META",
+    "SIGNATURE",
+    "TEMPLATES",
+    "load_many",
+    "load_yaml",
+    "read_pack",
+]
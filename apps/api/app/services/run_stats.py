@@ -0,0 +1,160 @@
+"""Per-run result statistics for ``/results/summary``.
+
+When a run finishes, :func:`write_rollups` counts its results grouped by
+status, severity, cloud, type, env and category -- and per framework -- in
+one SQL ``GROUP BY`` over the run's result rows, and stores the groups in
+``evaluation_result_rollups``.  Summaries filtered only on those dimensions
+are then sums over a few rollup rows; other filters (or runs without
+rollups) are counted with the same ``GROUP BY`` on the live rows.  Either
+way no result row reaches Python.
+
+The framework list of a result is a JSON array, which databases cannot
+group by portably: it is grouped as text and the few distinct lists are
+expanded in Python.
+"""
+
+from __future__ import annotations
+
+import json
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import String, cast, delete, func, insert, select
+from sqlalchemy.orm import Query, Session
+
+from app.models import results as result_m
+from app.models import rollups as rollup_m
+from app.models import runs as run_m
+
+# Dimensions a rollup row is keyed on, besides the framework.
+DIMENSIONS = ("status", "severity", "cloud", "type", "env", "category")
+
+
+def run_rows(session: Session, run_id: str) -> Query:
+    """The run's results, as the results endpoints query them."""
+
+    return session.query(result_m.Result).filter(result_m.Result.run_id == run_id)
+
+
+def _frameworks(text: Any) -> List[str]:
+    if text is None:
+        return []
+    value = json.loads(text) if isinstance(text, str) else text
+    if not isinstance(value, list):
+        return []
+    return [str(fw) for fw in value]
+
+
+def grouped_counts(query: Query) -> Counter:
+    """Count the rows of a :func:`run_rows` query by framework and dimensions.
+
+    Keys are ``(framework, status, severity, cloud, type, env, category)``;
+    ``framework == ""`` keys count every result once, the others every
+    occurrence of that framework in a result's list.
+    """
+
+    Result = result_m.Result
+    groups = (
+        Result.status,
+        Result.severity,
+        Result.cloud,
+        Result.asset_type,
+        Result.env,
+        Result.category,
+        cast(Result.frameworks, String),
+    )
+    counts: Counter = Counter()
+    for *dims, frameworks, count in query.with_entities(
+        *groups, func.count()
+    ).group_by(*groups):
+        dims = tuple(dims)
+        counts[("",) + dims] += count
+        for fw in _frameworks(frameworks):
+            counts[(fw,) + dims] += count
+    return counts
+
+
+def write_rollups(session: Session, run_id: str) -> int:
+    """Store the rollups of *run_id* (not committed); returns the row count."""
+
+    table = rollup_m.ResultRollup.__table__
+    session.execute(delete(table).where(table.c.run_id == run_id))
+    counts = grouped_counts(run_rows(session, run_id))
+    rows = [
+        {
+            "run_id": run_id,
+            "framework": key[0],
+            **dict(zip(DIMENSIONS, key[1:])),
+            "count": n,
+        }
+        for key, n in counts.items()
+    ]
+    for start in range(0, len(rows), 5000):
+        session.execute(insert(table), rows[start : start + 5000])
+    run = session.get(run_m.EvaluationRun, run_id)
+    if run is not None:
+        run.rolled_up_at = datetime.utcnow()
+    return len(rows)
+
+
+def rolled_up(session: Session, run_id: str) -> bool:
+    return (
+        session.scalar(
+            select(run_m.EvaluationRun.rolled_up_at).where(
+                run_m.EvaluationRun.run_id == run_id
+            )
+        )
+        is not None
+    )
+
+
+def rollup_counts(session: Session, run_id: str, filters: Dict[str, Any]) -> Counter:
+    """Like :func:`grouped_counts`, from the stored rollups of *run_id*.
+
+    *filters* maps dimensions (see :data:`DIMENSIONS`) to required values.
+    """
+
+    Rollup = rollup_m.ResultRollup
+    stmt = select(
+        Rollup.framework, *(getattr(Rollup, d) for d in DIMENSIONS), Rollup.count
+    ).where(
+        Rollup.run_id == run_id,
+        *(getattr(Rollup, dim) == value for dim, value in filters.items()),
+    )
+    counts: Counter = Counter()
+    for framework, *dims, count in session.execute(stmt):
+        counts[(framework, *dims)] += count
+    return counts
+
+
+def summarize(
+    counts: Counter, statuses: Iterable[str], severities: Iterable[str]
+) -> Dict[str, Dict[str, int]]:
+    """``by_status``/``by_severity``/``by_framework`` from grouped counts."""
+
+    by_status: Dict[str, int] = dict.fromkeys(statuses, 0)
+    by_severity: Dict[str, int] = dict.fromkeys(severities, 0)
+    by_framework: Dict[str, int] = {}
+    for (framework, status, severity, *_), count in counts.items():
+        if framework:
+            by_framework[framework] = by_framework.get(framework, 0) + count
+            continue
+        by_status[status] = by_status.get(status, 0) + count
+        by_severity[severity] = by_severity.get(severity, 0) + count
+    return {
+        "by_status": by_status,
+        "by_severity": by_severity,
+        "by_framework": by_framework,
+    }
+
+
+__all__ = [
+    "DIMENSIONS",
+    "grouped_counts",
+    "rolled_up",
+    "rollup_counts",
+    "run_rows",
+    "summarize",
+    "write_rollups",
+]
@@ -0,0 +1,174 @@
+"""Evaluate sub-expressions shared between controls once per asset.
+
+Controls expanded from the same template often carry identical ``logic`` or
+identical sub-trees (for example the same ``{"==": [{"var": "config.mfa"},
+true]}`` guarded by different ``env`` checks).  :class:`SharedExpressions`
+counts every compound sub-tree across a run's controls; sub-trees used by
+more than one control are compiled with a per-asset memo, so their value (or
+the ``KeyError`` that makes a control ``NA``) is computed once per asset and
+fanned out to every control that shares it.
+
+Memo tables are keyed by the asset context object, so contexts are built
+once per asset and kept for the run; a table is dropped after the last
+control using it has been evaluated -- through :meth:`statuses`, or
+elsewhere and reported with :meth:`release`.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from app.models import assets as asset_m
+from app.services.rule_compiler import CompiledRule, compile_logic, logic_hash
+
+_MISSING = object()
+
+
+def _subtrees(logic: Any, min_ops: int) -> Dict[str, int]:
+    """Return ``{hash: operator count}`` for compound sub-trees of *logic*."""
+
+    found: Dict[str, int] = {}
+
+    def walk(node: Any) -> int:
+        if isinstance(node, list):
+            return sum(walk(item) for item in node)
+        if not isinstance(node, dict) or not node:
+            return 0
+        op, values = next(iter(node.items()))
+        ops = 1 if op in ("var", "exists") else 1 + walk(values)
+        if ops >= min_ops:
+            found[logic_hash(node)] = ops
+        return ops
+
+    walk(logic)
+    return found
+
+
+class SharedExpressions:
+    """Per-run memo for sub-expressions shared by several controls.
+
+    Sub-trees with fewer than *min_ops* operators are cheaper to re-evaluate
+    than to look up and are never memoised.  At most *max_entries* values
+    are held at once; beyond that shared expressions are simply recomputed.
+    """
+
+    def __init__(
+        self,
+        logics: Iterable[Any],
+        *,
+        min_ops: int = 2,
+        max_entries: int = 5_000_000,
+    ) -> None:
+        self.min_ops = min_ops
+        self.max_entries = max_entries
+        # sub-tree hash -> number of controls still to be evaluated using it
+        self._uses: Dict[str, int] = {}
+        roots: Set[str] = set()
+        self.controls = 0
+        self.duplicate_controls = 0
+        for logic in logics:
+            self.controls += 1
+            root = logic_hash(logic)
+            if root in roots:
+                self.duplicate_controls += 1
+            roots.add(root)
+            for key in _subtrees(logic, min_ops):
+                self._uses[key] = self._uses.get(key, 0) + 1
+        self.unique_expressions = len(self._uses)
+        self._uses = {k: n for k, n in self._uses.items() if n > 1}
+        self.shared_expressions = len(self._uses)
+        self._tables: Dict[str, Dict[int, Tuple[bool, Any]]] = {}
+        self._contexts: Dict[int, Dict[str, Any]] = {}
+        self.entries = 0
+        self.hits = 0
+        self.misses = 0
+
+    def context(self, asset: asset_m.Asset) -> Dict[str, Any]:
+        """Return the run-wide context for *asset*, building it once."""
+
+        ctx = self._contexts.get(id(asset))
+        if ctx is None:
+            from app.services.evaluator import _build_context
+
+            ctx = self._contexts[id(asset)] = _build_context(asset)
+        return ctx
+
+    def wrap(self, rule: Any, fn: CompiledRule) -> CompiledRule:
+        """Memoise *fn* per asset context if *rule* is shared; see ``compile_logic``."""
+
+        if not isinstance(rule, dict) or not rule:
+            return fn
+        key = logic_hash(rule)
+        if key not in self._uses:
+            return fn
+        table = self._tables.setdefault(key, {})
+
+        def memo(data: Dict[str, Any]) -> Any:
+            hit = table.get(id(data), _MISSING)
+            if hit is not _MISSING:
+                self.hits += 1
+                ok, value = hit
+                if ok:
+                    return value
+                raise KeyError(*value)
+            self.misses += 1
+            try:
+                value = fn(data)
+            except KeyError as exc:  # missing var -> NA for every sharer
+                self._store(table, data, (False, exc.args))
+                raise
+            self._store(table, data, (True, value))
+            return value
+
+        return memo
+
+    def _store(
+        self, table: Dict[int, Tuple[bool, Any]], data: Dict[str, Any], hit: Tuple[bool, Any]
+    ) -> None:
+        if self.entries < self.max_entries:
+            table[id(data)] = hit
+            self.entries += 1
+
+    def statuses(self, logic: Any, assets: Iterable[asset_m.Asset]) -> List[str]:
+        """Return PASS/FAIL/NA for *logic* against *assets*, sharing work."""
+
+        from app.services.evaluator import _status
+
+        rule = compile_logic(logic, memo=self)
+        try:
+            return [_status(rule, self.context(asset)) for asset in assets]
+        finally:
+            self.release(logic)
+
+    def release(self, logic: Any) -> None:
+        """Mark a control with *logic* as evaluated, here or elsewhere.
+
+        Memo tables no other pending control uses are dropped.
+        """
+
+        # Every shared sub-tree the control was counted for, including those
+        # the compiler folded away or never reached and so did not wrap.
+        for key in _subtrees(logic, self.min_ops):
+            if key not in self._uses:
+                continue
+            remaining = self._uses[key] - 1
+            if remaining > 0:
+                self._uses[key] = remaining
+                continue
+            del self._uses[key]
+            table = self._tables.pop(key, None)
+            if table is not None:
+                self.entries -= len(table)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "controls": self.controls,
+            "duplicate_controls": self.duplicate_controls,
+            "unique_expressions": self.unique_expressions,
+            "shared_expressions": self.shared_expressions,
+            "evaluations": self.misses,
+            "reused": self.hits,
+        }
+
+
+__all__ = ["SharedExpressions"]
@@ -0,0 +1,273 @@
+"""Dry-run draft control logic against a stratified sample of assets.
+
+:func:`simulate` counts the assets matching a filter per type/cloud/region
+stratum with one ``GROUP BY`` and allocates a sample to each stratum in
+proportion to its size (at least one asset per stratum while the sample
+allows).  Only the sampled ids are fetched -- by random row number within
+each stratum -- so the database never returns more than the sample.  The
+sampled assets are loaded and evaluated in batches with the vectorised
+evaluator (the compiled closure when NumPy is missing or a batch has no
+columnar form) until the sample is done or the time budget is spent; the
+budget is checked before every stratum fetch and every batch.  Batches
+interleave the strata, so a sample cut short by the budget still covers them
+evenly.
+
+Rates are stratified estimates -- each stratum weighted by its share of the
+matching assets -- with normal-approximation confidence bounds that use the
+finite-population correction, so an exhaustive sample has zero width.
+Nothing is written to the database.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from packages.rules.operators import OPERATORS
+
+from app.models import assets as asset_m
+from app.services import vectorized
+from app.services.evaluator import _build_context, control_statuses
+from app.services.rule_compiler import operator_counts
+
+STATUSES = ("PASS", "FAIL", "NA")
+
+# z for a two-sided 95% interval
+_Z = 1.959963984540054
+
+Stratum = Tuple[str, str, str]
+
+
+def allocate(sizes: Dict[Stratum, int], sample_size: int) -> Dict[Stratum, int]:
+    """Split *sample_size* over strata in proportion to *sizes*.
+
+    Every stratum gets at least one slot while there are enough to go round;
+    the rest is allocated by largest remainder and never exceeds a stratum.
+    """
+
+    total = sum(sizes.values())
+    if total <= sample_size:
+        return dict(sizes)
+    order = sorted(sizes, key=lambda s: (-sizes[s], s))
+    if sample_size < len(sizes):
+        return {s: int(i < sample_size) for i, s in enumerate(order)}
+    alloc = {s: 1 for s in order}
+    budget = sample_size - len(sizes)
+    quotas = {s: budget * sizes[s] / total for s in order}
+    for s in order:
+        alloc[s] += min(int(quotas[s]), sizes[s] - alloc[s])
+    left = sample_size - sum(alloc.values())
+    for s in sorted(order, key=lambda s: int(quotas[s]) - quotas[s]):
+        if left and alloc[s] < sizes[s]:
+            alloc[s] += 1
+            left -= 1
+    # Strata capped at their size leave room in the others.
+    for s in order:
+        extra = min(left, sizes[s] - alloc[s])
+        alloc[s] += extra
+        left -= extra
+    return alloc
+
+
+def _interleave(picks: Dict[Stratum, List[int]]) -> List[Tuple[Stratum, int]]:
+    """Order picks so that every prefix is close to proportional."""
+
+    keyed = [
+        ((i + 0.5) / len(ids), stratum, asset_pk)
+        for stratum, ids in picks.items()
+        for i, asset_pk in enumerate(ids)
+    ]
+    keyed.sort(key=lambda k: (k[0], k[1]))
+    return [(stratum, asset_pk) for _, stratum, asset_pk in keyed]
+
+
+def estimate(
+    strata: Dict[Stratum, Dict[str, int]], sizes: Dict[Stratum, int]
+) -> Dict[str, Dict[str, float]]:
+    """Stratified rate and 95% bounds of each status over sampled strata."""
+
+    covered = {s: c for s, c in strata.items() if sum(c.values())}
+    population = sum(sizes[s] for s in covered)
+    out: Dict[str, Dict[str, float]] = {}
+    for status in STATUSES:
+        rate = variance = 0.0
+        count = 0
+        for s, counts in covered.items():
+            n, size = sum(counts.values()), sizes[s]
+            weight = size / population
+            p = counts[status] / n
+            rate += weight * p
+            count += counts[status]
+            if n > 1:
+                fpc = (size - n) / (size - 1) if size > 1 else 0.0
+                variance += weight**2 * p * (1 - p) / n * fpc
+        half = _Z * math.sqrt(variance)
+        out[status] = {
+            "count": count,
+            "rate": round(rate, 6),
+            "lower": round(max(0.0, rate - half), 6),
+            "upper": round(min(1.0, rate + half), 6),
+        }
+    return out
+
+
+def _filters(asset_filter: Dict[str, Any]) -> list:
+    filters = []
+    if asset_filter.get("env"):
+        filters.append(asset_m.Asset.tags["env"].as_string() == asset_filter["env"])
+    for key, column in (
+        ("types", asset_m.Asset.type),
+        ("clouds", asset_m.Asset.cloud),
+        ("regions", asset_m.Asset.region),
+        ("asset_ids", asset_m.Asset.asset_id),
+    ):
+        if asset_filter.get(key):
+            filters.append(column.in_(asset_filter[key]))
+    return filters
+
+
+def _sample_ids(
+    session: Session, filters: list, stratum: Stratum, positions: List[int]
+) -> List[int]:
+    """Ids of the assets at 0-based *positions* of *stratum*, in id order."""
+
+    Asset = asset_m.Asset
+    ranked = (
+        select(Asset.id, func.row_number().over(order_by=Asset.id).label("rn"))
+        .where(
+            *filters,
+            Asset.type == stratum[0],
+            Asset.cloud == stratum[1],
+            Asset.region == stratum[2],
+        )
+        .subquery()
+    )
+    rows = session.execute(
+        select(ranked.c.rn, ranked.c.id).where(
+            ranked.c.rn.in_([p + 1 for p in positions])
+        )
+    )
+    by_rn = dict(rows.all())
+    return [by_rn[p + 1] for p in positions if p + 1 in by_rn]
+
+
+def _statuses(
+    logic: Any, assets: Sequence[asset_m.Asset], columns: vectorized.ColumnBatch | None
+) -> List[str]:
+    if columns is not None:
+        statuses = columns.statuses(logic, assets)
+        if statuses is not None:
+            return statuses
+    return control_statuses(logic, map(_build_context, assets))
+
+
+def simulate(
+    session: Session,
+    logic: Any,
+    asset_filter: Dict[str, Any] | None = None,
+    *,
+    sample_size: int = 500,
+    time_budget: float = 2.0,
+    examples: int = 5,
+    batch_size: int = 256,
+    seed: int | None = None,
+) -> Dict[str, Any]:
+    """Evaluate *logic* on a stratified sample of the assets matching
+    *asset_filter* (``types``, ``clouds``, ``regions``, ``asset_ids``, ``env``).
+
+    Raises ``ValueError`` if *logic* uses an unknown operator or raises an
+    error other than a missing value on some asset.
+    """
+
+    missing = OPERATORS.missing(operator_counts(logic))
+    if missing:
+        raise ValueError(f"Unsupported operators: {', '.join(missing)}")
+    start = time.perf_counter()
+    deadline = start + time_budget
+    Asset = asset_m.Asset
+    filters = _filters(asset_filter or {})
+    strata = Asset.type, Asset.cloud, Asset.region
+    sizes: Dict[Stratum, int] = {
+        (row[0], row[1], row[2]): row[3]
+        for row in session.execute(
+            select(*strata, func.count()).where(*filters).group_by(*strata)
+        )
+    }
+    rng = random.Random(seed)
+    alloc = allocate(sizes, sample_size)
+    planned = sum(alloc.values())
+    picks: Dict[Stratum, List[int]] = {}
+    for stratum, k in alloc.items():
+        if not k:
+            continue
+        if time.perf_counter() >= deadline:
+            break
+        positions = rng.sample(range(sizes[stratum]), k)
+        picks[stratum] = _sample_ids(session, filters, stratum, positions)
+    plan = _interleave(picks)
+
+    columns = vectorized.ColumnBatch(min_rows=32) if vectorized.available else None
+    counts: Dict[Stratum, Dict[str, int]] = {
+        s: dict.fromkeys(STATUSES, 0) for s in picks
+    }
+    failing: List[Dict[str, Any]] = []
+    evaluated = 0
+    for offset in range(0, len(plan), batch_size):
+        if time.perf_counter() >= deadline:
+            break
+        batch = plan[offset : offset + batch_size]
+        loaded = {
+            a.id: a
+            for a in session.scalars(
+                select(Asset).where(Asset.id.in_([pk for _, pk in batch]))
+            )
+        }
+        rows = [(stratum, loaded[pk]) for stratum, pk in batch if pk in loaded]
+        assets = [asset for _, asset in rows]
+        try:
+            statuses = _statuses(logic, assets, columns)
+        except Exception as exc:
+            raise ValueError(f"Logic raised {type(exc).__name__}: {exc}") from exc
+        for (stratum, asset), status in zip(rows, statuses):
+            counts[stratum][status] += 1
+            if status == "FAIL" and len(failing) < examples:
+                failing.append(
+                    {
+                        "asset_id": asset.asset_id,
+                        "type": asset.type,
+                        "cloud": asset.cloud,
+                        "region": asset.region,
+                    }
+                )
+        evaluated += len(assets)
+
+    population = sum(sizes.values())
+    return {
+        "population": population,
+        "sample_size": planned,
+        "evaluated": evaluated,
+        "exhaustive": evaluated == population,
+        "truncated": evaluated < planned,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        "distribution": estimate(counts, sizes),
+        "strata": [
+            {
+                "type": s[0],
+                "cloud": s[1],
+                "region": s[2],
+                "population": sizes[s],
+                "evaluated": sum(c.values()),
+                **c,
+            }
+            for s, c in sorted(counts.items(), key=lambda kv: (-sizes[kv[0]], kv[0]))
+        ],
+        "failing_examples": failing,
+    }
+
+
+__all__ = ["STATUSES", "allocate", "estimate", "simulate"]
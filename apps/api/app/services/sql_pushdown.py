@@ -0,0 +1,463 @@
+"""Evaluate control logic inside Postgres.
+
+:func:`compile_sql` translates control JsonLogic (the operators
+``evaluator._evaluate`` supports) into a JSONB ``CASE`` expression yielding
+``PASS``/``FAIL``/``NA`` per asset row.  A missing ``var`` is SQL ``NULL``
+and propagates exactly like the ``KeyError`` the Python evaluator raises,
+including ``and``/``or`` short-circuiting.
+
+Where Python and JSONB semantics could differ for particular values -- for
+example ``True == 1``, comparing a string with a number (a ``TypeError`` in
+Python) or a regex against a non-string -- the compiler emits a *guard*
+predicate.  Rows matching the guard are skipped by the ``INSERT ... SELECT``
+and evaluated in Python instead, so results are identical on both paths.
+Constructs the compiler does not handle at all raise :class:`Unsupported`
+and the whole control falls back to Python.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app.models import assets as asset_m
+from app.models import controls as control_m
+from app.models import exceptions as exc_m
+from app.services.exception_index import ExceptionIndex
+from app.services.result_sink import ResultSink
+
+_COLUMNS = ("asset_id", "type", "cloud", "region")
+_DOCUMENTS = ("tags", "config")
+_COMPARE = {"==": "=", "!=": "<>", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+# Python ``re`` and Postgres ARE agree on this subset (no escapes, bounds,
+# inline flags or POSIX classes); newlines in the subject are guarded.
+_SAFE_PATTERN = re.compile(r"[A-Za-z0-9 _\-.,:;/@#=!<>'\"*+?^$|()\[\]]*")
+
+
+# ``OFFSET 0`` keeps Postgres from inlining the casts into every reference.
+_FROM = (
+    "assets AS a CROSS JOIN LATERAL ("
+    "SELECT CAST(a.tags AS jsonb) AS tags, CAST(a.config AS jsonb) AS config, "
+    "CAST(a.evidence AS jsonb) AS evidence OFFSET 0) AS d"
+)
+
+
+class Unsupported(Exception):
+    """Raised when a control's logic cannot be evaluated in SQL."""
+
+
+class _Expr(NamedTuple):
+    sql: str
+    is_bool: bool  # SQL boolean, otherwise jsonb; NULL means "missing var"
+    const: Any = None
+    has_const: bool = False
+
+    def jsonb_type(self) -> Optional[str]:
+        if not self.has_const:
+            return "boolean" if self.is_bool else None
+        value = self.const
+        if value is None:
+            return "null"
+        if isinstance(value, bool):
+            return "boolean"
+        if isinstance(value, (int, float)):
+            return "number"
+        if isinstance(value, str):
+            return "string"
+        if isinstance(value, list):
+            return "array"
+        return "object"
+
+
+class CompiledSql(NamedTuple):
+    status: str  # SQL expression: 'PASS' / 'FAIL' / 'NA'
+    guard: str  # SQL boolean: rows to evaluate in Python instead
+    params: Dict[str, Any]
+
+
+class _Compiler:
+    def __init__(self, alias: str, docs: str) -> None:
+        self.alias = alias
+        self.docs = docs
+        self.params: Dict[str, Any] = {}
+        self.guards: List[str] = []
+
+    def param(self, value: Any) -> str:
+        name = f"p{len(self.params)}"
+        self.params[name] = value
+        return f":{name}"
+
+    def const(self, value: Any) -> _Expr:
+        if not isinstance(value, (type(None), bool, int, float, str, list, dict)):
+            raise Unsupported(f"constant of type {type(value).__name__}")
+        sql = f"CAST({self.param(json.dumps(value))} AS jsonb)"
+        return _Expr(sql, False, value, True)
+
+    def as_json(self, expr: _Expr) -> str:
+        return f"to_jsonb({expr.sql})" if expr.is_bool else expr.sql
+
+    def truthy(self, expr: _Expr) -> str:
+        if expr.is_bool:
+            return expr.sql
+        if expr.has_const:
+            return "TRUE" if expr.const else "FALSE"
+        j = expr.sql
+        return (
+            f"(CASE jsonb_typeof({j}) WHEN 'null' THEN FALSE "
+            f"WHEN 'boolean' THEN {j} = 'true'::jsonb "
+            f"WHEN 'number' THEN {j} <> '0'::jsonb "
+            f"WHEN 'string' THEN {j} <> '\"\"'::jsonb "
+            f"WHEN 'array' THEN {j} <> '[]'::jsonb "
+            f"WHEN 'object' THEN {j} <> '{{}}'::jsonb END)"
+        )
+
+    def typeof(self, expr: _Expr) -> str:
+        known = expr.jsonb_type()
+        if known is not None:
+            return f"'{known}'"
+        return f"jsonb_typeof({expr.sql})"
+
+    def guard(self, condition: str) -> None:
+        if condition != "FALSE":
+            self.guards.append(f"COALESCE({condition}, FALSE)")
+
+    # -- nodes ---------------------------------------------------------------
+
+    def node(self, rule: Any) -> _Expr:
+        if not isinstance(rule, dict) or not rule:
+            return self.const(rule)
+        op, values = next(iter(rule.items()))
+        if op in ("var", "exists"):
+            if not isinstance(values, str):
+                raise Unsupported(f"{op} with non-string path")
+            expr = self.var(values)
+            if op == "var":
+                return expr
+            return _Expr(f"({expr.sql} IS NOT NULL)", True)
+        if op == "!":
+            return _Expr(f"(NOT {self.truthy(self.node(values))})", True)
+        if op in ("and", "or"):
+            if not isinstance(values, list):
+                raise Unsupported(f"{op} without a list")
+            return self.boolean(op, values)
+        if op not in _COMPARE and op not in ("in", "contains", "regex"):
+            raise Unsupported(f"operator {op!r}")
+        if not isinstance(values, list) or len(values) != 2:
+            raise Unsupported(f"{op} needs two operands")
+        left, right = self.node(values[0]), self.node(values[1])
+        if op == "regex":
+            return self.regex(left, right)
+        if op == "in":
+            return self.membership(left, right)
+        if op == "contains":
+            return self.membership(right, left)
+        if op in ("==", "!="):
+            return self.equality(op, left, right)
+        return self.ordering(op, left, right)
+
+    def var(self, path: str) -> _Expr:
+        head, *rest = path.split(".")
+        a = self.alias
+        if head in _COLUMNS:
+            if rest:  # a string is never a dict
+                return _Expr("CAST(NULL AS jsonb)", False)
+            return _Expr(f"COALESCE(to_jsonb({a}.{head}), 'null'::jsonb)", False)
+        if head not in _DOCUMENTS:
+            return _Expr("CAST(NULL AS jsonb)", False)
+        doc = f"{self.docs}.{head}"
+        # ``asset.tags or {}``: anything but an object/null needs Python
+        self.guard(f"jsonb_typeof({doc}) NOT IN ('object', 'null')")
+        sql = f"COALESCE(NULLIF({doc}, 'null'::jsonb), '{{}}'::jsonb)"
+        for part in rest:
+            # ``jsonb -> text`` only descends into objects, like the ``var`` operator
+            sql = f"({sql} -> CAST({self.param(part)} AS text))"
+        return _Expr(sql, False)
+
+    def boolean(self, op: str, values: Sequence[Any]) -> _Expr:
+        if not values:
+            return _Expr("TRUE" if op == "and" else "FALSE", True)
+        stop = "FALSE" if op == "and" else "TRUE"
+        whens = []
+        for value in values:
+            t = self.truthy(self.node(value))
+            whens.append(f"WHEN {t} IS NULL THEN NULL")
+            whens.append(f"WHEN {t} = {stop} THEN {stop}")
+        done = "TRUE" if op == "and" else "FALSE"
+        return _Expr(f"(CASE {' '.join(whens)} ELSE {done} END)", True)
+
+    def equality(self, op: str, left: _Expr, right: _Expr) -> _Expr:
+        lt, rt = self.typeof(left), self.typeof(right)
+        self.guard(
+            f"({lt} IN ('array', 'object') OR {rt} IN ('array', 'object') "
+            f"OR ({lt} IN ('boolean', 'number') AND {rt} IN ('boolean', 'number') "
+            f"AND {lt} <> {rt}))"
+        )
+        return _Expr(
+            f"({self.as_json(left)} {_COMPARE[op]} {self.as_json(right)})", True
+        )
+
+    def ordering(self, op: str, left: _Expr, right: _Expr) -> _Expr:
+        lt, rt = self.typeof(left), self.typeof(right)
+        self.guard(f"NOT ({lt} = {rt} AND {lt} IN ('number', 'string', 'boolean'))")
+        lj, rj = self.as_json(left), self.as_json(right)
+        sql_op = _COMPARE[op]
+        return _Expr(
+            f"(CASE WHEN {lt} = 'string' THEN "
+            f"({lj} #>> '{{}}') COLLATE \"C\" {sql_op} ({rj} #>> '{{}}') COLLATE \"C\" "
+            f"ELSE {lj} {sql_op} {rj} END)",
+            True,
+        )
+
+    def membership(self, needle: _Expr, hay: _Expr) -> _Expr:
+        nt, ht = self.typeof(needle), self.typeof(hay)
+        nj, hj = self.as_json(needle), self.as_json(hay)
+        self.guard(
+            f"({ht} NOT IN ('array', 'object', 'string') "
+            f"OR {nt} IN ('array', 'object') "
+            f"OR ({ht} IN ('object', 'string') AND {nt} <> 'string'))"
+        )
+        if needle.jsonb_type() != "string":
+            # ``True in [1]`` is true in Python but not for JSONB
+            other = (
+                f"(CASE {nt} WHEN 'boolean' THEN 'number' "
+                f"WHEN 'number' THEN 'boolean' END)"
+            )
+            self.guard(
+                f"({ht} = 'array' AND {nt} IN ('boolean', 'number') AND EXISTS ("
+                f"SELECT 1 FROM jsonb_array_elements({hj}) AS e "
+                f"WHERE jsonb_typeof(e) = {other}))"
+            )
+        # jsonb_build_array(NULL) is '[null]', so propagate a missing needle
+        return _Expr(
+            f"(CASE WHEN {nj} IS NULL THEN NULL "
+            f"WHEN {ht} = 'array' THEN {hj} @> jsonb_build_array({nj}) "
+            f"WHEN {ht} = 'object' THEN jsonb_exists({hj}, {nj} #>> '{{}}') "
+            f"WHEN {ht} = 'string' THEN strpos({hj} #>> '{{}}', {nj} #>> '{{}}') > 0 END)",
+            True,
+        )
+
+    def regex(self, value: _Expr, pattern: _Expr) -> _Expr:
+        if not pattern.has_const:
+            raise Unsupported("regex with a non-constant pattern")
+        source = str(pattern.const)
+        if not _SAFE_PATTERN.fullmatch(source) or "(?" in source or "[[" in source:
+            raise Unsupported(f"regex pattern {source!r}")
+        try:
+            re.compile(source)
+        except re.error as exc:
+            raise Unsupported(f"invalid regex {source!r}") from exc
+        vt, vj = self.typeof(value), self.as_json(value)
+        # ``str(value)`` formatting and ``.``/``$`` around newlines differ
+        self.guard(
+            f"({vt} <> 'string' OR strpos({vj} #>> '{{}}', chr(10)) > 0)"
+        )
+        return _Expr(f"(({vj} #>> '{{}}') ~ {self.param(source)})", True)
+
+
+def compile_sql(logic: Any, alias: str = "a", docs: str = "d") -> CompiledSql:
+    """Compile *logic* for rows of ``assets`` aliased as *alias*.
+
+    ``tags`` and ``config`` are read as ``jsonb`` from the relation *docs*
+    (see :data:`_FROM`), so each row's JSON is parsed once.
+    """
+
+    compiler = _Compiler(alias, docs)
+    root = compiler.node(logic)
+    t = compiler.truthy(root)
+    status = f"(CASE WHEN {t} IS NULL THEN 'NA' WHEN {t} THEN 'PASS' ELSE 'FAIL' END)"
+    guard = " OR ".join(compiler.guards) if compiler.guards else "FALSE"
+    return CompiledSql(status, f"({guard})", compiler.params)
+
+
+def pushdown_enabled(session: Session) -> bool:
+    """True when ``EVALUATION_SQL_PUSHDOWN`` is set and the database is Postgres."""
+
+    if os.getenv("EVALUATION_SQL_PUSHDOWN", "false").lower() != "true":
+        return False
+    return session.get_bind().dialect.name == "postgresql"
+
+
+# ``evaluator._asset_env`` stores ``str()`` of a non-string env tag (``True``
+# where ``->>`` would give ``true``); those rows are written from Python.
+_ENV_GUARD = "COALESCE(jsonb_typeof(d.tags -> 'env') NOT IN ('string', 'null'), FALSE)"
+
+
+def _waiver_sql(exceptions: Iterable[exc_m.Exception], alias: str, params: Dict[str, Any]) -> str:
+    """SQL matching ``evaluator._exception_matches`` for any of *exceptions*."""
+
+    a = alias
+    asset_ids: List[str] = []
+    clauses: List[str] = []
+    for exc in exceptions:
+        sel = exc.selector or {}
+        if not isinstance(sel, dict):
+            raise Unsupported("exception selector is not an object")
+        values = {dim: sel.get(dim) for dim in ("asset_id", "type", "env", "cloud")}
+        values = {dim: v for dim, v in values.items() if v}
+        if not isinstance(values.get("env", ""), str):
+            # Compared with the raw tag value in Python, where ``True == 1``.
+            raise Unsupported("non-string env selector")
+        if any(not isinstance(v, str) for v in values.values()):
+            continue  # a non-string never equals an asset column
+        if not values:
+            return "TRUE"
+        if list(values) == ["asset_id"]:
+            asset_ids.append(values["asset_id"])
+            continue
+        parts = []
+        for dim, value in values.items():
+            name = f"w{len(params)}"
+            params[name] = value
+            if dim == "env":
+                parts.append(f"(d.tags -> 'env') = to_jsonb(CAST(:{name} AS text))")
+            else:
+                parts.append(f"{a}.{dim} = :{name}")
+        clauses.append("(" + " AND ".join(parts) + ")")
+    if asset_ids:
+        name = f"w{len(params)}"
+        params[name] = sorted(set(asset_ids))
+        clauses.append(f"{a}.asset_id = ANY(:{name})")
+    return "(" + " OR ".join(clauses) + ")" if clauses else "FALSE"
+
+
+class SqlPushdown:
+    """Evaluate controls with one ``INSERT ... SELECT`` each.
+
+    Rows caught by a guard, and their waivers, are evaluated in Python and
+    written through *sink*.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        run_id: str,
+        exceptions: Sequence[exc_m.Exception],
+        exception_index: ExceptionIndex,
+        sink: ResultSink,
+        *,
+        assets_scope: List[str] | None = None,
+    ) -> None:
+        self.session = session
+        self.run_id = run_id
+        self.exception_index = exception_index
+        self.sink = sink
+        self.assets_scope = assets_scope
+        self._exceptions: Dict[str, List[exc_m.Exception]] = {}
+        for exc in exceptions:
+            self._exceptions.setdefault(exc.control_id, []).append(exc)
+        self.controls = 0
+        self.python_rows = 0
+
+    def evaluate(
+        self, control: control_m.Control, types: List[str]
+    ) -> Dict[str, int] | None:
+        """Write results for *control*; ``None`` if it must run in Python."""
+
+        try:
+            compiled = compile_sql(control.logic)
+            params = dict(compiled.params)
+            waived = _waiver_sql(
+                self._exceptions.get(control.control_id, ()), "a", params
+            )
+        except Unsupported:
+            return None
+        self.controls += 1
+        counts: Dict[str, int] = {}
+        if not types:
+            return counts
+
+        params.update(
+            run_id=self.run_id,
+            control_id=control.control_id,
+            control_title=control.title,
+            severity=control.severity,
+            frameworks=json.dumps(control.frameworks),
+            fix=json.dumps(control.fix),
+            category=control.category,
+            types=list(types),
+        )
+        where = "a.type = ANY(:types)"
+        guard = f"({compiled.guard} OR {_ENV_GUARD})"
+        if self.assets_scope:
+            params["scope"] = list(self.assets_scope)
+            where += " AND a.asset_id = ANY(:scope)"
+
+        statement = text(
+            f"""
+            WITH inserted AS (
+                INSERT INTO results (
+                    run_id, control_id, control_title, asset_id, status,
+                    severity, frameworks, evidence, fix, meta,
+                    asset_type, cloud, region, env, category
+                )
+                SELECT :run_id, :control_id, :control_title, s.asset_id,
+                       CASE WHEN s.waived THEN 'WAIVED' ELSE s.status END,
+                       :severity, CAST(:frameworks AS jsonb),
+                       jsonb_build_object(
+                           'asset_id', s.asset_id,
+                           'control_id', CAST(:control_id AS text),
+                           'source', s.evidence -> 'source',
+                           'pointer', s.evidence -> 'pointer'
+                       ),
+                       CAST(:fix AS jsonb),
+                       CASE WHEN s.waived
+                            THEN jsonb_build_object('prev_status', s.status)
+                            ELSE '{{}}'::jsonb END,
+                       s.type, s.cloud, s.region, s.env, :category
+                FROM (
+                    SELECT a.asset_id, a.id, d.evidence,
+                           a.type, a.cloud, a.region, d.tags ->> 'env' AS env,
+                           {compiled.status} AS status,
+                           COALESCE({waived}, FALSE) AS waived
+                    FROM {_FROM}
+                    WHERE {where} AND NOT {guard}
+                ) AS s
+                ORDER BY s.asset_id, s.id
+                RETURNING status
+            )
+            SELECT status, count(*) FROM inserted GROUP BY status
+            """
+        )
+        for status, count in self.session.execute(statement, params):
+            counts[status] = count
+
+        guarded = [
+            row[0]
+            for row in self.session.execute(
+                text(
+                    f"SELECT a.id FROM {_FROM} WHERE {where} AND {guard}"
+                ),
+                params,
+            )
+        ]
+        if guarded:
+            self._evaluate_python(control, guarded, counts)
+        return counts
+
+    def _evaluate_python(
+        self, control: control_m.Control, ids: List[int], counts: Dict[str, int]
+    ) -> None:
+        from app.services.evaluator import _build_context, _result_row, control_statuses
+
+        assets = self.session.scalars(
+            select(asset_m.Asset)
+            .where(asset_m.Asset.id.in_(ids))
+            .order_by(asset_m.Asset.asset_id, asset_m.Asset.id)
+        ).all()
+        statuses = control_statuses(control.logic, map(_build_context, assets))
+        for asset, status in zip(assets, statuses):
+            meta: Dict[str, Any] = {}
+            if self.exception_index.match(control.control_id, asset):
+                meta = {"prev_status": status}
+                status = "WAIVED"
+            self.sink.add(_result_row(self.run_id, control, asset, status, meta))
+            counts[status] = counts.get(status, 0) + 1
+        self.python_rows += len(assets)
+
+
+__all__ = ["CompiledSql", "SqlPushdown", "Unsupported", "compile_sql", "pushdown_enabled"]
@@ -0,0 +1,101 @@
+"""Per-run evaluation timings.
+
+``run_evaluation`` records wall-clock time per phase and per control in a
+:class:`RunTimings`.  The phase breakdown is stored on the run
+(``EvaluationRun.timings``), per-control durations in
+``evaluation_control_timings`` and everything is exported through
+``app.metrics``.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.metrics import (
+    evaluate_asset_rows_total,
+    evaluate_control_duration_seconds,
+    evaluate_operator_evaluations_total,
+    evaluate_phase_seconds,
+)
+from app.models import timings as timing_m
+
+PHASES = (
+    "exception_load",
+    "control_load",
+    "asset_fetch",
+    "evaluation",
+    "exception_apply",
+    "persistence",
+    "rollups",
+    "profiling",
+    "cleanup",
+)
+
+
+class RunTimings:
+    """Accumulate phase and per-control durations for one evaluation run."""
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        # (control_id, seconds, assets evaluated)
+        self.controls: List[Tuple[str, float, int]] = []
+        self.operators: Dict[str, int] = {}
+        self.asset_rows = 0
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] += seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def control(
+        self, control_id: str, seconds: float, assets: int, operators: Dict[str, int]
+    ) -> None:
+        self.controls.append((control_id, seconds, assets))
+        self.phases["evaluation"] += seconds
+        for op, count in operators.items():
+            self.operators[op] = self.operators.get(op, 0) + count * assets
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: round(seconds, 6) for name, seconds in self.phases.items()}
+
+    def save(self, session: Session, run_id: str) -> None:
+        """Insert the per-control durations for *run_id* (not committed)."""
+
+        if self.controls:
+            session.execute(
+                insert(timing_m.ControlTiming.__table__),
+                [
+                    {
+                        "run_id": run_id,
+                        "control_id": control_id,
+                        "seconds": seconds,
+                        "assets_count": assets,
+                    }
+                    for control_id, seconds, assets in self.controls
+                ],
+            )
+
+    def observe(self) -> None:
+        """Export the collected timings and counts to Prometheus."""
+
+        for name, seconds in self.phases.items():
+            evaluate_phase_seconds.labels(phase=name).observe(seconds)
+        for _, seconds, _ in self.controls:
+            evaluate_control_duration_seconds.observe(seconds)
+        for op, count in self.operators.items():
+            evaluate_operator_evaluations_total.labels(op=op).inc(count)
+        evaluate_asset_rows_total.inc(self.asset_rows)
+
+
+__all__ = ["PHASES", "RunTimings"]
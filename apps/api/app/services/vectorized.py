@@ -0,0 +1,407 @@
+"""Columnar, NumPy-vectorised evaluation of control logic.
+
+``control_statuses`` calls a compiled closure once per asset context.
+:class:`ColumnBatch` instead extracts every ``var`` path a control reads
+into a column -- the values for all assets of a batch plus a per-row
+state -- once per asset list, and evaluates operators as array operations
+shared by every control over that list.
+
+Row states mirror what the closure would do for that asset: ``_OK``, ``_NA``
+(a missing ``var`` raised ``KeyError``) or ``_ERROR`` (any other
+exception).  ``and``/``or`` only take the state of an operand for rows they
+have not decided yet, like their short-circuiting counterparts.  Bool and
+numeric columns are compared as ``float64`` arrays and strings as object
+arrays; every other operand combination is evaluated element by element
+with Python semantics.
+
+A control is left to the closure evaluator (``statuses`` returns ``None``)
+when its logic uses a construct without a columnar form, or when some row
+would raise an error other than ``KeyError`` -- the closure then raises it
+unchanged.  NumPy is a dependency of the API; should it be missing,
+:data:`available` is ``False`` and every control uses the closures.
+"""
+
+from __future__ import annotations
+
+import operator
+import re
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from app.models import assets as asset_m
+
+available = np is not None
+
+_OK, _NA, _ERROR = 0, 1, 2
+
+_MISSING = object()
+
+# Context keys built by ``evaluator._build_context``.
+_ROOT_FIELDS = ("asset_id", "type", "cloud", "region")
+_DOC_FIELDS = ("tags", "config")
+
+# Integers beyond this do not round-trip through float64.
+_MAX_EXACT_INT = 2**53
+
+_ORDERING: Dict[str, Callable[[Any, Any], Any]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+_EQUALITY: Dict[str, Callable[[Any, Any], Any]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+class Unsupported(Exception):
+    """Raised for logic that has no columnar form."""
+
+
+class _Column:
+    """Values of one expression for every row of a batch.
+
+    ``values`` is an ``object`` array of the Python values.  ``typed`` is a
+    ``float64`` copy when every present value is a bool or a number, and
+    ``strings`` is set when every present value is a ``str``.  ``state``
+    holds ``_OK``/``_NA``/``_ERROR`` per row; values of rows that are not
+    ``_OK`` are placeholders.
+    """
+
+    __slots__ = ("values", "typed", "strings", "state")
+
+    def __init__(self, values: Any, state: Any, typed: Any = None, strings: bool = False) -> None:
+        self.values = values
+        self.state = state
+        self.typed = typed
+        self.strings = strings
+
+
+class _Const:
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+
+_Operand = Any  # _Column | _Const
+
+
+def _is_number(value: Any) -> bool:
+    if isinstance(value, bool) or isinstance(value, float):
+        return True
+    return isinstance(value, int) and abs(value) < _MAX_EXACT_INT
+
+
+def _classify(obj: Any, state: Any) -> _Column:
+    """Build a column from *obj* (an ``object`` array) and its row *state*."""
+
+    absent = state != _OK
+    types = set(map(type, obj[~absent].tolist())) if absent.any() else set(map(type, obj.tolist()))
+    if types <= {str}:
+        obj[absent] = ""  # keep placeholders comparable
+        return _Column(obj, state, strings=True)
+    if types <= {bool, int, float}:
+        filled = obj.copy()
+        filled[absent] = 0
+        typed = filled.astype(np.float64)
+        if int not in types or not (np.abs(typed) >= _MAX_EXACT_INT).any():
+            return _Column(obj, state, typed=typed)
+    return _Column(obj, state)
+
+
+def _bool_column(values: Any, state: Any) -> _Column:
+    return _Column(values.astype(object), state, typed=values.astype(np.float64))
+
+
+def _truth(col: _Column) -> Any:
+    if col.typed is not None:
+        return col.typed != 0
+    return np.frompyfunc(bool, 1, 1)(col.values).astype(bool)
+
+
+def _combine(left: _Operand, right: _Operand, n: int) -> Any:
+    """Row state after evaluating *left* then *right* (first raise wins)."""
+
+    states = [op.state for op in (left, right) if isinstance(op, _Column)]
+    if not states:
+        return np.zeros(n, dtype=np.int8)
+    if len(states) == 1:
+        return states[0].copy()
+    return np.where(states[0] != _OK, states[0], states[1])
+
+
+def _objects(side: _Operand, rows: Any) -> Any:
+    if isinstance(side, _Column):
+        return side.values[rows]
+    # A one-element object array broadcasts without NumPy unpacking lists.
+    obj = np.empty(1, dtype=object)
+    obj[0] = side.value
+    return obj
+
+
+def _elementwise(
+    fn: Callable[[Any, Any], Any], left: _Operand, right: _Operand, state: Any
+) -> Any:
+    """Apply *fn* to every ``_OK`` row in Python; failing rows get ``_ERROR``."""
+
+    out = np.zeros(len(state), dtype=bool)
+    rows = np.flatnonzero(state == _OK)
+    lv, rv = _objects(left, rows), _objects(right, rows)
+    try:
+        out[rows] = np.frompyfunc(fn, 2, 1)(lv, rv).astype(bool)
+        return out
+    except Exception:
+        pass
+    lv = np.broadcast_to(lv, rows.shape)
+    rv = np.broadcast_to(rv, rows.shape)
+    for j, i in enumerate(rows.tolist()):
+        try:
+            out[i] = bool(fn(lv[j], rv[j]))
+        except Exception:
+            state[i] = _ERROR
+    return out
+
+
+def _compare(op: str, left: _Operand, right: _Operand, n: int) -> _Operand:
+    fn = _ORDERING.get(op) or _EQUALITY[op]
+    if isinstance(left, _Const) and isinstance(right, _Const):
+        try:
+            return _Const(bool(fn(left.value, right.value)))
+        except Exception:
+            return _Column(np.zeros(n, dtype=object), np.full(n, _ERROR, dtype=np.int8))
+    state = _combine(left, right, n)
+
+    def operand(side: _Operand, kind: str) -> Any:
+        if isinstance(side, _Const):
+            if kind == "num" and _is_number(side.value):
+                return float(side.value)
+            if kind == "str" and type(side.value) is str:
+                return side.value
+            return None
+        if kind == "num":
+            return side.typed
+        return side.values if side.strings else None
+
+    for kind in ("num", "str"):
+        lo, ro = operand(left, kind), operand(right, kind)
+        if lo is not None and ro is not None:
+            return _bool_column(np.asarray(fn(lo, ro), dtype=bool), state)
+    if op in _EQUALITY and all(
+        operand(side, "num") is not None or operand(side, "str") is not None
+        for side in (left, right)
+    ):
+        # A number never equals a string.
+        return _bool_column(np.full(n, op == "!="), state)
+    return _bool_column(_elementwise(fn, left, right, state), state)
+
+
+class ColumnBatch:
+    """Evaluate controls column-wise over the asset lists of a run.
+
+    Columns are cached per ``(asset list, var path)`` and reused by every
+    control evaluated against the same list object (``AssetIndex`` hands out
+    one list per type set).  When more than *max_cells* values are cached
+    the cache is cleared.  Lists shorter than *min_rows* are left to the
+    closure evaluator, which is faster there.
+    """
+
+    def __init__(self, *, min_rows: int = 32, max_cells: int = 20_000_000) -> None:
+        self.min_rows = min_rows
+        self.max_cells = max_cells
+        self._columns: Dict[Tuple[int, str], _Column] = {}
+        self._lists: Dict[int, Sequence[asset_m.Asset]] = {}
+        self.cells = 0
+        self.vectorized = 0
+        self.fallbacks = 0
+
+    def statuses(self, logic: Any, assets: Sequence[asset_m.Asset]) -> List[str] | None:
+        """Return PASS/FAIL/NA for *logic* against *assets*, or ``None``.
+
+        ``None`` means the caller must evaluate this control per asset.
+        """
+
+        n = len(assets)
+        if n < self.min_rows:
+            self.fallbacks += 1
+            return None
+        try:
+            result = self._eval(logic, assets)
+        except Unsupported:
+            self.fallbacks += 1
+            return None
+        if isinstance(result, _Const):
+            self.vectorized += 1
+            return ["PASS" if result.value else "FAIL"] * n
+        if (result.state == _ERROR).any():
+            self.fallbacks += 1
+            return None
+        self.vectorized += 1
+        codes = np.where(result.state == _NA, 2, np.where(_truth(result), 0, 1))
+        return _LABELS[codes].tolist()
+
+    def stats(self) -> Dict[str, int]:
+        return {"vectorized": self.vectorized, "fallbacks": self.fallbacks}
+
+    # -- columns -----------------------------------------------------------
+
+    def _var(self, path: str, assets: Sequence[asset_m.Asset]) -> _Column:
+        key = (id(assets), path)
+        col = self._columns.get(key)
+        if col is not None:
+            return col
+        if self.cells + len(assets) > self.max_cells:
+            self._columns.clear()
+            self._lists.clear()
+            self.cells = 0
+        col = self._columns[key] = self._extract(path, assets)
+        self._lists[id(assets)] = assets  # keep the id from being reused
+        self.cells += len(assets)
+        return col
+
+    def _extract(self, path: str, assets: Sequence[asset_m.Asset]) -> _Column:
+        # ``config.a.b`` is read from the (cached) ``config.a`` column.
+        parent_path, _, key = path.rpartition(".")
+        if parent_path:
+            parent = self._var(parent_path, assets).values.tolist()
+            values = [
+                v.get(key, _MISSING) if isinstance(v, dict) else _MISSING for v in parent
+            ]
+        elif path in _ROOT_FIELDS:
+            values = [getattr(asset, path) for asset in assets]
+        elif path in _DOC_FIELDS:
+            values = [getattr(asset, path) or {} for asset in assets]
+        else:
+            values = [_MISSING] * len(assets)
+        obj = np.empty(len(values), dtype=object)
+        obj[:] = values
+        missing = obj == _MISSING_ARRAY
+        obj[missing] = None
+        return _classify(obj, missing.astype(np.int8))
+
+    # -- operators ---------------------------------------------------------
+
+    def _eval(self, rule: Any, assets: Sequence[asset_m.Asset]) -> _Operand:
+        if not isinstance(rule, dict) or not rule:
+            return _Const(rule)
+        op, values = next(iter(rule.items()))
+        n = len(assets)
+
+        if op in ("var", "exists"):
+            if not isinstance(values, str):
+                raise Unsupported(op)
+            col = self._var(values, assets)
+            if op == "var":
+                return col
+            return _bool_column(col.state == _OK, np.zeros(n, dtype=np.int8))
+
+        if op == "!":
+            inner = self._eval(values, assets)
+            if isinstance(inner, _Const):
+                return _Const(not inner.value)
+            return _bool_column(~_truth(inner), inner.state)
+
+        if op in ("and", "or"):
+            if not isinstance(values, list):
+                raise Unsupported(op)
+            return self._bool_op(op == "or", values, assets)
+
+        if not isinstance(values, list) or len(values) < 2:
+            raise Unsupported(op)
+
+        if op == "regex":
+            return self._regex(values, assets)
+        if op == "contains":
+            left, right = self._eval(values[0], assets), self._eval(values[1], assets)
+            return self._membership(right, left, _combine(left, right, n))
+
+        if len(values) != 2 or (op not in _ORDERING and op not in _EQUALITY and op != "in"):
+            raise Unsupported(op)
+        left, right = self._eval(values[0], assets), self._eval(values[1], assets)
+        if op == "in":
+            return self._membership(left, right, _combine(left, right, n))
+        return _compare(op, left, right, n)
+
+    def _bool_op(self, stop_on: bool, values: List[Any], assets: Sequence[asset_m.Asset]) -> _Operand:
+        # ``all`` stops at the first falsy operand and ``any`` at the first
+        # truthy one; rows stay "active" until decided.
+        n = len(assets)
+        result = np.full(n, not stop_on)
+        state = np.zeros(n, dtype=np.int8)
+        active = np.ones(n, dtype=bool)
+        touched = False
+        for value in values:
+            node = self._eval(value, assets)
+            if isinstance(node, _Const):
+                if bool(node.value) == stop_on:
+                    if not touched:
+                        return _Const(stop_on)
+                    result[active] = stop_on
+                    break
+                continue
+            touched = True
+            raised = active & (node.state != _OK)
+            state[raised] = node.state[raised]
+            active &= node.state == _OK
+            hit = active & (_truth(node) == stop_on)
+            result[hit] = stop_on
+            active &= ~hit
+            if not active.any():
+                break
+        if not touched:
+            return _Const(not stop_on)
+        return _bool_column(result, state)
+
+    def _membership(self, needle: _Operand, haystack: _Operand, state: Any) -> _Operand:
+        """``needle in haystack`` for every row; *state* is the operands' state."""
+
+        if isinstance(needle, _Const) and isinstance(haystack, _Const):
+            try:
+                return _Const(bool(needle.value in haystack.value))
+            except Exception:
+                state[:] = _ERROR
+                return _Column(np.zeros(len(state), dtype=object), state)
+        if (
+            isinstance(needle, _Column)
+            and isinstance(haystack, _Const)
+            and isinstance(haystack.value, list)
+        ):
+            items = haystack.value
+            if needle.typed is not None and all(_is_number(v) for v in items):
+                hit = np.isin(needle.typed, np.array(items, dtype=np.float64))
+                return _bool_column(hit, state)
+            if needle.strings and all(type(v) is str for v in items):
+                hit = np.frompyfunc(set(items).__contains__, 1, 1)(needle.values)
+                return _bool_column(hit.astype(bool), state)
+        return _bool_column(
+            _elementwise(lambda a, b: a in b, needle, haystack, state), state
+        )
+
+    def _regex(self, values: List[Any], assets: Sequence[asset_m.Asset]) -> _Operand:
+        n = len(assets)
+        value = self._eval(values[0], assets)
+        pattern = self._eval(values[1], assets)
+        if not isinstance(pattern, _Const):
+            raise Unsupported("regex")
+        try:
+            search = re.compile(str(pattern.value)).search
+        except re.error:
+            raise Unsupported("regex") from None
+        if isinstance(value, _Const):
+            return _Const(bool(search(str(value.value))))
+        hit = np.frompyfunc(lambda v: search(str(v)) is not None, 1, 1)(value.values)
+        return _bool_column(hit.astype(bool), value.state.copy())
+
+
+if available:
+    _LABELS = np.array(["PASS", "FAIL", "NA"], dtype=object)
+    _MISSING_ARRAY = np.empty(1, dtype=object)
+    _MISSING_ARRAY[0] = _MISSING
+
+
+__all__ = ["ColumnBatch", "Unsupported", "available"]
@@ -0,0 +1,203 @@
+"""Benchmark ``run_evaluation`` on seeded synthetic data (SQLite).
+
+Each scenario (assets x controls) runs in a fresh subprocess against its own
+SQLite file, so peak RSS is per scenario.  Reported per scenario: results,
+wall time of ``run_evaluation``, results/sec, peak RSS and SQL statements
+executed.  With ``--baseline`` the run fails (exit code 1) when throughput
+drops, or peak RSS grows, by more than ``--threshold`` compared to the
+stored numbers.
+
+Usage::
+
+    cd apps/api
+    python benchmarks/bench_evaluation.py                      # quick scales
+    python benchmarks/bench_evaluation.py --full               # 1k/10k/100k x 50/300/600
+    python benchmarks/bench_evaluation.py --assets 10000 --controls 300
+    python benchmarks/bench_evaluation.py --update-baseline    # rewrite baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+BASE = Path(__file__).resolve().parents[1]
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.extend([str(BASE), str(ROOT)])
+
+BASELINE = Path(__file__).with_name("baseline.json")
+FULL_ASSETS = [1_000, 10_000, 100_000]
+FULL_CONTROLS = [50, 300, 600]
+QUICK = [(1_000, 50), (1_000, 300), (1_000, 600), (10_000, 50)]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenario(assets: int, controls: int, seed: int, exceptions: int | None) -> Dict[str, Any]:
+    """Seed a SQLite database and time one evaluation run (in this process)."""
+
+    from sqlalchemy import create_engine, event, insert
+    from sqlalchemy.orm import sessionmaker
+
+    from app.models import assets as asset_m
+    from app.models import controls as control_m
+    from app.models import db as models_db
+    from app.models import exceptions as exc_m
+    from app.models.db import Base
+    from app.services import evaluator
+    from benchmarks.synthetic import make_assets, make_controls, make_exceptions
+
+    rng = random.Random(seed)
+    asset_rows = make_assets(rng, assets)
+    control_rows = make_controls(rng, controls)
+    exc_rows = make_exceptions(
+        rng, control_rows, asset_rows, exceptions if exceptions is not None else controls // 5
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db", future=True)
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            for table, rows in (
+                (asset_m.Asset.__table__, asset_rows),
+                (control_m.Control.__table__, control_rows),
+                (exc_m.Exception.__table__, exc_rows),
+            ):
+                for start in range(0, len(rows), 5000):
+                    conn.execute(insert(table), rows[start : start + 5000])
+        del asset_rows, control_rows, exc_rows
+
+        statements = [0]
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def count(*_args: Any) -> None:
+            statements[0] += 1
+
+        SessionLocal = sessionmaker(bind=engine, autoflush=False, future=True)
+        evaluator.SessionLocal = SessionLocal
+        models_db.SessionLocal = SessionLocal
+
+        start = time.perf_counter()
+        summary = evaluator.run_evaluation()
+        elapsed = time.perf_counter() - start
+        engine.dispose()
+
+    return {
+        "assets": assets,
+        "controls": controls,
+        "results": summary["results_count"],
+        "seconds": round(elapsed, 3),
+        "results_per_sec": round(summary["results_count"] / elapsed, 1) if elapsed else 0.0,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "queries": statements[0],
+        "timings": summary.get("timings"),
+    }
+
+
+def _key(result: Dict[str, Any]) -> str:
+    return f"{result['assets']}x{result['controls']}"
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Return regression messages for *results* against *baseline*."""
+
+    failures = []
+    for result in results:
+        base = baseline.get(_key(result))
+        if not base:
+            continue
+        floor = base["results_per_sec"] * (1 - threshold)
+        if result["results_per_sec"] < floor:
+            failures.append(
+                f"{_key(result)}: {result['results_per_sec']:.0f} results/s < "
+                f"{floor:.0f} (baseline {base['results_per_sec']:.0f})"
+            )
+        ceiling = base["peak_rss_mb"] * (1 + threshold)
+        if result["peak_rss_mb"] > ceiling:
+            failures.append(
+                f"{_key(result)}: peak RSS {result['peak_rss_mb']:.0f} MB > "
+                f"{ceiling:.0f} MB (baseline {base['peak_rss_mb']:.0f})"
+            )
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--assets", type=int, nargs="+")
+    parser.add_argument("--controls", type=int, nargs="+")
+    parser.add_argument("--full", action="store_true", help="run the full 3x3 matrix")
+    parser.add_argument("--exceptions", type=int, help="default: controls / 5")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.getenv("BENCH_REGRESSION_THRESHOLD", "0.2")),
+        help="allowed relative regression before failing (default 0.2)",
+    )
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_scenario(args.assets[0], args.controls[0], args.seed, args.exceptions)))
+        return 0
+
+    if args.assets or args.controls:
+        scenarios = [
+            (a, c) for a in (args.assets or FULL_ASSETS) for c in (args.controls or FULL_CONTROLS)
+        ]
+    elif args.full:
+        scenarios = [(a, c) for a in FULL_ASSETS for c in FULL_CONTROLS]
+    else:
+        scenarios = QUICK
+
+    results = []
+    for assets, controls in scenarios:
+        cmd = [
+            sys.executable, __file__, "--single",
+            "--assets", str(assets), "--controls", str(controls), "--seed", str(args.seed),
+        ]
+        if args.exceptions is not None:
+            cmd += ["--exceptions", str(args.exceptions)]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        results.append(result)
+        if not args.json:
+            print(
+                f"{assets:>7} assets x {controls:>4} controls: {result['results']:>9} results "
+                f"in {result['seconds']:>8.2f}s  {result['results_per_sec']:>10.0f} results/s  "
+                f"peak RSS {result['peak_rss_mb']:>7.1f} MB  {result['queries']:>6} queries"
+            )
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.update_baseline:
+        baseline.update({_key(r): {k: r[k] for k in ("results_per_sec", "peak_rss_mb", "queries")} for r in results})
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    failures = compare(results, baseline, args.threshold)
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
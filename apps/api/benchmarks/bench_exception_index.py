@@ -0,0 +1,109 @@
+"""Micro-benchmark: linear exception scan vs ``ExceptionIndex``.
+
+Usage::
+
+    cd apps/api
+    python benchmarks/bench_exception_index.py --results 20000 --exceptions 100 1000 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+BASE = Path(__file__).resolve().parents[1]
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.extend([str(BASE), str(ROOT)])
+
+from app.services.evaluator import _exception_matches  # noqa: E402
+from app.services.exception_index import ExceptionIndex  # noqa: E402
+
+TYPES = ["User", "Bucket", "Vm", "Database", "Key"]
+CLOUDS = ["aws", "azure", "gcp"]
+ENVS = ["prod", "dev", "stage"]
+
+
+def make_assets(rng: random.Random, count: int) -> list:
+    return [
+        SimpleNamespace(
+            asset_id=f"asset-{i}",
+            type=rng.choice(TYPES),
+            cloud=rng.choice(CLOUDS),
+            tags={"env": rng.choice(ENVS)},
+        )
+        for i in range(count)
+    ]
+
+
+def make_exceptions(rng: random.Random, count: int, controls: int, assets: int) -> list:
+    exceptions = []
+    for _ in range(count):
+        # Most waivers name a single asset; the rest scope a type in an
+        # environment or cloud.
+        if rng.random() < 0.85:
+            selector = {"asset_id": f"asset-{rng.randrange(assets)}"}
+        else:
+            selector = {"type": rng.choice(TYPES)}
+            if rng.random() < 0.5:
+                selector["env"] = rng.choice(ENVS)
+            else:
+                selector["cloud"] = rng.choice(CLOUDS)
+        exceptions.append(
+            SimpleNamespace(control_id=f"C{rng.randrange(controls)}", selector=selector)
+        )
+    return exceptions
+
+
+def linear(exceptions: list, pairs: list) -> list:
+    out = []
+    for control_id, asset in pairs:
+        hit = None
+        for exc in exceptions:
+            if exc.control_id == control_id and _exception_matches(exc, asset):
+                hit = exc
+                break
+        out.append(hit)
+    return out
+
+
+def indexed(exceptions: list, pairs: list) -> list:
+    index = ExceptionIndex(exceptions)
+    return [index.match(control_id, asset) for control_id, asset in pairs]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, default=20000)
+    parser.add_argument("--controls", type=int, default=50)
+    parser.add_argument("--assets", type=int, default=2000)
+    parser.add_argument("--exceptions", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    assets = make_assets(rng, args.assets)
+    pairs = [
+        (f"C{rng.randrange(args.controls)}", rng.choice(assets))
+        for _ in range(args.results)
+    ]
+    print(f"{'exceptions':>10} {'linear s':>10} {'indexed s':>10} {'speedup':>8}")
+    for count in args.exceptions:
+        exceptions = make_exceptions(rng, count, args.controls, args.assets)
+        t0 = time.perf_counter()
+        expected = linear(exceptions, pairs)
+        t1 = time.perf_counter()
+        actual = indexed(exceptions, pairs)
+        t2 = time.perf_counter()
+        assert [id(e) for e in actual] == [id(e) for e in expected]
+        print(
+            f"{count:>10} {t1 - t0:>10.3f} {t2 - t1:>10.3f} "
+            f"{(t1 - t0) / max(t2 - t1, 1e-9):>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
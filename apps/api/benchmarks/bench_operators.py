@@ -0,0 +1,208 @@
+"""Micro-benchmark: if-chain JsonLogic interpreters vs the operator registry.
+
+Times the string-comparison chains the rules package and the API evaluator
+used before ``packages.rules.operators`` (kept below as a reference) against
+the registry's dispatch tables, per operator, in both ``NONE`` and ``NA``
+mode.  Results are checked to be identical.
+
+Usage::
+
+    cd apps/api
+    python benchmarks/bench_operators.py --contexts 2000 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+BASE = Path(__file__).resolve().parents[1]
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.extend([str(BASE), str(ROOT)])
+
+from packages.rules.operators import NA, NONE, OPERATORS  # noqa: E402
+
+
+def chain_none(rule: Any, data: Dict[str, Any]) -> Any:
+    """``packages.rules.engine.evaluate_logic`` before the registry."""
+
+    if not isinstance(rule, dict):
+        return rule
+    if not rule:
+        return rule
+    op, values = next(iter(rule.items()))
+    if op == "var":
+        return data.get(values)
+    if op == "==":
+        a, b = values
+        return chain_none(a, data) == chain_none(b, data)
+    if op == "!=":
+        a, b = values
+        return chain_none(a, data) != chain_none(b, data)
+    if op == "<":
+        a, b = values
+        av, bv = chain_none(a, data), chain_none(b, data)
+        return av is not None and bv is not None and av < bv
+    if op == "<=":
+        a, b = values
+        av, bv = chain_none(a, data), chain_none(b, data)
+        return av is not None and bv is not None and av <= bv
+    if op == ">":
+        a, b = values
+        av, bv = chain_none(a, data), chain_none(b, data)
+        return av is not None and bv is not None and av > bv
+    if op == ">=":
+        a, b = values
+        av, bv = chain_none(a, data), chain_none(b, data)
+        return av is not None and bv is not None and av >= bv
+    if op == "contains":
+        arr, val = values
+        arr_val = chain_none(arr, data) or []
+        return chain_none(val, data) in arr_val
+    if op == "exists":
+        return chain_none({"var": values}, data) is not None
+    if op == "in":
+        a, b = values
+        return chain_none(a, data) in (chain_none(b, data) or [])
+    if op == "and":
+        return all(chain_none(v, data) for v in values)
+    if op == "or":
+        return any(chain_none(v, data) for v in values)
+    if op == "!":
+        return not chain_none(values, data)
+    raise KeyError(f"Unsupported operator: {op}")
+
+
+def _get_var(data: Dict[str, Any], path: str) -> Any:
+    current: Any = data
+    for part in path.split("."):
+        if isinstance(current, dict) and part in current:
+            current = current[part]
+        else:
+            raise KeyError(path)
+    return current
+
+
+def chain_na(rule: Any, data: Dict[str, Any]) -> Any:
+    """``app.services.evaluator._evaluate`` before the registry."""
+
+    if not isinstance(rule, dict):
+        return rule
+    if not rule:
+        return rule
+    op, values = next(iter(rule.items()))
+    if op == "var":
+        return _get_var(data, values)
+    if op == "exists":
+        try:
+            _get_var(data, values)
+            return True
+        except KeyError:
+            return False
+    if op == "regex":
+        return bool(re.search(str(chain_na(values[1], data)), str(chain_na(values[0], data))))
+    if op == "contains":
+        arr = chain_na(values[0], data)
+        return chain_na(values[1], data) in arr
+    if op == "==":
+        a, b = values
+        return chain_na(a, data) == chain_na(b, data)
+    if op == "!=":
+        a, b = values
+        return chain_na(a, data) != chain_na(b, data)
+    if op == ">":
+        a, b = values
+        return chain_na(a, data) > chain_na(b, data)
+    if op == ">=":
+        a, b = values
+        return chain_na(a, data) >= chain_na(b, data)
+    if op == "<":
+        a, b = values
+        return chain_na(a, data) < chain_na(b, data)
+    if op == "<=":
+        a, b = values
+        return chain_na(a, data) <= chain_na(b, data)
+    if op == "in":
+        a, b = values
+        return chain_na(a, data) in chain_na(b, data)
+    if op == "and":
+        return all(chain_na(v, data) for v in values)
+    if op == "or":
+        return any(chain_na(v, data) for v in values)
+    if op == "!":
+        return not chain_na(values, data)
+    return chain_none(rule, data)
+
+
+RULES: Dict[str, Any] = {
+    "var": {"var": "env"},
+    "==": {"==": [{"var": "env"}, "prod"]},
+    "<=": {"<=": [{"var": "age"}, 90]},
+    "in": {"in": [{"var": "region"}, ["us-east-1", "eu-west-1"]]},
+    "contains": {"contains": [{"var": "roles"}, "admin"]},
+    "exists": {"exists": "owner"},
+    "!": {"!": {"var": "public"}},
+    "and/or": {
+        "and": [
+            {"or": [{"!": {"var": "public"}}, {"var": "encrypted"}]},
+            {"or": [{"var": "mfa"}, {"!": {"var": "console"}}]},
+        ]
+    },
+}
+
+
+def make_contexts(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "env": rng.choice(["prod", "dev"]),
+            "age": rng.randrange(200),
+            "region": rng.choice(["us-east-1", "eu-west-1", "ap-south-1"]),
+            "roles": rng.sample(["admin", "dev", "ops"], 2),
+            "owner": rng.choice(["alice", None]),
+            "public": rng.random() < 0.2,
+            "encrypted": rng.random() < 0.5,
+            "mfa": rng.random() < 0.7,
+            "console": rng.random() < 0.5,
+        }
+        for _ in range(count)
+    ]
+
+
+def best(fn: Callable[[Any, Dict[str, Any]], Any], rule: Any, contexts: list, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for ctx in contexts:
+            fn(rule, ctx)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contexts", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    contexts = make_contexts(random.Random(args.seed), args.contexts)
+    print(f"{'operator':>10} {'mode':>5} {'chain ms':>9} {'registry ms':>12} {'speedup':>8}")
+    for mode, chain in ((NONE, chain_none), (NA, chain_na)):
+        registry = OPERATORS.evaluator(mode)
+        for name, rule in RULES.items():
+            assert [registry(rule, c) for c in contexts] == [chain(rule, c) for c in contexts]
+            old = best(chain, rule, contexts, args.repeat)
+            new = best(registry, rule, contexts, args.repeat)
+            print(
+                f"{name:>10} {mode:>5} {old * 1000:>9.2f} {new * 1000:>12.2f} "
+                f"{old / max(new, 1e-9):>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
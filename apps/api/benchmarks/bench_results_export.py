@@ -0,0 +1,196 @@
+"""Benchmark: result export bodies, in-memory bundle vs streaming formats.
+
+Seeds a SQLite database with ``--results`` results and builds the JSON
+export body the way the endpoint used to (a bundle assembled from
+``query.all()`` ORM rows), then the streamed CSV, JSON and -- when pyarrow
+is installed -- Parquet and Arrow bodies.  Reports time, the peak of Python
+allocations (``tracemalloc``) and the body size of each.
+
+Usage::
+
+    cd apps/api
+    python benchmarks/bench_results_export.py --results 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+BASE = Path(__file__).resolve().parents[1]
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.extend([str(BASE), str(ROOT)])
+
+from app.models import assets as asset_m  # noqa: E402
+from app.models import controls as control_m  # noqa: E402
+from app.models import results as result_m  # noqa: E402
+from app.models.db import Base  # noqa: E402
+from app.services import columnar_export, result_export, run_stats  # noqa: E402
+
+
+def seed(session, results: int, controls: int = 200) -> None:
+    assets = max(1, results // controls)
+    session.execute(
+        insert(asset_m.Asset.__table__),
+        [
+            {
+                "asset_id": f"a{i}",
+                "cloud": "aws",
+                "type": "Bucket",
+                "region": "us-east-1",
+                "tags": {"env": "prod"},
+                "config": {},
+                "evidence": {"source": "bench", "pointer": f"a{i}"},
+                "ingest_source": "bench",
+            }
+            for i in range(assets)
+        ],
+    )
+    session.execute(
+        insert(control_m.Control.__table__),
+        [
+            {
+                "control_id": f"c{j}",
+                "title": f"Control {j}",
+                "category": "storage",
+                "severity": "HIGH",
+                "applies_to": {},
+                "logic": {},
+                "frameworks": ["SOC2", "CIS"],
+                "fix": {"short": "fix it"},
+            }
+            for j in range(controls)
+        ],
+    )
+    now = datetime(2024, 1, 1)
+    rows = [
+        {
+            "run_id": "bench",
+            "control_id": f"c{n % controls}",
+            "control_title": f"Control {n % controls}",
+            "asset_id": f"a{n // controls % assets}",
+            "status": "FAIL" if n % 3 else "PASS",
+            "severity": "HIGH",
+            "frameworks": ["SOC2", "CIS"],
+            "evidence": {"source": "bench", "pointer": f"a{n // controls}"},
+            "fix": {"short": "fix it"},
+            "meta": {},
+            "evaluated_at": now,
+            "asset_type": "Bucket",
+            "cloud": "aws",
+            "region": "us-east-1",
+            "env": "prod",
+            "category": "storage",
+        }
+        for n in range(results)
+    ]
+    for start in range(0, len(rows), 10000):
+        session.execute(insert(result_m.Result.__table__), rows[start : start + 10000])
+    session.commit()
+
+
+def bundle_body(session) -> int:
+    """The JSON export as built before ``result_export``."""
+
+    results = []
+    controls_meta = {}
+    query = (
+        session.query(result_m.Result, asset_m.Asset, control_m.Control)
+        .join(asset_m.Asset, asset_m.Asset.asset_id == result_m.Result.asset_id)
+        .join(
+            control_m.Control,
+            control_m.Control.control_id == result_m.Result.control_id,
+        )
+        .filter(result_m.Result.run_id == "bench")
+    )
+    for r, a, c in query.all():
+        results.append(
+            {
+                "run_id": r.run_id,
+                "evaluated_at": r.evaluated_at.isoformat(),
+                "status": r.status,
+                "severity": r.severity,
+                "category": c.category,
+                "framework_ids": r.frameworks,
+                "control_id": r.control_id,
+                "control_title": r.control_title,
+                "asset_id": r.asset_id,
+                "asset_type": a.type,
+                "cloud": a.cloud,
+                "region": a.region,
+                "env": (a.tags or {}).get("env"),
+                "evidence_source": (r.evidence or {}).get("source"),
+                "evidence_pointer": (r.evidence or {}).get("pointer"),
+                "fix": (r.fix or {}).get("short"),
+            }
+        )
+        controls_meta.setdefault(
+            c.control_id,
+            {
+                "control_id": c.control_id,
+                "title": c.title,
+                "category": c.category,
+                "severity": c.severity,
+            },
+        )
+    bundle = {"run_id": "bench", "results": results, "controls": list(controls_meta.values())}
+    return len(json.dumps(bundle).encode())
+
+
+def stream_body(fmt: str):
+    def body(session) -> int:
+        rows = result_export.chunks(session, run_stats.run_rows(session, "bench"))
+        if fmt in columnar_export.MEDIA_TYPES:
+            pieces = columnar_export.encode(fmt, rows)
+        else:
+            pieces = result_export.encode(fmt, rows, "bench")
+        return sum(len(piece) for piece in pieces)
+
+    return body
+
+
+def measure(fn, session) -> tuple[float, float, int]:
+    session.expunge_all()
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn(session)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1e6, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db", future=True)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine, future=True)
+        with Session() as session:
+            seed(session, args.results)
+        print(f"{args.results} results, orjson={'yes' if result_export.orjson else 'no'}")
+        print(f"{'export':>8} {'s':>8} {'peak MB':>8} {'body MB':>8}")
+        formats = ["csv", "json"]
+        if columnar_export.available:
+            formats += ["parquet", "arrow"]
+        exports = [("bundle", bundle_body)] + [(f, stream_body(f)) for f in formats]
+        for name, fn in exports:
+            with Session() as session:
+                elapsed, peak, size = measure(fn, session)
+            print(f"{name:>8} {elapsed:>8.2f} {peak:>8.1f} {size / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Benchmark: rule-pack upload-to-validated time, extract-to-disk vs streaming.
+
+Builds a signed pack with ``--templates`` copies of the bundled templates
+and compares the parser before ``rulepack_reader`` (kept below: extract the
+tarball to a temporary directory, re-read each file, pure-Python
+``safe_load``) with the in-memory streaming reader.  Both produce the same
+pack; ``disk MB`` is what the old parser wrote to the temporary directory.
+
+Usage::
+
+    cd apps/api
+    python benchmarks/bench_rulepack_parse.py --templates 2000 --workers 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import io
+import os
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import yaml
+from nacl import signing
+
+BASE = Path(__file__).resolve().parents[1]
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.extend([str(BASE), str(ROOT)])
+
+from benchmarks.synthetic import load_templates  # noqa: E402
+from packages.shared.crypto import verify_signature  # noqa: E402
+
+from app.routers import rules  # noqa: E402
+
+# Matches the public key in ``packages.shared.crypto`` (test key).
+PRIVATE_KEY_B64 = "gpXAdxXlavULojMEhEjRN8gmpXBOcIrtn3rwlKQCCis="
+
+
+def _add(tar: tarfile.TarFile, name: str, data: bytes) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def build_pack(count: int) -> bytes:
+    meta = yaml.safe_dump({"version": "bench", "date": "2024-01-01", "min_engine_version": "0"}).encode()
+    sig = signing.SigningKey(base64.b64decode(PRIVATE_KEY_B64)).sign(meta).signature
+    base = load_templates()
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        _add(tar, "rules/meta.yaml", meta)
+        _add(tar, "rules/signatures/meta.sig", base64.b64encode(sig))
+        envs = {"envs": ["prod", "stage", "dev"], "types": ["Bucket"], "params": [{}]}
+        _add(tar, "rules/expansions.yaml", yaml.safe_dump(envs).encode())
+        for i in range(count):
+            t = dict(base[i % len(base)], template_id=f"t{i:05d}")
+            t.pop("category", None)
+            t["frameworks"] = []
+            _add(tar, f"rules/templates/t{i:05d}.yaml", yaml.safe_dump(t).encode())
+        mapping = yaml.safe_dump({"requirement_id": "r1", "mapped_controls": []}).encode()
+        for name in rules.REQUIRED_MAPPINGS:
+            _add(tar, f"rules/mappings/{name}.yaml", mapping)
+    return buf.getvalue()
+
+
+def extract_parse(data: bytes) -> Dict[str, Any]:
+    """``_parse_pack`` before the streaming reader (templates + mappings)."""
+
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        meta_bytes = tar.extractfile("rules/meta.yaml").read()
+        sig = tar.extractfile("rules/signatures/meta.sig").read().decode().strip()
+        verify_signature(meta_bytes, sig)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tar.extractall(tmpdir)
+            rule_dir = Path(tmpdir) / "rules"
+            disk = sum(p.stat().st_size for p in rule_dir.rglob("*") if p.is_file())
+            templates = [
+                yaml.safe_load(p.read_text())
+                for p in sorted((rule_dir / "templates").glob("*.y*ml"))
+            ]
+            mappings = {
+                name: yaml.safe_load((rule_dir / "mappings" / f"{name}.yaml").read_text())
+                for name in rules.REQUIRED_MAPPINGS
+            }
+    return {"templates": templates, "mappings": mappings, "disk": disk}
+
+
+def stream_parse(data: bytes, workers: int) -> Dict[str, Any]:
+    files = rules.reader.read_pack(data)
+    names = sorted(n for n in files if n.startswith(rules.reader.TEMPLATES))
+    templates = rules.reader.load_many([files[n] for n in names], workers=workers)
+    mappings = {
+        name: rules.reader.load_yaml(files[f"{rules.reader.MAPPINGS}{name}.yaml"])
+        for name in rules.REQUIRED_MAPPINGS
+    }
+    return {"templates": templates, "mappings": mappings, "disk": 0}
+
+
+def best(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--templates", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = build_pack(args.templates)
+    old = extract_parse(data)
+    new = stream_parse(data, args.workers)
+    assert old["templates"] == new["templates"] and old["mappings"] == new["mappings"]
+    print(f"pack: {args.templates} templates, {len(data) / 1e6:.2f} MB gzipped")
+    print(f"{'parser':>8} {'parse s':>8} {'disk MB':>8}")
+    old_s = best(lambda: extract_parse(data), args.repeat)
+    print(f"{'extract':>8} {old_s:>8.3f} {old['disk'] / 1e6:>8.2f}")
+    new_s = best(lambda: stream_parse(data, args.workers), args.repeat)
+    print(f"{'stream':>8} {new_s:>8.3f} {0:>8.2f}")
+    os.environ["RULEPACK_PARSE_WORKERS"] = str(args.workers)
+    start = time.perf_counter()
+    pack = rules._parse_pack(data)
+    print(
+        f"full _parse_pack (expand {len(pack.controls)} controls): "
+        f"{time.perf_counter() - start:.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Seeded synthetic data for evaluation benchmarks.
+
+Assets span aws/azure/gcp and IaC resources with config JSON carrying the
+fields the bundled templates read (some left out so controls also produce
+``NA``).  Controls are stamped from ``packages/rules/templates`` the way
+``RuleEngine.expand`` does it -- same ``logic``, different env/type -- and
+exceptions mix asset, type/env and cloud selectors.
+"""
+
+from __future__ import annotations
+
+import random
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List
+
+import yaml
+
+ROOT = Path(__file__).resolve().parents[3]
+TEMPLATES_DIR = ROOT / "packages" / "rules" / "templates"
+
+ENVS = ["prod", "stage", "dev"]
+REGIONS = {
+    "aws": ["us-east-1", "us-west-2", "eu-west-1", "ap-southeast-2"],
+    "azure": ["eastus", "westeurope", "northeurope"],
+    "gcp": ["us-central1", "europe-west1", "asia-east1"],
+    "iac": ["n/a"],
+}
+# type -> kind of config it carries
+TYPES = {
+    "aws": {"User": "identity", "Bucket": "storage", "Instance": "compute", "Database": "database"},
+    "azure": {"User": "identity", "StorageAccount": "storage", "VirtualMachine": "compute", "SqlServer": "database"},
+    "gcp": {"User": "identity", "Bucket": "storage", "Instance": "compute", "CloudSql": "database"},
+    "iac": {"TerraformResource": "storage", "K8sManifest": "compute", "Vendor": "vendor"},
+}
+ALL_TYPES = sorted({t for types in TYPES.values() for t in types})
+SEVERITIES = ["low", "medium", "high", "critical"]
+
+
+def load_templates(directory: Path = TEMPLATES_DIR) -> List[Dict[str, Any]]:
+    templates = []
+    for path in sorted(directory.glob("*.y*ml")):
+        data = yaml.safe_load(path.read_text())
+        if data.get("template_id") == "example":
+            continue
+        data["category"] = path.stem.split("_", 1)[0]
+        templates.append(data)
+    return templates
+
+
+def _maybe(rng: random.Random, config: Dict[str, Any], key: str, value: Any, p: float = 0.9) -> None:
+    if rng.random() < p:
+        config[key] = value
+
+
+def _config(rng: random.Random, kind: str, cloud: str) -> Dict[str, Any]:
+    config: Dict[str, Any] = {}
+    if kind == "identity":
+        roles = rng.sample(["admin", "reader", "writer", "billing", "auditor"], rng.randint(0, 3))
+        config["roles"] = roles
+        _maybe(rng, config, "mfa", rng.random() < 0.8)
+        _maybe(rng, config, "policy_requires_mfa", rng.random() < 0.7)
+        _maybe(rng, config, "actual_mfa", rng.random() < 0.8)
+        _maybe(rng, config, "last_seen_days", rng.randint(0, 400))
+        _maybe(rng, config, "hr_status", rng.choice(["active", "active", "active", "left"]))
+        _maybe(rng, config, "iam_status", rng.choice(["active", "disabled"]))
+        config["password_last_changed_days"] = rng.randint(0, 720)
+        config["access_keys"] = [
+            {"id": f"AK{rng.randrange(10**8):08d}", "age_days": rng.randint(0, 500)}
+            for _ in range(rng.randint(0, 2))
+        ]
+    elif kind == "storage":
+        _maybe(rng, config, "policy_encryption_at_rest", rng.random() < 0.8)
+        _maybe(rng, config, "actual_encryption_at_rest", rng.random() < 0.85)
+        _maybe(rng, config, "policy_retention_days", rng.choice([30, 90, 365]))
+        _maybe(rng, config, "actual_retention_days", rng.choice([7, 30, 90, 365, 730]))
+        _maybe(rng, config, "allowed_regions", rng.sample(REGIONS[cloud], 1 if cloud == "iac" else 2))
+        config["data_classes"] = rng.sample(["PII", "PHI", "PCI", "public", "internal"], rng.randint(0, 2))
+        config["versioning"] = rng.random() < 0.6
+        config["public_access_block"] = {
+            "block_public_acls": rng.random() < 0.9,
+            "restrict_public_buckets": rng.random() < 0.85,
+        }
+        config["lifecycle_rules"] = [
+            {"prefix": f"logs/{i}/", "expire_days": rng.choice([30, 90, 365])}
+            for i in range(rng.randint(0, 3))
+        ]
+    elif kind == "compute":
+        config["image"] = rng.choice(["ubuntu-22.04", "amazon-linux-2", "windows-2019", "cos-stable"])
+        config["public_ip"] = rng.random() < 0.2
+        config["disks"] = [
+            {"size_gb": rng.choice([20, 50, 100, 500]), "encrypted": rng.random() < 0.8}
+            for _ in range(rng.randint(1, 3))
+        ]
+        _maybe(rng, config, "last_seen_days", rng.randint(0, 120))
+        _maybe(rng, config, "allowed_regions", rng.sample(REGIONS[cloud], 1))
+        config["security_groups"] = [
+            {"port": rng.choice([22, 80, 443, 3389, 5432]), "cidr": rng.choice(["0.0.0.0/0", "10.0.0.0/8"])}
+            for _ in range(rng.randint(0, 4))
+        ]
+    elif kind == "database":
+        _maybe(rng, config, "policy_encryption_at_rest", True)
+        _maybe(rng, config, "actual_encryption_at_rest", rng.random() < 0.9)
+        _maybe(rng, config, "policy_retention_days", rng.choice([7, 35]))
+        _maybe(rng, config, "actual_retention_days", rng.choice([1, 7, 14, 35]))
+        config["engine"] = rng.choice(["postgres", "mysql", "sqlserver"])
+        config["multi_az"] = rng.random() < 0.5
+        config["data_classes"] = rng.sample(["PII", "PCI", "internal"], rng.randint(0, 2))
+    else:  # vendor
+        config["data_classes"] = rng.sample(["PII", "PHI", "financial", "public"], rng.randint(0, 2))
+        _maybe(rng, config, "has_critical_scope", rng.random() < 0.3)
+        _maybe(rng, config, "data_location", rng.choice(["EU", "US", "APAC"]), 0.7)
+        _maybe(rng, config, "breach_window_hours", rng.choice([24, 48, 72, 96, 168]), 0.8)
+        config["meta"] = {}
+        _maybe(rng, config["meta"], "dpa_present", rng.random() < 0.7)
+        _maybe(rng, config["meta"], "last_review_days", rng.randint(0, 800))
+        _maybe(rng, config["meta"], "soc2", rng.random() < 0.6)
+        _maybe(rng, config["meta"], "iso27001", rng.random() < 0.4)
+    return config
+
+
+def make_assets(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+    """Return *count* asset rows (dicts matching the ``assets`` table)."""
+
+    clouds = list(TYPES)
+    assets = []
+    for i in range(count):
+        cloud = rng.choices(clouds, weights=[4, 3, 3, 1])[0]
+        type_, kind = rng.choice(list(TYPES[cloud].items()))
+        assets.append(
+            {
+                "asset_id": f"{cloud}-{type_.lower()}-{i:07d}",
+                "cloud": cloud,
+                "type": type_,
+                "region": rng.choice(REGIONS[cloud]),
+                "tags": {"env": rng.choice(ENVS), "owner": f"team-{rng.randint(1, 20)}"},
+                "config": _config(rng, kind, cloud),
+                "evidence": {"source": f"{cloud}_inventory.json", "pointer": f"/items/{i}"},
+                "ingest_source": "synthetic",
+            }
+        )
+    return assets
+
+
+def make_controls(
+    rng: random.Random, count: int, templates: List[Dict[str, Any]] | None = None
+) -> List[Dict[str, Any]]:
+    """Stamp *count* controls from *templates* over env x type combinations."""
+
+    templates = templates or load_templates()
+    controls = []
+    combos = [(env, type_) for env in ENVS for type_ in ALL_TYPES]
+    for i in range(count):
+        template = templates[i % len(templates)]
+        env, type_ = combos[(i // len(templates)) % len(combos)]
+        round_ = i // (len(templates) * len(combos))
+        controls.append(
+            {
+                "control_id": f"{template['template_id']}-{env}-{type_}-{round_}",
+                "title": template["title"],
+                "category": template["category"],
+                "severity": rng.choice(SEVERITIES),
+                "applies_to": {"env": env, "type": type_},
+                "logic": template["logic"],
+                "frameworks": list(template.get("frameworks", [])),
+                "fix": {"summary": f"Remediate {template['template_id']}"},
+            }
+        )
+    return controls
+
+
+def make_exceptions(
+    rng: random.Random,
+    controls: List[Dict[str, Any]],
+    assets: List[Dict[str, Any]],
+    count: int,
+) -> List[Dict[str, Any]]:
+    """Return *count* active exception rows with mixed selector shapes."""
+
+    exceptions = []
+    for i in range(count):
+        control = rng.choice(controls)
+        shape = rng.random()
+        if shape < 0.6 and assets:
+            selector = {"asset_id": rng.choice(assets)["asset_id"]}
+        elif shape < 0.9:
+            selector = {"type": control["applies_to"]["type"], "env": rng.choice(ENVS)}
+        else:
+            selector = {"cloud": rng.choice(list(TYPES))}
+        exceptions.append(
+            {
+                "control_id": control["control_id"],
+                "selector": selector,
+                "reason": "synthetic waiver",
+                "expires_at": date(2099, 1, 1) if rng.random() < 0.9 else date(2000, 1, 1),
+                "created_by": "bench",
+            }
+        )
+    return exceptions
+
+
+__all__ = [
+    "ALL_TYPES",
+    "ENVS",
+    "TYPES",
+    "load_templates",
+    "make_assets",
+    "make_controls",
+    "make_exceptions",
+]
@@ -1,5 +1,7 @@
 """Main application entrypoint."""
 
+import logging
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -8,8 +10,12 @@ from app.core.security import users_db
 import bcrypt
 from app.core.license import load_license, check_seats
 from app.core.logging import LoggingMiddleware
+from app.jobs.evaluation import queue_enabled, get_runner
 from app.metrics import router as metrics_router
 from app.routers import router as api_router
+from app.routers.rules import warm_active_pack
+
+logger = logging.getLogger(__name__)
 
 
 app = FastAPI(title="Raybeam API", docs_url="/docs")
@@ -25,7 +31,8 @@ app.add_middleware(
 
 @app.on_event("startup")
 def bootstrap() -> None:
-    """Load license and seed admin user."""
+    """Load license, seed admin user, precompile the active rule pack and
+    start queued-evaluation workers."""
     load_license()
     if settings.ADMIN_USERNAME and settings.ADMIN_PASSWORD:
         check_seats(len(users_db) + 1)
@@ -36,6 +43,12 @@ def bootstrap() -> None:
                 "password": hashed,
                 "role": "admin",
             }
+    try:
+        logger.info("Precompiled %d rule expressions", warm_active_pack())
+    except Exception as exc:  # the database may not be migrated yet
+        logger.warning("Could not precompile the active rule pack: %s", exc)
+    if queue_enabled():
+        get_runner()
 
 
 @app.get("/health")
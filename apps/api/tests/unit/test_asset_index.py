@@ -0,0 +1,65 @@
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+BASE = Path(__file__).resolve().parents[2]
+ROOT = Path(__file__).resolve().parents[4]
+sys.path.extend([str(BASE), str(ROOT)])
+
+from app.models import assets as asset_m  # noqa: E402
+from app.models.db import Base  # noqa: E402
+from app.services.asset_index import AssetIndex  # noqa: E402
+
+
+def make_session():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, future=True)()
+    for i, type_ in enumerate(["User", "Bucket", "User", "Vm", "Bucket"]):
+        session.add(
+            asset_m.Asset(
+                asset_id=f"A{5 - i}",
+                cloud="aws",
+                type=type_,
+                region="us",
+                tags={},
+                config={"n": i},
+                evidence={},
+                ingest_source="test",
+            )
+        )
+    session.commit()
+    return session
+
+
+def ids(assets):
+    return [a.asset_id for a in assets]
+
+
+def test_index_groups_by_type_and_orders_by_asset_id():
+    session = make_session()
+    index = AssetIndex(session, ["User", "Bucket"])
+    assert index.rows_loaded == 4
+    assert ids(index.assets_for(["User"])) == ["A3", "A5"]
+    assert ids(index.assets_for(["Bucket", "User"])) == ["A1", "A3", "A4", "A5"]
+    assert index.assets_for(["Vm"]) == []
+    queries = index.queries
+    index.assets_for(["User"])
+    assert index.queries == queries
+
+
+def test_index_honours_scope():
+    session = make_session()
+    index = AssetIndex(session, ["User", "Bucket"], assets_scope=["A1", "A3"])
+    assert ids(index.assets_for(["User", "Bucket"])) == ["A1", "A3"]
+
+
+def test_index_falls_back_to_streaming_over_cap():
+    session = make_session()
+    cached = AssetIndex(session, ["User", "Bucket"])
+    streaming = AssetIndex(session, ["User", "Bucket"], max_rows=2)
+    assert streaming.streaming
+    for types in (["User"], ["Bucket", "User"]):
+        assert ids(streaming.assets_for(types)) == ids(cached.assets_for(types))
@@ -0,0 +1,38 @@
+import random
+import sys
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[2]
+ROOT = Path(__file__).resolve().parents[4]
+sys.path.extend([str(BASE), str(ROOT)])
+
+from benchmarks.bench_evaluation import compare  # noqa: E402
+from benchmarks.synthetic import (  # noqa: E402
+    TYPES,
+    load_templates,
+    make_assets,
+    make_controls,
+    make_exceptions,
+)
+
+
+def test_generator_is_seeded_and_covers_clouds():
+    first = make_assets(random.Random(1), 300)
+    assert first == make_assets(random.Random(1), 300)
+    assert {a["cloud"] for a in first} == set(TYPES)
+
+    templates = load_templates()
+    controls = make_controls(random.Random(1), 120, templates)
+    assert len({c["control_id"] for c in controls}) == 120
+    logics = [t["logic"] for t in templates]
+    assert all(c["logic"] in logics for c in controls)
+    exceptions = make_exceptions(random.Random(1), controls, first, 20)
+    assert all(e["control_id"] in {c["control_id"] for c in controls} for e in exceptions)
+
+
+def test_compare_flags_regressions():
+    baseline = {"1000x50": {"results_per_sec": 1000.0, "peak_rss_mb": 100.0}}
+    ok = {"assets": 1000, "controls": 50, "results_per_sec": 850.0, "peak_rss_mb": 110.0}
+    slow = dict(ok, results_per_sec=700.0, peak_rss_mb=130.0)
+    assert compare([ok], baseline, 0.2) == []
+    assert len(compare([slow], baseline, 0.2)) == 2
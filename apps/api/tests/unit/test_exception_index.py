@@ -0,0 +1,45 @@
+import random
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+BASE = Path(__file__).resolve().parents[2]
+ROOT = Path(__file__).resolve().parents[4]
+sys.path.extend([str(BASE), str(ROOT)])
+
+from app.services.evaluator import _exception_matches  # noqa: E402
+from app.services.exception_index import ExceptionIndex  # noqa: E402
+
+
+def linear_match(exceptions, control_id, asset):
+    for exc in exceptions:
+        if exc.control_id == control_id and _exception_matches(exc, asset):
+            return exc
+    return None
+
+
+def test_index_matches_linear_scan_first_match():
+    rng = random.Random(3)
+    choices = {
+        "asset_id": ["A1", "A2", "A3", "", None],
+        "type": ["User", "Bucket", ""],
+        "env": ["prod", "dev", None],
+        "cloud": ["aws", "gcp", ""],
+    }
+    exceptions = []
+    for _ in range(200):
+        selector = {
+            dim: rng.choice(values) for dim, values in choices.items() if rng.random() < 0.5
+        }
+        exceptions.append(
+            SimpleNamespace(control_id=rng.choice(["C1", "C2"]), selector=selector)
+        )
+    exceptions.append(SimpleNamespace(control_id="C1", selector={"type": ["User"]}))
+    index = ExceptionIndex(exceptions)
+    for aid in ["A1", "A2", "A3", "A4"]:
+        for type_ in ["User", "Bucket"]:
+            for tags in [{"env": "prod"}, {"env": "dev"}, {}, None]:
+                for cloud in ["aws", "gcp"]:
+                    asset = SimpleNamespace(asset_id=aid, type=type_, tags=tags, cloud=cloud)
+                    for cid in ["C1", "C2", "C3"]:
+                        assert index.match(cid, asset) is linear_match(exceptions, cid, asset)
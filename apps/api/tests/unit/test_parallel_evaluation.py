@@ -0,0 +1,135 @@
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+BASE = Path(__file__).resolve().parents[2]
+ROOT = Path(__file__).resolve().parents[4]
+sys.path.extend([str(BASE), str(ROOT)])
+
+from packages.rules.operators import OPERATORS  # noqa: E402
+
+from app.models import assets as asset_m, controls as control_m  # noqa: E402
+from app.models.db import Base  # noqa: E402
+from app.services.asset_index import AssetIndex  # noqa: E402
+from app.services.evaluator import _control_types, _evaluate_serial  # noqa: E402
+from app.services.incremental import ControlPlan  # noqa: E402
+from app.services.parallel import evaluate_parallel, portable_operators  # noqa: E402
+
+
+def make_session():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, future=True)()
+    for i in range(40):
+        config = {"mfa": i % 3 == 0, "age": i * 7}
+        if i % 5 == 0:
+            config.pop("age")
+        session.add(
+            asset_m.Asset(
+                asset_id=f"A{i:03d}",
+                cloud="aws",
+                type="User" if i % 2 else "Bucket",
+                region="us",
+                tags={},
+                config=config,
+                evidence={},
+                ingest_source="test",
+            )
+        )
+    controls = [
+        control_m.Control(
+            control_id="C1",
+            title="mfa",
+            category="iam",
+            severity="HIGH",
+            applies_to={"types": ["User"]},
+            logic={"==": [{"var": "config.mfa"}, True]},
+            frameworks=[],
+            fix={},
+        ),
+        control_m.Control(
+            control_id="C2",
+            title="age",
+            category="iam",
+            severity="LOW",
+            applies_to={"types": ["User", "Bucket"]},
+            logic={"<=": [{"var": "config.age"}, 90]},
+            frameworks=[],
+            fix={},
+        ),
+        control_m.Control(
+            control_id="C3",
+            title="none",
+            category="iam",
+            severity="LOW",
+            applies_to={"type": "Vm"},
+            logic={"var": "config.mfa"},
+            frameworks=[],
+            fix={},
+        ),
+    ]
+    session.add_all(controls)
+    session.commit()
+    return session, controls
+
+
+def test_parallel_matches_serial():
+    session, controls = make_session()
+    index = AssetIndex(session, ["User", "Bucket", "Vm"])
+
+    def plans():
+        return [
+            ControlPlan(c, index.assets_for(_control_types(c))) for c in controls
+        ]
+
+    serial = [
+        (p.control.control_id, [a.asset_id for a in p.assets], statuses)
+        for p, statuses in _evaluate_serial(plans())
+    ]
+    parallel = [
+        (p.control.control_id, [a.asset_id for a in p.assets], statuses)
+        for p, statuses in evaluate_parallel(plans(), index, workers=2, chunk_size=7)
+    ]
+    assert parallel == serial
+    assert set(serial[1][2]) == {"PASS", "FAIL", "NA"}
+
+
+def test_parallel_evaluates_only_pending_assets():
+    session, controls = make_session()
+    index = AssetIndex(session, ["User", "Bucket"])
+    assets = index.assets_for(["User", "Bucket"])
+    carried = ["PASS" if i % 2 else None for i in range(len(assets))]
+    plan = ControlPlan(controls[1], assets, carried)
+    ((_, computed),) = list(evaluate_parallel([plan], index, workers=2, chunk_size=4))
+    assert len(computed) == len(plan.pending())
+    merged = plan.merge(computed)
+    (_, full), = list(_evaluate_serial([ControlPlan(controls[1], assets)]))
+    assert [m for m, c in zip(merged, carried) if c is None] == [
+        f for f, c in zip(full, carried) if c is None
+    ]
+
+
+def test_runtime_operators_reach_workers():
+    session, _ = make_session()
+    index = AssetIndex(session, ["User", "Bucket"])
+    control = control_m.Control(
+        control_id="C9",
+        logic={"id_prefix": [{"var": "asset_id"}, "A00"]},
+        applies_to={"types": ["User", "Bucket"]},
+    )
+    OPERATORS.register("id_prefix", str.startswith)
+    try:
+        plan = ControlPlan(control, index.assets_for(["User", "Bucket"]))
+        ((_, serial),) = list(_evaluate_serial([plan]))
+        ((_, parallel),) = list(evaluate_parallel([plan], index, workers=2))
+        assert parallel == serial and set(serial) == {"PASS", "FAIL"}
+
+        OPERATORS.register("id_prefix", lambda value, prefix: True)
+        assert portable_operators() is None
+        with pytest.raises(ValueError):
+            list(evaluate_parallel([plan], index, workers=2))
+    finally:
+        OPERATORS.unregister("id_prefix")
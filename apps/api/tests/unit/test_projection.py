@@ -0,0 +1,74 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import JSON, cast, create_engine, literal, select
+from sqlalchemy.dialects.postgresql import JSONB
+
+BASE = Path(__file__).resolve().parents[2]
+ROOT = Path(__file__).resolve().parents[4]
+sys.path.extend([str(BASE), str(ROOT)])
+
+from app.services.evaluator import control_statuses  # noqa: E402
+from app.services.projection import ConfigProjection  # noqa: E402
+
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+LOGICS = [
+    {"==": [{"var": "config.mfa"}, True]},
+    {"and": [{"exists": "config.meta.soc2"}, {"!": {"var": "config.meta.dpa.signed"}}]},
+    {"in": [{"var": "region"}, {"var": "config.allowed_regions"}]},
+    {"==": [{"var": "tags.env"}, "prod"]},
+]
+
+CONFIGS = [
+    {},
+    None,
+    [1, 2],
+    {"mfa": True, "describe": {"blob": "x" * 100}},
+    {"mfa": None, "meta": {"soc2": True, "dpa": {"signed": False, "pdf": "..."}}},
+    {"meta": {"dpa": "yes"}, "allowed_regions": ["us-east-1"]},
+    {"meta": 5, "allowed_regions": "us-east-1a"},
+]
+
+
+def test_projection_collects_config_paths():
+    projection = ConfigProjection.for_logics(LOGICS)
+    assert projection.paths() == ["allowed_regions", "meta.dpa.signed", "meta.soc2", "mfa"]
+    # A whole-document read wins over its sub-paths.
+    assert ConfigProjection(["meta", "meta.soc2"]).paths() == ["meta"]
+    assert ConfigProjection.for_logics(LOGICS + [{"var": "config"}]) is None
+    assert ConfigProjection.for_logics(LOGICS + [{"custom": [1]}]) is None
+
+
+def test_pruned_config_evaluates_like_full_config():
+    projection = ConfigProjection.for_logics(LOGICS)
+    assert projection.prune(CONFIGS[3]) == {"mfa": True}
+    assert projection.prune(CONFIGS[4]) == {
+        "mfa": None,
+        "meta": {"soc2": True, "dpa": {"signed": False}},
+    }
+    for logic in LOGICS:
+        contexts = [
+            {"region": "us-east-1", "tags": {}, "config": config or {}} for config in CONFIGS
+        ]
+        pruned = [
+            {**ctx, "config": projection.prune(config) or {}}
+            for ctx, config in zip(contexts, CONFIGS)
+        ]
+        assert control_statuses(logic, pruned) == control_statuses(logic, contexts)
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="set TEST_POSTGRES_URL to run JSONB projection tests")
+def test_jsonb_projection_matches_prune():
+    projection = ConfigProjection.for_logics(LOGICS)
+    engine = create_engine(POSTGRES_URL, future=True)
+    try:
+        with engine.connect() as conn:
+            for config in CONFIGS + [{"it's": 1, "meta.soc2": 2}]:
+                doc = cast(cast(literal(json.dumps(config)), JSON), JSONB)
+                assert conn.scalar(select(projection.jsonb(doc))) == projection.prune(config)
+    finally:
+        engine.dispose()
@@ -0,0 +1,72 @@
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+BASE = Path(__file__).resolve().parents[2]
+ROOT = Path(__file__).resolve().parents[4]
+sys.path.extend([str(BASE), str(ROOT)])
+
+from app.models import results as result_m  # noqa: E402
+from app.models.db import Base  # noqa: E402
+from app.services.result_sink import (  # noqa: E402
+    COLUMNS,
+    InsertResultSink,
+    _csv_field,
+    make_result_sink,
+)
+
+
+def row(i, status="PASS"):
+    return (
+        "run1",
+        "C1",
+        'Title "quoted"',
+        f"A{i}",
+        status,
+        "HIGH",
+        ["SOC2"],
+        {"source": None},
+        {},
+        {"prev_status": "FAIL"} if status == "WAIVED" else {},
+        "Bucket",
+        "aws",
+        "us-east-1",
+        None,
+        "Storage",
+    )
+
+
+def test_insert_sink_batches_rows_in_one_transaction():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, future=True)()
+    sink = make_result_sink(session, batch_size=2)
+    assert isinstance(sink, InsertResultSink)
+    for i in range(5):
+        sink.add(row(i, "WAIVED" if i == 4 else "PASS"))
+    sink.close()
+    assert sink.batches == 3
+    assert sink.rows_written == 5
+    session.rollback()
+    assert session.query(result_m.Result).count() == 0
+
+    sink = make_result_sink(session, batch_size=2)
+    sink.extend([row(i) for i in range(3)] + [row(9, "WAIVED")])
+    sink.close()
+    session.commit()
+    results = session.query(result_m.Result).order_by(result_m.Result.id).all()
+    assert [r.asset_id for r in results] == ["A0", "A1", "A2", "A9"]
+    assert results[-1].meta == {"prev_status": "FAIL"}
+    assert results[0].frameworks == ["SOC2"]
+    assert results[0].evaluated_at is not None
+    assert (results[0].cloud, results[0].env, results[0].category) == ("aws", None, "Storage")
+
+
+def test_copy_fields_are_csv_quoted():
+    fields = [_csv_field(c, v) for c, v in zip(COLUMNS, row(1))]
+    assert fields[2] == '"Title ""quoted"""'
+    assert fields[6] == '"[""SOC2""]"'
+    assert fields[-2:] == ["", '"Storage"']
+    assert _csv_field("severity", None) == ""
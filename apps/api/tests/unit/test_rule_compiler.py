@@ -0,0 +1,157 @@
+import itertools
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE = Path(__file__).resolve().parents[2]
+ROOT = Path(__file__).resolve().parents[4]
+sys.path.extend([str(BASE), str(ROOT)])
+
+from app.services.evaluator import _evaluate  # noqa: E402
+from app.services.rule_compiler import (  # noqa: E402
+    compile_logic,
+    logic_hash,
+    operator_counts,
+    raise_free_paths,
+    referenced_paths,
+    set_operand_orders,
+)
+
+CONTEXTS = [
+    {"type": "User", "tags": {"env": "prod"}, "config": {"mfa": True, "age": 30, "name": "alice", "roles": ["admin"]}},
+    {"type": "User", "tags": {}, "config": {"mfa": False, "age": 120, "name": "bob", "roles": []}},
+    {"type": "Bucket", "tags": {"env": "dev"}, "config": {}},
+]
+
+RULES = [
+    {"==": [{"var": "config.mfa"}, True]},
+    {"!=": [{"var": "type"}, "User"]},
+    {"<=": [{"var": "config.age"}, 90]},
+    {">": [{"var": "config.age"}, 18]},
+    {"in": ["admin", {"var": "config.roles"}]},
+    {"contains": [{"var": "config.roles"}, "admin"]},
+    {"regex": [{"var": "config.name"}, "^a"]},
+    {"exists": "tags.env"},
+    {"!": {"exists": "config.mfa"}},
+    {"and": [True, {"var": "config.mfa"}, {"==": [1, 1]}]},
+    {"and": [{"exists": "config.age"}, False, {"var": "config.missing"}]},
+    {"or": [{"==": [{"var": "tags.env"}, "prod"]}, {"var": "config.mfa"}]},
+    {"or": [{"var": "config.mfa"}, True, {"var": "config.missing"}]},
+    {"==": [{"var": "config.missing"}, None]},
+    {"==": [1, 1]},
+    {"!": [{"var": "config.mfa"}]},
+    {},
+    "literal",
+]
+
+
+@pytest.mark.parametrize("rule", RULES)
+def test_compiled_matches_interpreter(rule):
+    compiled = compile_logic(rule)
+    for ctx in CONTEXTS:
+        try:
+            expected = ("ok", _evaluate(rule, ctx))
+        except KeyError:
+            expected = ("na", None)
+        try:
+            actual = ("ok", compiled(ctx))
+        except KeyError:
+            actual = ("na", None)
+        assert actual == expected
+
+
+def test_invalid_regex_only_fails_when_reached():
+    rule = {"and": [{"var": "config.mfa"}, {"regex": [{"var": "config.name"}, "("]}]}
+    compiled = compile_logic(rule)
+    assert compiled(CONTEXTS[1]) is False
+    with pytest.raises(Exception):
+        compiled(CONTEXTS[0])
+
+
+def test_compiled_rules_cached_by_hash():
+    a = {"==": [{"var": "config.mfa"}, True]}
+    b = {"==": [{"var": "config.mfa"}, True]}
+    assert logic_hash(a) == logic_hash(b)
+    assert compile_logic(a) is compile_logic(b)
+
+
+def test_operator_counts():
+    logic = {"and": [{"==": [{"var": "a"}, 1]}, {"or": [{"exists": "b"}, {"==": [{"var": "c"}, 2]}]}]}
+    assert operator_counts(logic) == {"and": 1, "or": 1, "==": 2, "var": 2, "exists": 1}
+
+
+def test_referenced_paths():
+    logic = {"and": [{"==": [{"var": "config.a.b"}, 1]}, {"or": [{"exists": "tags.env"}, {"!": {"var": "type"}}]}]}
+    assert referenced_paths(logic) == {"config.a.b", "tags.env", "type"}
+    assert referenced_paths(True) == set()
+    assert referenced_paths({"var": ["config.a", 1]}) is None
+    assert referenced_paths({"==": [{"custom": [{"var": "config.a"}]}, 1]}) is None
+
+
+def _outcome(rule, ctx):
+    try:
+        return ("ok", rule(ctx))
+    except Exception as exc:
+        return ("error", type(exc))
+
+
+@pytest.mark.parametrize("op", ["and", "or"])
+def test_reordered_operands_keep_file_order_results(op):
+    operands = [
+        {"var": "config.mfa"},
+        {"<": [{"var": "config.age"}, 90]},  # TypeError on strings
+        {"in": [{"var": "tags.env"}, ["prod", "dev"]]},
+        {"!": {"var": "config.missing"}},
+    ]
+    contexts = CONTEXTS + [
+        {"tags": {"env": "prod"}, "config": {"mfa": 0, "age": "old"}},
+        {"tags": {"env": "qa"}, "config": {"mfa": 1, "age": 5, "missing": None}},
+        {"config": {"mfa": None, "missing": 1}},
+    ]
+    rule = {op: operands}
+    try:
+        expected = [_outcome(compile_logic(rule), ctx) for ctx in contexts]
+        for order in itertools.permutations(range(len(operands))):
+            set_operand_orders({logic_hash(rule): order})
+            compiled = compile_logic(rule)
+            assert [_outcome(compiled, ctx) for ctx in contexts] == expected, order
+    finally:
+        set_operand_orders({})
+
+
+def test_raise_free_paths():
+    assert raise_free_paths({"and": [{"var": "a.b"}, {"!": {"exists": "c"}}]}) == {"a.b"}
+    assert raise_free_paths({"in": [{"var": "a"}, [1, 2]]}) == {"a"}
+    assert raise_free_paths({"in": [1, {"var": "a"}]}) is None
+    assert raise_free_paths({"regex": [{"var": "a"}, "("]}) is None
+    assert raise_free_paths({"<": [{"var": "a"}, 1]}) is None
+
+
+def test_custom_operators_compile_like_interpreter():
+    rule = {
+        "and": [
+            {"cidr_contains": ["10.0.0.0/8", {"var": "config.ip"}]},
+            {"semver_lt": [{"var": "config.version"}, "2.0.0"]},
+        ]
+    }
+    contexts = [
+        {"config": {"ip": "10.0.0.1", "version": "1.2.3"}},
+        {"config": {"ip": "11.0.0.1", "version": "1.2.3"}},
+        {"config": {"ip": "10.0.0.1", "version": "2.1"}},
+        {"config": {"ip": "10.0.0.1"}},
+        {"config": {"ip": "bogus", "version": "1.0"}},
+    ]
+    compiled = compile_logic(rule)
+    for ctx in contexts:
+        try:
+            expected = ("ok", _evaluate(rule, ctx))
+        except KeyError:
+            expected = ("na", None)
+        try:
+            actual = ("ok", compiled(ctx))
+        except KeyError:
+            actual = ("na", None)
+        assert actual == expected
+    assert [compiled(ctx) for ctx in contexts[:3]] == [True, False, False]
+    assert referenced_paths(rule) == {"config.ip", "config.version"}
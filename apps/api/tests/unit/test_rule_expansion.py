@@ -3,6 +3,7 @@ from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[4]))
 
+from packages.rules import engine as engine_m
 from packages.rules.engine import ControlTemplate, RuleEngine
 from packages.rules.frameworks import Framework
 
@@ -30,3 +31,48 @@ def test_rule_expansion_generates_controls():
     assert {"FedRAMP Low", "FedRAMP Moderate", "FedRAMP High"}.issubset(
         set(controls[0]["frameworks"])
     )
+
+
+def test_expand_iter_prunes_env_and_type_guards(monkeypatch):
+    logic = {
+        "and": [
+            {"==": [{"var": "env"}, "prod"]},
+            {"!=": [{"var": "type"}, "vm"]},
+            {"var": "enabled"},
+        ]
+    }
+    templates = [ControlTemplate("guarded", "{type} in {env}", logic, [Framework.CIS])]
+    envs = ["prod", "dev", "qa"]
+    types = ["db", "vm", "bucket"]
+    params = [{"enabled": i % 2 == 0, "tier": i} for i in range(10)]
+    expected = [
+        f"guarded-prod-{t}"
+        for t in ("db", "bucket")
+        for i in range(10)
+        if i % 2 == 0
+    ]
+
+    calls = []
+    evaluate = engine_m.evaluate_logic
+
+    def counting(rule, data):
+        if rule is logic:
+            calls.append(data)
+        return evaluate(rule, data)
+
+    monkeypatch.setattr(engine_m, "evaluate_logic", counting)
+    controls = RuleEngine(templates).expand_iter(envs, types, params)
+    assert not calls  # lazy
+    assert [c["control_id"] for c in controls] == expected
+    # Only prod/db and prod/bucket are evaluated per parameter set.
+    assert sum(1 for data in calls if "tier" in data) == 20
+
+
+def test_expand_iter_workers_keep_order():
+    templates = [
+        ControlTemplate(f"t{i}", "{env}", {"!=": [{"var": "env"}, f"e{i}"]}, [])
+        for i in range(4)
+    ]
+    engine = RuleEngine(templates)
+    args = ([f"e{i}" for i in range(4)], ["db", "vm"], [{"n": 1}, {"n": 2}])
+    assert list(engine.expand_iter(*args, workers=2)) == engine.expand(*args)
@@ -0,0 +1,105 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+BASE = Path(__file__).resolve().parents[2]
+ROOT = Path(__file__).resolve().parents[4]
+sys.path.extend([str(BASE), str(ROOT)])
+
+import pytest  # noqa: E402
+
+from app.services import vectorized  # noqa: E402
+from app.services.evaluator import (  # noqa: E402
+    _build_context,
+    _evaluate_serial,
+    control_statuses,
+)
+from app.services.incremental import ControlPlan  # noqa: E402
+from app.services.shared_expressions import SharedExpressions  # noqa: E402
+
+MFA = {"==": [{"var": "config.mfa"}, True]}
+LOGICS = [
+    {"and": [{"==": [{"var": "tags.env"}, "prod"]}, MFA]},
+    {"and": [{"==": [{"var": "tags.env"}, "dev"]}, MFA]},
+    {"and": [{"==": [{"var": "tags.env"}, "dev"]}, MFA]},
+    {"or": [{"!": MFA}, {">": [{"var": "config.age"}, 10]}]},
+    {"==": [{"var": "config.missing"}, 1]},
+    MFA,
+]
+
+
+def make_assets():
+    assets = []
+    for i in range(12):
+        config = {"age": i * 2}
+        if i % 3:
+            config["mfa"] = i % 2 == 0
+        assets.append(
+            SimpleNamespace(
+                asset_id=f"A{i}",
+                type="User",
+                cloud="aws",
+                region="us",
+                tags={"env": ["prod", "dev"][i % 2]},
+                config=config,
+            )
+        )
+    return assets
+
+
+def test_shared_statuses_match_plain_evaluation():
+    assets = make_assets()
+    shared = SharedExpressions(LOGICS)
+    for logic in LOGICS:
+        expected = control_statuses(logic, map(_build_context, assets))
+        assert shared.statuses(logic, assets) == expected
+    stats = shared.stats()
+    assert stats["duplicate_controls"] == 1
+    assert stats["shared_expressions"] >= 2
+    assert stats["reused"] > 0
+    # every memo table is released once its last control has run
+    assert shared.entries == 0
+
+
+def test_controls_evaluated_elsewhere_release_their_memos():
+    assets = make_assets()
+    shared = SharedExpressions(LOGICS)
+    for n, logic in enumerate(LOGICS):
+        if n % 2:
+            shared.release(logic)
+        else:
+            shared.statuses(logic, assets)
+    assert shared.entries == 0 and not shared._tables and not shared._uses
+
+
+def test_folded_sub_trees_are_released():
+    # The second control folds to false without compiling MFA.
+    logics = [{"or": [MFA, {"var": "config.age"}]}, {"and": [False, MFA]}]
+    assets = make_assets()
+    shared = SharedExpressions(logics)
+    for logic in logics:
+        shared.statuses(logic, assets)
+    assert shared.stats()["evaluations"] > 0
+    assert shared.entries == 0 and not shared._tables and not shared._uses
+
+
+@pytest.mark.skipif(not vectorized.available, reason="numpy not installed")
+def test_vectorized_controls_release_shared_memos():
+    assets = make_assets()
+    controls = [SimpleNamespace(control_id=f"C{n}", logic=l) for n, l in enumerate(LOGICS)]
+    shared = SharedExpressions(LOGICS)
+    columns = vectorized.ColumnBatch(min_rows=1)
+    plans = [ControlPlan(c, assets) for c in controls]
+    results = [s for _, s in _evaluate_serial(plans, shared, columns)]
+    assert results == [s for _, s in _evaluate_serial(plans)]
+    assert columns.vectorized
+    assert shared.entries == 0 and not shared._tables and not shared._uses
+
+
+def test_memo_cap_still_evaluates():
+    assets = make_assets()
+    shared = SharedExpressions(LOGICS, max_entries=0)
+    for logic in LOGICS:
+        expected = control_statuses(logic, map(_build_context, assets))
+        assert shared.statuses(logic, assets) == expected
+    assert shared.stats()["reused"] == 0
@@ -0,0 +1,76 @@
+import sys
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[2]
+ROOT = Path(__file__).resolve().parents[4]
+sys.path.extend([str(BASE), str(ROOT)])
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.models import assets as asset_m  # noqa: E402
+from app.models.db import Base  # noqa: E402
+from app.services.simulation import allocate, estimate, simulate  # noqa: E402
+
+
+def test_allocate_is_proportional_with_one_per_stratum():
+    sizes = {("Bucket", "aws", "a"): 900, ("Bucket", "aws", "b"): 90, ("User", "gcp", "c"): 10}
+    alloc = allocate(sizes, 100)
+    assert sum(alloc.values()) == 100
+    assert all(alloc[s] >= 1 for s in sizes)
+    assert alloc[("Bucket", "aws", "a")] > alloc[("Bucket", "aws", "b")] > alloc[("User", "gcp", "c")]
+    # Never more than a stratum holds; all of it when the sample covers everyone.
+    assert allocate({("a", "b", "c"): 3, ("d", "e", "f"): 500}, 400)[("a", "b", "c")] <= 3
+    assert allocate(sizes, 5000) == sizes
+    # Fewer slots than strata: the largest strata get one each.
+    assert allocate(sizes, 2) == {("Bucket", "aws", "a"): 1, ("Bucket", "aws", "b"): 1, ("User", "gcp", "c"): 0}
+
+
+def test_estimate_weights_strata_and_bounds_shrink_to_exhaustive():
+    sizes = {("A", "x", "r"): 900, ("B", "x", "r"): 100}
+    counts = {
+        ("A", "x", "r"): {"PASS": 9, "FAIL": 1, "NA": 0},
+        ("B", "x", "r"): {"PASS": 0, "FAIL": 10, "NA": 0},
+    }
+    out = estimate(counts, sizes)
+    # 0.9 * 0.9 + 0.1 * 0.0, not the unweighted 9 / 20
+    assert abs(out["PASS"]["rate"] - 0.81) < 1e-9
+    assert out["PASS"]["lower"] < 0.81 < out["PASS"]["upper"]
+    assert out["NA"] == {"count": 0, "rate": 0.0, "lower": 0.0, "upper": 0.0}
+
+    full = estimate({("A", "x", "r"): {"PASS": 3, "FAIL": 1, "NA": 0}}, {("A", "x", "r"): 4})
+    assert full["PASS"]["lower"] == full["PASS"]["upper"] == 0.75
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    session = Session(engine, future=True)
+    for i in range(200):
+        session.add(
+            asset_m.Asset(
+                asset_id=f"a{i}",
+                cloud="aws",
+                type="Bucket",
+                region="r1" if i % 4 else "r2",
+                tags={"env": "prod"} if i % 2 else {"env": True},
+                config={"ok": i % 3 == 0},
+                evidence={},
+                ingest_source="test",
+            )
+        )
+    session.commit()
+    return session
+
+
+def test_simulate_filters_in_sql_and_honours_the_budget():
+    session = _session()
+    logic = {"==": [{"var": "config.ok"}, True]}
+    out = simulate(session, logic, {"env": "prod"}, sample_size=20, seed=3)
+    assert out["population"] == 100 and out["evaluated"] == 20
+    assert {(s["region"], s["evaluated"]) for s in out["strata"]} == {("r1", 20)}
+    again = simulate(session, logic, {"env": "prod"}, sample_size=20, seed=3)
+    assert again["distribution"] == out["distribution"]
+
+    out = simulate(session, logic, sample_size=20, time_budget=0)
+    assert out["population"] == 200 and out["evaluated"] == 0 and out["truncated"]
@@ -0,0 +1,263 @@
+import itertools
+import os
+import sys
+import uuid
+from datetime import date
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+BASE = Path(__file__).resolve().parents[2]
+ROOT = Path(__file__).resolve().parents[4]
+sys.path.extend([str(BASE), str(ROOT)])
+
+from app.models import assets as asset_m  # noqa: E402
+from app.models import controls as control_m  # noqa: E402
+from app.models import exceptions as exc_m  # noqa: E402
+from app.models import results as result_m  # noqa: E402
+from app.models.db import Base  # noqa: E402
+from app.services import evaluator  # noqa: E402
+from app.services.exception_index import ExceptionIndex  # noqa: E402
+from app.services.result_sink import InsertResultSink  # noqa: E402
+from app.services.sql_pushdown import (  # noqa: E402
+    SqlPushdown,
+    Unsupported,
+    _waiver_sql,
+    compile_sql,
+)
+
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+needs_postgres = pytest.mark.skipif(
+    not POSTGRES_URL, reason="set TEST_POSTGRES_URL to run SQL pushdown parity tests"
+)
+
+VALUES = [True, False, 0, 1, 1.0, 2.5, -3, "", "a", "B", "prod", "line\nbreak", None, [], [1, "a"], [True], {}, {"k": 1}]
+
+LOGICS = [
+    {"var": "config.v"},
+    {"!": {"var": "config.v"}},
+    {"exists": "config.v"},
+    {"exists": "config.nested.x"},
+    {"==": [{"var": "config.v"}, True]},
+    {"==": [{"var": "config.v"}, 1]},
+    {"!=": [{"var": "config.v"}, "a"]},
+    {"==": [{"var": "config.v"}, {"var": "config.w"}]},
+    {"<": [{"var": "config.v"}, 2]},
+    {">=": [{"var": "config.v"}, "B"]},
+    {"<=": [{"var": "config.v"}, {"var": "config.w"}]},
+    {"in": [{"var": "config.v"}, ["a", 1, True, None]]},
+    {"in": [{"var": "region"}, {"var": "config.regions"}]},
+    {"in": ["a", {"var": "config.v"}]},
+    {"in": [{"var": "config.v"}, {"var": "config.w"}]},
+    {"contains": [{"var": "config.roles"}, "admin"]},
+    {"contains": [{"var": "config.v"}, {"var": "config.w"}]},
+    {"regex": [{"var": "config.v"}, "^[a-z]+$"]},
+    {"regex": [{"var": "asset_id"}, "A(1|2)"]},
+    {"and": [{"==": [{"var": "tags.env"}, "prod"]}, {"var": "config.v"}]},
+    {"and": [{"var": "config.v"}, {"var": "config.missing"}]},
+    {"or": [{"var": "config.v"}, {"var": "config.missing"}]},
+    {"or": [{"!": {"contains": [{"var": "config.roles"}, "admin"]}}, {"==": [{"var": "config.mfa"}, True]}]},
+    {"and": []},
+    {"or": []},
+    {"==": [{"var": "type"}, "User"]},
+    {"==": [{"var": "type.x"}, None]},
+    {"var": "enabled"},
+    {"var": "config"},
+    {"var": "config.nested.x"},
+    True,
+    {"==": [1, 1.0]},
+]
+
+
+def test_unsupported_constructs_raise():
+    for logic in [
+        {"regex": [{"var": "config.v"}, {"var": "config.w"}]},
+        {"regex": [{"var": "config.v"}, "\\d+"]},
+        {"var": ["config.v", 1]},
+        {"some_custom_op": [1, 2]},
+        {"==": [1]},
+    ]:
+        with pytest.raises(Unsupported):
+            compile_sql(logic)
+
+
+def test_non_string_env_selector_is_unsupported():
+    params = {}
+    assert _waiver_sql([exc_m.Exception(selector={"type": 1})], "a", params) == "FALSE"
+    for env in (True, 1, ["prod"]):
+        with pytest.raises(Unsupported):
+            _waiver_sql([exc_m.Exception(selector={"env": env})], "a", params)
+
+
+def test_compiled_sql_binds_constants():
+    compiled = compile_sql({"==": [{"var": "config.mfa"}, True]})
+    assert "'PASS'" in compiled.status
+    assert "true" in compiled.params.values()
+    assert "mfa" in compiled.params.values()
+
+
+@pytest.fixture
+def pg_session():
+    schema = f"pushdown_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(POSTGRES_URL, future=True)
+    with admin.begin() as conn:
+        conn.execute(text(f'CREATE SCHEMA "{schema}"'))
+    engine = create_engine(
+        POSTGRES_URL, future=True, connect_args={"options": f"-csearch_path={schema}"}
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, future=True)
+    try:
+        yield SessionLocal
+    finally:
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+        admin.dispose()
+
+
+def seed(session):
+    configs = [{}]
+    for v, w in itertools.product(VALUES, [None, "a", 2, ["a", 1], {"a": 1}, "xaz"]):
+        configs.append({"v": v, "w": w, "roles": ["admin"] if v else [], "mfa": v})
+    configs += [
+        {"regions": ["us-east-1"], "nested": {"x": 1}},
+        {"regions": "us-east-1x", "nested": {"x": None}},
+        {"regions": {"us-east-1": 1}, "nested": 5},
+        {"regions": None, "nested": []},
+    ]
+    for i, config in enumerate(configs):
+        session.add(
+            asset_m.Asset(
+                asset_id=f"A{i}",
+                cloud="aws",
+                type="User" if i % 5 else "Bucket",
+                region="us-east-1",
+                tags=[{}, {"env": "prod"}, {}, {"env": True}, {}, {"env": 1}][i % 6],
+                config=config,
+                evidence={"source": "s", "pointer": f"/{i}"},
+                ingest_source="test",
+            )
+        )
+    session.commit()
+
+
+def python_status(logic, asset):
+    try:
+        return evaluator.control_statuses(logic, [evaluator._build_context(asset)])[0]
+    except TypeError:
+        return None  # the Python evaluator itself fails on this asset
+
+
+@needs_postgres
+def test_status_parity_with_python_evaluator(pg_session):
+    session = pg_session()
+    seed(session)
+    assets = session.query(asset_m.Asset).all()
+    for n, logic in enumerate(LOGICS):
+        control = control_m.Control(
+            control_id=f"C{n}",
+            title="t",
+            category="c",
+            severity="high",
+            applies_to={"types": ["User", "Bucket"]},
+            logic=logic,
+            frameworks=["F"],
+            fix={},
+        )
+        expected = {a.asset_id: python_status(logic, a) for a in assets}
+        ok = [aid for aid, status in expected.items() if status is not None]
+        sink = InsertResultSink(session)
+        pushdown = SqlPushdown(
+            session, f"run{n}", [], ExceptionIndex([]), sink, assets_scope=ok
+        )
+        counts = pushdown.evaluate(control, ["User", "Bucket"])
+        sink.close()
+        assert counts is not None, logic
+        rows = session.query(result_m.Result).filter_by(run_id=f"run{n}").all()
+        assert {r.asset_id: r.status for r in rows} == {
+            aid: expected[aid] for aid in ok
+        }, logic
+        assert sum(counts.values()) == len(ok)
+        session.commit()
+
+        # Rows Python cannot evaluate must be guarded, not given a status.
+        for aid in set(expected) - set(ok):
+            pushdown = SqlPushdown(
+                session, "err", [], ExceptionIndex([]), sink, assets_scope=[aid]
+            )
+            with pytest.raises(TypeError):
+                pushdown.evaluate(control, ["User", "Bucket"])
+            session.rollback()
+
+
+@needs_postgres
+def test_run_parity_with_waivers(pg_session, monkeypatch, caplog):
+    session = pg_session()
+    seed(session)
+    assets = session.query(asset_m.Asset).filter_by(type="User").all()
+    logics = [
+        logic
+        for logic in LOGICS + [{"regex": [{"var": "config.v"}, {"var": "config.w"}]}]
+        if all(python_status(logic, a) is not None for a in assets)
+    ]
+    assert len(logics) > 20
+    for n, logic in enumerate(logics):
+        session.add(
+            control_m.Control(
+                control_id=f"C{n}",
+                title="t",
+                category="c",
+                severity="high",
+                applies_to={"types": ["User"]},
+                logic=logic,
+                frameworks=["F"],
+                fix={"doc": "x"},
+            )
+        )
+    session.commit()
+    for selector in [{"asset_id": "A3"}, {"type": "User", "env": "prod"}, {"cloud": "gcp"}, {"asset_id": ["A4"]}]:
+        session.add(
+            exc_m.Exception(
+                control_id="C1",
+                selector=selector,
+                reason="r",
+                expires_at=date(2099, 1, 1),
+                created_by="me",
+            )
+        )
+    # Non-string env selectors are left to Python (``True == 1`` there).
+    session.add(
+        exc_m.Exception(
+            control_id="C2",
+            selector={"env": True},
+            reason="r",
+            expires_at=date(2099, 1, 1),
+            created_by="me",
+        )
+    )
+    session.commit()
+    session.close()
+
+    monkeypatch.setattr(evaluator, "SessionLocal", pg_session)
+
+    def snapshot(run_id):
+        s = pg_session()
+        rows = s.query(result_m.Result).filter_by(run_id=run_id).all()
+        s.close()
+        return sorted(
+            (r.control_id, r.asset_id, r.status, r.meta, r.evidence, r.frameworks, r.fix)
+            + (r.asset_type, r.cloud, r.region, r.env, r.category)
+            for r in rows
+        )
+
+    monkeypatch.setenv("EVALUATION_SQL_PUSHDOWN", "false")
+    python_run = evaluator.run_evaluation()
+    monkeypatch.setenv("EVALUATION_SQL_PUSHDOWN", "true")
+    with caplog.at_level("INFO", logger=evaluator.__name__):
+        sql_run = evaluator.run_evaluation()
+    assert f"Evaluated {len(logics) - 2} of {len(logics)} controls in SQL" in caplog.text
+    assert sql_run["results_count"] == python_run["results_count"]
+    assert snapshot(sql_run["run_id"]) == snapshot(python_run["run_id"])
@@ -0,0 +1,111 @@
+import itertools
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+BASE = Path(__file__).resolve().parents[2]
+ROOT = Path(__file__).resolve().parents[4]
+sys.path.extend([str(BASE), str(ROOT)])
+
+pytest.importorskip("numpy")
+
+from app.services import evaluator  # noqa: E402
+from app.services.vectorized import ColumnBatch  # noqa: E402
+
+VALUES = [True, False, 0, 1, 1.0, 2.5, -3, 2**60, "", "a", "B", "line\nbreak", None, [], [1, "a"], ["admin"], {}, {"k": 1}]
+
+LOGICS = [
+    {"var": "config.v"},
+    {"!": {"var": "config.v"}},
+    {"exists": "config.v"},
+    {"exists": "config.nested.x"},
+    {"==": [{"var": "config.v"}, True]},
+    {"==": [{"var": "config.v"}, 1]},
+    {"!=": [{"var": "config.v"}, "a"]},
+    {"==": [{"var": "config.v"}, {"var": "config.w"}]},
+    {"<": [{"var": "config.v"}, 2]},
+    {">=": [{"var": "config.v"}, "B"]},
+    {"<=": [{"var": "config.v"}, {"var": "config.w"}]},
+    {"in": [{"var": "config.v"}, ["a", 1, True, None]]},
+    {"in": [{"var": "config.v"}, [1, 2.5]]},
+    {"in": [{"var": "region"}, {"var": "config.regions"}]},
+    {"contains": [{"var": "config.roles"}, "admin"]},
+    {"regex": [{"var": "config.v"}, "^[a-z]+$"]},
+    {"regex": [{"var": "asset_id"}, "A(1|2)"]},
+    {"and": [{"==": [{"var": "tags.env"}, "prod"]}, {"var": "config.v"}]},
+    {"and": [{"var": "config.v"}, {"var": "config.missing"}]},
+    {"or": [{"var": "config.v"}, {"var": "config.missing"}]},
+    {"or": [{"!": {"contains": [{"var": "config.roles"}, "admin"]}}, {"==": [{"var": "config.mfa"}, True]}]},
+    {"and": [{"var": "config.v"}, False, {"var": "config.missing"}]},
+    {"and": []},
+    {"or": [False, {"var": "enabled"}]},
+    {"==": [{"var": "type"}, "User"]},
+    {"==": [{"var": "type.x"}, None]},
+    {"var": "config.nested.x"},
+    True,
+    {"==": [1, 1.0]},
+]
+
+
+def make_assets():
+    configs = [{}, None]
+    for v, w in itertools.product(VALUES, [None, "a", 2, ["a", 1], {"a": 1}]):
+        configs.append({"v": v, "w": w, "roles": ["admin"] if v else [], "mfa": v})
+    configs += [
+        {"regions": ["us-east-1"], "nested": {"x": 1}},
+        {"regions": "us-east-1x", "nested": {"x": None}},
+        {"regions": {"us-east-1": 1}, "nested": 5},
+    ]
+    return [
+        SimpleNamespace(
+            asset_id=f"A{i}",
+            type="User" if i % 5 else "Bucket",
+            cloud="aws",
+            region="us-east-1",
+            tags={"env": "prod"} if i % 2 else None,
+            config=config,
+        )
+        for i, config in enumerate(configs)
+    ]
+
+
+def python_statuses(logic, assets):
+    return evaluator.control_statuses(logic, map(evaluator._build_context, assets))
+
+
+def test_statuses_match_python_evaluator():
+    assets = make_assets()
+    batch = ColumnBatch()
+    for logic in LOGICS:
+        try:
+            expected = python_statuses(logic, assets)
+        except TypeError:
+            # Rows the closure cannot evaluate are left to it.
+            assert batch.statuses(logic, assets) is None, logic
+            continue
+        assert batch.statuses(logic, assets) == expected, logic
+    assert batch.vectorized > 20
+
+
+def test_unsupported_logic_falls_back():
+    assets = make_assets()
+    batch = ColumnBatch()
+    assert batch.statuses({"regex": [{"var": "config.v"}, {"var": "config.w"}]}, assets) is None
+    assert batch.statuses({"some_custom_op": [1, 2]}, assets) is None
+    assert batch.statuses({"var": "config.v"}, assets[:3]) is None  # below min_rows
+    assert batch.stats() == {"vectorized": 0, "fallbacks": 3}
+
+
+def test_columns_are_shared_between_controls():
+    assets = make_assets()
+    batch = ColumnBatch()
+    batch.statuses({"==": [{"var": "config.nested.x"}, 1]}, assets)
+    cells = batch.cells
+    # ``config`` and ``config.nested`` are cached on the way to ``config.nested.x``.
+    assert cells == 3 * len(assets)
+    batch.statuses({"!": {"var": "config.nested.x"}}, assets)
+    assert batch.cells == cells
+    batch.statuses({"var": "config.nested.x"}, list(assets))
+    assert batch.cells == 2 * cells
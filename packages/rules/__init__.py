@@ -2,5 +2,13 @@
 
 from .engine import ControlTemplate, RuleEngine, load_templates
 from .frameworks import Framework
+from .operators import OPERATORS, register_operator
 
-__all__ = ["ControlTemplate", "RuleEngine", "load_templates", "Framework"]
+__all__ = [
+    "ControlTemplate",
+    "RuleEngine",
+    "load_templates",
+    "Framework",
+    "OPERATORS",
+    "register_operator",
+]
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from itertools import product
 from pathlib import Path
-from typing import Any, Dict, Iterable, List
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
 
 import yaml
 
 from .frameworks import Framework
+from .operators import NONE, OPERATORS
 
 
 @dataclass
@@ -53,59 +55,134 @@ def load_templates(directory: str | Path) -> List[ControlTemplate]:
     return templates
 
 
-def evaluate_logic(rule: Any, data: Dict[str, Any]) -> Any:
-    """Recursively evaluate a subset of JsonLogic expressions."""
+# Evaluate a JsonLogic expression; missing values read as ``None``.
+evaluate_logic = OPERATORS.evaluator(NONE)
 
+
+# Partial evaluation result for a sub-expression that reads unbound variables;
+# ``may_raise`` tells whether evaluating it for some binding could raise.
+class _Unknown:
+    __slots__ = ("may_raise",)
+
+    def __init__(self, may_raise: bool) -> None:
+        self.may_raise = may_raise
+
+
+_SAFE = _Unknown(False)
+_RAISES = _Unknown(True)
+
+
+def _reads(rule: Any, names: Set[str]) -> bool:
+    """Whether *rule* may read one of the variables in *names*."""
+
+    if isinstance(rule, list):
+        return any(_reads(item, names) for item in rule)
     if not isinstance(rule, dict):
-        return rule
+        return False
+    for op, values in rule.items():
+        if op in ("var", "exists") and (not isinstance(values, str) or values in names):
+            return True
+        if _reads(values, names):
+            return True
+    return False
 
-    if not rule:
-        return rule
 
-    op, values = next(iter(rule.items()))
+def _partial(rule: Any, data: Dict[str, Any], free: Set[str]) -> Any:
+    """Evaluate *rule* with the variables in *free* unbound.
+
+    Returns the value :func:`evaluate_logic` gives for every binding of
+    *free*, or an ``_Unknown`` when it depends on them (or may raise).
+    """
 
+    if not _reads(rule, free):
+        try:
+            return evaluate_logic(rule, data)
+        except Exception:
+            return _RAISES
+    op, values = next(iter(rule.items()))
     if op == "var":
-        return data.get(values)
-    if op == "==":
-        a, b = values
-        return evaluate_logic(a, data) == evaluate_logic(b, data)
-    if op == "!=":
-        a, b = values
-        return evaluate_logic(a, data) != evaluate_logic(b, data)
-    if op == "<":
-        a, b = values
-        av, bv = evaluate_logic(a, data), evaluate_logic(b, data)
-        return av is not None and bv is not None and av < bv
-    if op == "<=":
-        a, b = values
-        av, bv = evaluate_logic(a, data), evaluate_logic(b, data)
-        return av is not None and bv is not None and av <= bv
-    if op == ">":
-        a, b = values
-        av, bv = evaluate_logic(a, data), evaluate_logic(b, data)
-        return av is not None and bv is not None and av > bv
-    if op == ">=":
-        a, b = values
-        av, bv = evaluate_logic(a, data), evaluate_logic(b, data)
-        return av is not None and bv is not None and av >= bv
-    if op == "contains":
-        arr, val = values
-        arr_val = evaluate_logic(arr, data) or []
-        return evaluate_logic(val, data) in arr_val
-    if op == "exists":
-        key = values
-        return evaluate_logic({"var": key}, data) is not None
-    if op == "in":
-        a, b = values
-        return evaluate_logic(a, data) in (evaluate_logic(b, data) or [])
-    if op == "and":
-        return all(evaluate_logic(v, data) for v in values)
-    if op == "or":
-        return any(evaluate_logic(v, data) for v in values)
+        return _SAFE if isinstance(values, str) else _RAISES
     if op == "!":
-        return not evaluate_logic(values, data)
-
-    raise KeyError(f"Unsupported operator: {op}")
+        value = _partial(values, data, free)
+        return value if isinstance(value, _Unknown) else not value
+    if op in ("==", "!=") and isinstance(values, list) and len(values) == 2:
+        a, b = (_partial(v, data, free) for v in values)
+        if isinstance(a, _Unknown) or isinstance(b, _Unknown):
+            return _RAISES if _RAISES in (a, b) else _SAFE
+        return (a == b) if op == "==" else (a != b)
+    if op in ("and", "or") and isinstance(values, list):
+        stop_on = op == "or"
+        unknown: _Unknown | None = None
+        for value in values:
+            value = _partial(value, data, free)
+            if isinstance(value, _Unknown):
+                unknown = _RAISES if value.may_raise else (unknown or _SAFE)
+            elif bool(value) == stop_on:
+                # Operands before this one either stop evaluation too or
+                # pass it on -- unless they may raise first.
+                return _RAISES if unknown is _RAISES else stop_on
+        return unknown or (not stop_on)
+    return _RAISES
+
+
+# Expansion runs inside the threaded API process, where fork can deadlock a
+# child; workers come from a fork server (spawned where there is none).
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+# Expansion inputs installed in each worker process by ``_init_worker``.
+_TYPES: List[str] = []
+_PARAMS: List[Dict[str, Any]] = []
+
+
+def _init_worker(types: List[str], params: List[Dict[str, Any]]) -> None:
+    global _TYPES, _PARAMS
+    _TYPES, _PARAMS = types, params
+
+
+def _expand_env_worker(task: Tuple["ControlTemplate", str]) -> List[Dict[str, Any]]:
+    template, env = task
+    return list(_expand_env(template, env, _TYPES, _PARAMS))
+
+
+def _control(
+    template: ControlTemplate, env: str, resource_type: str, param: Dict[str, Any]
+) -> Dict[str, Any]:
+    return {
+        "control_id": f"{template.template_id}-{env}-{resource_type}",
+        "title": template.title.format(env=env, type=resource_type, **param),
+        "applies_to": {"env": env, "type": resource_type, **param},
+        "logic": template.logic,
+        "frameworks": [f.value for f in template.frameworks],
+    }
+
+
+def _bound(env: str, resource_type: str | None, free: Set[str]) -> Dict[str, Any]:
+    data = {"env": env}
+    if resource_type is not None:
+        data["type"] = resource_type
+    return {k: v for k, v in data.items() if k not in free}
+
+
+def _expand_env(
+    template: ControlTemplate,
+    env: str,
+    types: List[str],
+    params: List[Dict[str, Any]],
+) -> Iterator[Dict[str, Any]]:
+    """Controls for one template and environment, pruned by resource type."""
+
+    free = {key for param in params for key in param}
+    for resource_type in types:
+        guard = _partial(template.logic, _bound(env, resource_type, free), free)
+        if not isinstance(guard, _Unknown) and not guard:
+            continue
+        for param in params:
+            if not isinstance(guard, _Unknown) or evaluate_logic(
+                template.logic, {"env": env, "type": resource_type, **param}
+            ):
+                yield _control(template, env, resource_type, param)
 
 
 class RuleEngine:
@@ -130,21 +207,45 @@ class RuleEngine:
         types: Iterable[str],
         params: Iterable[Dict[str, Any]],
     ) -> List[Dict[str, Any]]:
-        controls: List[Dict[str, Any]] = []
+        return list(self.expand_iter(envs, types, params))
+
+    def expand_iter(
+        self,
+        envs: Iterable[str],
+        types: Iterable[str],
+        params: Iterable[Dict[str, Any]],
+        workers: int = 1,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield the controls of :meth:`expand` lazily, in the same order.
+
+        Template logic is first evaluated with only ``env`` (then ``env`` and
+        ``type``) bound: environments and types whose guard is decided for
+        every parameter set are skipped -- or accepted -- without evaluating
+        each combination.  With *workers* > 1 each (template, environment)
+        pair is expanded in a worker process; results are still yielded in
+        order.
+        """
+
+        envs, types, params = list(envs), list(types), list(params)
+        free = {"type"} | {key for param in params for key in param}
+        tasks = []
         for template in self.templates:
-            for env, resource_type, param in product(envs, types, params):
-                context = {"env": env, "type": resource_type, **param}
-                if evaluate_logic(template.logic, context):
-                    control_id = f"{template.template_id}-{env}-{resource_type}"
-                    control = {
-                        "control_id": control_id,
-                        "title": template.title.format(env=env, type=resource_type, **param),
-                        "applies_to": {"env": env, "type": resource_type, **param},
-                        "logic": template.logic,
-                        "frameworks": [f.value for f in template.frameworks],
-                    }
-                    controls.append(control)
-        return controls
+            for env in envs:
+                guard = _partial(template.logic, _bound(env, None, free), free)
+                if isinstance(guard, _Unknown) or guard:
+                    tasks.append((template, env))
+        if workers <= 1 or len(tasks) < 2:
+            for template, env in tasks:
+                yield from _expand_env(template, env, types, params)
+            return
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=_MP_CONTEXT,
+            initializer=_init_worker,
+            initargs=(types, params),
+        ) as pool:
+            for controls in pool.map(_expand_env_worker, tasks):
+                yield from controls
 
 
 __all__ = ["ControlTemplate", "load_templates", "RuleEngine"]
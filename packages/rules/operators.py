@@ -0,0 +1,371 @@
+"""JsonLogic operator registry shared by rule expansion and evaluation.
+
+Operators are looked up in a dispatch table per *mode*, which decides what a
+missing value means:
+
+``NONE``
+    Missing variables read as ``None`` and ordering comparisons involving
+    ``None`` are false.  Used when expanding rule templates
+    (:func:`packages.rules.engine.evaluate_logic`).
+``NA``
+    Missing variables (dotted paths into nested objects) raise
+    :class:`MissingValue`, which the API evaluator reports as ``NA``.
+
+Custom operators are registered once for both modes with
+:meth:`OperatorRegistry.register`; they receive their evaluated arguments
+and raise :class:`MissingValue` when they cannot produce a value, which reads
+as ``None`` in ``NONE`` mode.  Operators whose result depends on more than
+their arguments -- the clock, for instance -- are registered as *volatile*,
+so callers that reuse earlier results know to recompute.  ``cidr_contains``,
+``semver_lt`` and ``days_since`` (volatile) ship by default.
+"""
+
+from __future__ import annotations
+
+import ipaddress
+import operator
+import re
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+
+NONE = "none"
+NA = "na"
+MODES = (NONE, NA)
+
+Evaluate = Callable[[Any, Dict[str, Any]], Any]
+# ``fn(evaluate, values, data)`` -- *values* are the node's raw arguments.
+LazyOperator = Callable[[Evaluate, Any, Dict[str, Any]], Any]
+
+
+class MissingValue(KeyError):
+    """A variable or operator result that is not available."""
+
+
+class UnsupportedOperator(KeyError):
+    def __init__(self, op: str) -> None:
+        super().__init__(f"Unsupported operator: {op}")
+
+
+def _get_path(data: Dict[str, Any], path: str) -> Any:
+    current: Any = data
+    for part in path.split("."):
+        if isinstance(current, dict) and part in current:
+            current = current[part]
+        else:
+            raise MissingValue(path)
+    return current
+
+
+def _var_none(ev: Evaluate, values: Any, data: Dict[str, Any]) -> Any:
+    return data.get(values)
+
+
+def _get_none(data: Dict[str, Any], path: Any) -> Any:
+    return data.get(path)
+
+
+def _exists_none(ev: Evaluate, values: Any, data: Dict[str, Any]) -> bool:
+    return ev({"var": values}, data) is not None
+
+
+def _var_na(ev: Evaluate, values: Any, data: Dict[str, Any]) -> Any:
+    return _get_path(data, values)
+
+
+def _exists_na(ev: Evaluate, values: Any, data: Dict[str, Any]) -> bool:
+    try:
+        _get_path(data, values)
+        return True
+    except KeyError:
+        return False
+
+
+def _binary(fn: Callable[[Any, Any], Any]) -> LazyOperator:
+    def op(ev: Evaluate, values: Any, data: Dict[str, Any]) -> Any:
+        a, b = values
+        # Constant operands evaluate to themselves; skip the call.
+        return fn(
+            ev(a, data) if isinstance(a, dict) else a,
+            ev(b, data) if isinstance(b, dict) else b,
+        )
+
+    return op
+
+
+def _none_safe(fn: Callable[[Any, Any], Any]) -> Callable[[Any, Any], Any]:
+    return lambda a, b: a is not None and b is not None and fn(a, b)
+
+
+def _contains_none(ev: Evaluate, values: Any, data: Dict[str, Any]) -> bool:
+    arr, val = values
+    arr_val = ev(arr, data) or []
+    return ev(val, data) in arr_val
+
+
+def _contains_na(ev: Evaluate, values: Any, data: Dict[str, Any]) -> bool:
+    arr = ev(values[0], data)
+    val = ev(values[1], data)
+    return val in arr
+
+
+def _regex_none(ev: Evaluate, values: Any, data: Dict[str, Any]) -> bool:
+    val = ev(values[0], data)
+    pattern = ev(values[1], data)
+    return val is not None and bool(re.search(str(pattern), str(val)))
+
+
+def _regex_na(ev: Evaluate, values: Any, data: Dict[str, Any]) -> bool:
+    val = ev(values[0], data)
+    pattern = ev(values[1], data)
+    return bool(re.search(str(pattern), str(val)))
+
+
+def _and(ev: Evaluate, values: Any, data: Dict[str, Any]) -> bool:
+    for v in values:
+        if not ev(v, data):
+            return False
+    return True
+
+
+def _or(ev: Evaluate, values: Any, data: Dict[str, Any]) -> bool:
+    for v in values:
+        if ev(v, data):
+            return True
+    return False
+
+
+def _not(ev: Evaluate, values: Any, data: Dict[str, Any]) -> bool:
+    return not ev(values, data)
+
+
+_SHARED: Dict[str, LazyOperator] = {
+    "==": _binary(operator.eq),
+    "!=": _binary(operator.ne),
+    "and": _and,
+    "or": _or,
+    "!": _not,
+}
+
+_CORE: Dict[str, Dict[str, LazyOperator]] = {
+    NONE: {
+        **_SHARED,
+        "var": _var_none,
+        "exists": _exists_none,
+        ">": _binary(_none_safe(operator.gt)),
+        ">=": _binary(_none_safe(operator.ge)),
+        "<": _binary(_none_safe(operator.lt)),
+        "<=": _binary(_none_safe(operator.le)),
+        "in": _binary(lambda a, b: a in (b or [])),
+        "contains": _contains_none,
+        "regex": _regex_none,
+    },
+    NA: {
+        **_SHARED,
+        "var": _var_na,
+        "exists": _exists_na,
+        ">": _binary(operator.gt),
+        ">=": _binary(operator.ge),
+        "<": _binary(operator.lt),
+        "<=": _binary(operator.le),
+        "in": _binary(lambda a, b: a in b),
+        "contains": _contains_na,
+        "regex": _regex_na,
+    },
+}
+
+
+def _eager(fn: Callable[..., Any], mode: str) -> LazyOperator:
+    def op(ev: Evaluate, values: Any, data: Dict[str, Any]) -> Any:
+        args = [ev(v, data) for v in values] if isinstance(values, list) else [ev(values, data)]
+        if mode == NA:
+            return fn(*args)
+        try:
+            return fn(*args)
+        except MissingValue:
+            return None
+
+    return op
+
+
+class OperatorRegistry:
+    """Dispatch tables of JsonLogic operators, one per mode."""
+
+    def __init__(self) -> None:
+        self._tables: Dict[str, Dict[str, LazyOperator]] = {
+            mode: dict(ops) for mode, ops in _CORE.items()
+        }
+        # name -> plain function, for operators registered with ``register``
+        self.custom: Dict[str, Callable[..., Any]] = {}
+        # custom operators whose result may change between calls
+        self.volatile: Set[str] = set()
+        for name, fn in _EXTENSIONS.items():
+            self.register(name, fn, volatile=name in _VOLATILE)
+
+    def register(
+        self,
+        name: str,
+        fn: Callable[..., Any] | None = None,
+        *,
+        volatile: bool = False,
+    ) -> Callable[..., Any]:
+        """Register *fn* as operator *name* in every mode.
+
+        *fn* is called with the evaluated arguments (the node's list, or its
+        single non-list argument).  Pass *volatile* if its result can change
+        for the same arguments (e.g. it reads the clock).  Usable as a
+        decorator.
+        """
+
+        def add(fn: Callable[..., Any]) -> Callable[..., Any]:
+            if name in _CORE[NA]:
+                raise ValueError(f"Cannot override built-in operator {name!r}")
+            self.custom[name] = fn
+            if volatile:
+                self.volatile.add(name)
+            else:
+                self.volatile.discard(name)
+            for mode, table in self._tables.items():
+                table[name] = _eager(fn, mode)
+            return fn
+
+        return add(fn) if fn is not None else add
+
+    def unregister(self, name: str) -> None:
+        if self.custom.pop(name, None) is not None:
+            self.volatile.discard(name)
+            for table in self._tables.values():
+                del table[name]
+
+    def is_volatile(self, names: Iterable[str]) -> bool:
+        """Whether any of the operators *names* is volatile."""
+
+        return not self.volatile.isdisjoint(names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tables[NA]
+
+    def names(self) -> List[str]:
+        return sorted(self._tables[NA])
+
+    def missing(self, names: Iterable[str]) -> List[str]:
+        return sorted(set(names) - set(self._tables[NA]))
+
+    def evaluator(self, mode: str) -> Evaluate:
+        """Return an interpreter for *mode*; later registrations apply to it."""
+
+        table = self._tables[mode]
+        # ``var`` is by far the most common node; read it without dispatch.
+        get = _get_path if mode == NA else _get_none
+
+        def evaluate(rule: Any, data: Dict[str, Any]) -> Any:
+            if rule.__class__ is not dict and not isinstance(rule, dict):
+                return rule
+            for op, values in rule.items():
+                if op == "var":
+                    return get(data, values)
+                fn = table.get(op)
+                if fn is None:
+                    raise UnsupportedOperator(op)
+                return fn(evaluate, values, data)
+            return rule
+
+        return evaluate
+
+
+@lru_cache(maxsize=4096)
+def _parse_network(text: str) -> ipaddress.IPv4Network | ipaddress.IPv6Network | None:
+    try:
+        return ipaddress.ip_network(text, strict=False)
+    except ValueError:
+        return None
+
+
+def _network(value: Any) -> ipaddress.IPv4Network | ipaddress.IPv6Network:
+    network = _parse_network(str(value)) if value is not None else None
+    if network is None:
+        raise MissingValue(f"invalid address {value!r}")
+    return network
+
+
+def cidr_contains(cidr: Any, address: Any) -> bool:
+    """Whether *address* (an address or network) lies within *cidr*."""
+
+    outer, inner = _network(cidr), _network(address)
+    return inner.version == outer.version and inner.subnet_of(outer)  # type: ignore[arg-type]
+
+
+_SEMVER = re.compile(
+    r"^v?(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$"
+)
+
+
+def _semver_key(value: Any) -> Tuple[Any, ...]:
+    match = _SEMVER.match(str(value).strip()) if value is not None else None
+    if match is None:
+        raise MissingValue(f"invalid version {value!r}")
+    major, minor, patch, pre = match.groups()
+    release = (int(major), int(minor or 0), int(patch or 0))
+    if pre is None:
+        # A release sorts after all of its pre-releases.
+        return release + ((1,),)
+    ids = tuple((0, int(p), "") if p.isdigit() else (1, 0, p) for p in pre.split("."))
+    return release + ((0,) + ids,)
+
+
+def semver_lt(a: Any, b: Any) -> bool:
+    """Whether version *a* precedes version *b* (semver precedence)."""
+
+    return _semver_key(a) < _semver_key(b)
+
+
+def days_since(value: Any) -> int:
+    """Whole days from the date or ISO timestamp *value* until now (UTC)."""
+
+    if isinstance(value, datetime):
+        moment = value
+    elif isinstance(value, date):
+        moment = datetime(value.year, value.month, value.day)
+    elif isinstance(value, str):
+        try:
+            moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            raise MissingValue(f"invalid date {value!r}") from None
+    else:
+        raise MissingValue(f"invalid date {value!r}")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - moment).days
+
+
+_EXTENSIONS: Dict[str, Callable[..., Any]] = {
+    "cidr_contains": cidr_contains,
+    "semver_lt": semver_lt,
+    "days_since": days_since,
+}
+_VOLATILE = {"days_since"}
+
+OPERATORS = OperatorRegistry()
+
+
+def register_operator(
+    name: str, fn: Callable[..., Any] | None = None, *, volatile: bool = False
+) -> Callable[..., Any]:
+    """Register a custom operator on the shared :data:`OPERATORS` registry."""
+
+    return OPERATORS.register(name, fn, volatile=volatile)
+
+
+__all__ = [
+    "MODES",
+    "NA",
+    "NONE",
+    "OPERATORS",
+    "MissingValue",
+    "OperatorRegistry",
+    "UnsupportedOperator",
+    "cidr_contains",
+    "days_since",
+    "register_operator",
+    "semver_lt",
+]
@@ -0,0 +1,147 @@
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "apps/api"))
+
+from main import app  # type: ignore
+from app.dependencies import get_db
+from app.jobs import evaluation as jobs
+from app.models.db import Base
+from app.models import controls as control_m, assets as asset_m, jobs as job_m, results as result_m, runs as run_m, db as models_db
+from app.services import evaluator
+
+
+def setup_client(monkeypatch, engine=None):
+    engine = engine or create_engine(
+        "sqlite:///:memory:",
+        future=True,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    TestingSessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    monkeypatch.setattr(models_db, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(evaluator, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setenv("USE_QUEUE", "true")
+    # A runner without threads; tests drive it with process_next().
+    runner = jobs.JobRunner(1)
+    monkeypatch.setattr(jobs, "_runner", runner)
+
+    session = TestingSessionLocal()
+    for i in range(3):
+        session.add(
+            asset_m.Asset(
+                asset_id=f"user{i}",
+                cloud="aws",
+                type="User",
+                region="us-east-1",
+                tags={},
+                config={"mfa": i == 0},
+                evidence={},
+                ingest_source="test",
+            )
+        )
+    for cid in ["C1", "C2"]:
+        session.add(
+            control_m.Control(
+                control_id=cid,
+                title=cid,
+                category="iam",
+                severity="high",
+                applies_to={"types": ["User"]},
+                logic={"==": [{"var": "config.mfa"}, True]},
+                frameworks=[],
+                fix={},
+            )
+        )
+    session.commit()
+    session.close()
+    return TestClient(app), TestingSessionLocal, runner
+
+
+def test_queued_job_runs_and_reports_progress(monkeypatch):
+    client, SessionLocal, runner = setup_client(monkeypatch)
+    queued = jobs.enqueue()
+    assert queued["status"] == "queued"
+
+    session = SessionLocal()
+    assert session.get(run_m.EvaluationRun, queued["run_id"]).status == "queued"
+    session.close()
+
+    assert runner.process_next()
+    assert not runner.process_next()
+
+    resp = client.get(f"/evaluate/jobs/{queued['job_id']}")
+    assert resp.status_code == 200
+    job = resp.json()
+    assert job["status"] == "completed"
+    assert job["controls_done"] == job["controls_total"] == 2
+
+    resp = client.get(f"/evaluate/runs/{queued['run_id']}")
+    assert resp.json()["status"] == "completed"
+    assert resp.json()["results_count"] == 6
+
+
+def test_queued_job_on_file_sqlite_with_several_batches(monkeypatch, tmp_path):
+    # One connection per session, unlike StaticPool: the heartbeat session
+    # must not wait on the run's write transaction.
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/jobs.db",
+        future=True,
+        connect_args={"check_same_thread": False, "timeout": 1},
+    )
+    client, SessionLocal, _ = setup_client(monkeypatch, engine)
+    runner = jobs.JobRunner(1, heartbeat_interval=0)
+    monkeypatch.setattr(jobs, "_runner", runner)
+    monkeypatch.setenv("EVALUATION_BATCH_SIZE", "2")
+    queued = jobs.enqueue()
+    assert runner.process_next()
+
+    job = client.get(f"/evaluate/jobs/{queued['job_id']}").json()
+    assert job["status"] == "completed", job["error"]
+    assert job["controls_done"] == 2
+    assert client.get(f"/evaluate/runs/{queued['run_id']}").json()["results_count"] == 6
+
+
+def test_cancel_queued_job(monkeypatch):
+    client, SessionLocal, runner = setup_client(monkeypatch)
+    queued = jobs.enqueue()
+    resp = client.post(f"/evaluate/jobs/{queued['job_id']}/cancel")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "cancelled"
+    assert not runner.process_next()
+    assert client.get(f"/evaluate/runs/{queued['run_id']}").json()["status"] == "cancelled"
+    assert client.get("/evaluate/jobs/missing").status_code == 404
+
+
+def test_cancel_running_job_stops_and_rolls_back(monkeypatch):
+    client, SessionLocal, runner = setup_client(monkeypatch)
+    queued = jobs.enqueue()
+    session = SessionLocal()
+    session.get(job_m.EvaluationJob, queued["job_id"]).cancel_requested = True
+    session.commit()
+    session.close()
+
+    assert runner.process_next()
+    job = client.get(f"/evaluate/jobs/{queued['job_id']}").json()
+    assert job["status"] == "cancelled"
+    run = client.get(f"/evaluate/runs/{queued['run_id']}").json()
+    assert run["status"] == "cancelled"
+    assert run["error"]
+    session = SessionLocal()
+    assert session.query(result_m.Result).count() == 0
@@ -2,6 +2,7 @@ import sys
 from datetime import date
 from pathlib import Path
 
+import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -169,3 +170,475 @@ def test_framework_filtering():
     assert len(data) == 1
     assert data[0]["control_id"] == "C2"
     assert data[0]["status"] == "FAIL"
+
+
+def test_parallel_run_matches_serial():
+    client, SessionLocal = setup_client()
+    session = SessionLocal()
+    for i in range(12):
+        session.add(
+            asset_m.Asset(
+                asset_id=f"user{i}",
+                cloud="aws",
+                type="User",
+                region="us-east-1",
+                tags={"env": "prod" if i % 2 else "dev"},
+                config={"mfa": i % 3 == 0} if i % 4 else {},
+                evidence={"source": "x", "pointer": "y"},
+                ingest_source="test",
+            )
+        )
+    session.add(
+        control_m.Control(
+            control_id="IAM_USERS_MFA",
+            title="Users must have MFA",
+            category="iam",
+            severity="high",
+            applies_to={"types": ["User"]},
+            logic={"==": [{"var": "config.mfa"}, True]},
+            frameworks=["FedRAMP-Moderate"],
+            fix={},
+        )
+    )
+    session.add(
+        exc_m.Exception(
+            control_id="IAM_USERS_MFA",
+            selector={"asset_id": "user1"},
+            reason="waived",
+            expires_at=date(2099, 1, 1),
+            created_by="me",
+        )
+    )
+    session.commit()
+    session.close()
+
+    from app.services import evaluator
+
+    evaluator.SessionLocal = SessionLocal
+    serial = evaluator.run_evaluation(workers=1)
+    parallel = evaluator.run_evaluation(workers=2)
+
+    session = SessionLocal()
+
+    def statuses(run_id):
+        rows = (
+            session.query(result_m.Result)
+            .filter(result_m.Result.run_id == run_id)
+            .order_by(result_m.Result.id)
+        )
+        return [(r.asset_id, r.status, r.meta) for r in rows]
+
+    assert statuses(parallel["run_id"]) == statuses(serial["run_id"])
+    assert {s for _, s, _ in statuses(serial["run_id"])} == {"PASS", "FAIL", "NA", "WAIVED"}
+
+
+def test_incremental_run_reuses_unchanged_pairs():
+    client, SessionLocal = setup_client()
+    session = SessionLocal()
+    for i in range(4):
+        session.add(
+            asset_m.Asset(
+                asset_id=f"user{i}",
+                cloud="aws",
+                type="User",
+                region="us-east-1",
+                tags={"env": "prod"},
+                config={"mfa": i % 2 == 0},
+                evidence={"source": "x", "pointer": "y"},
+                ingest_source="test",
+            )
+        )
+    session.add(
+        control_m.Control(
+            control_id="IAM_USERS_MFA",
+            title="Users must have MFA",
+            category="iam",
+            severity="high",
+            applies_to={"types": ["User"]},
+            logic={"==": [{"var": "config.mfa"}, True]},
+            frameworks=["FedRAMP-Moderate"],
+            fix={},
+        )
+    )
+    session.commit()
+    session.close()
+
+    from app.services import evaluator
+
+    evaluator.SessionLocal = SessionLocal
+    first = evaluator.run_evaluation()
+    assert first["reused_count"] == 0
+
+    session = SessionLocal()
+    asset = session.query(asset_m.Asset).filter_by(asset_id="user1").one()
+    asset.config = {"mfa": True}
+    session.add(
+        exc_m.Exception(
+            control_id="IAM_USERS_MFA",
+            selector={"asset_id": "user3"},
+            reason="waived",
+            expires_at=date(2099, 1, 1),
+            created_by="me",
+        )
+    )
+    session.commit()
+    session.close()
+
+    second = evaluator.run_evaluation(incremental=True)
+    assert second["reused_count"] == 3
+    assert second["recomputed_count"] == 1
+
+    session = SessionLocal()
+    rows = (
+        session.query(result_m.Result)
+        .filter(result_m.Result.run_id == second["run_id"])
+        .order_by(result_m.Result.asset_id)
+        .all()
+    )
+    assert [r.status for r in rows] == ["PASS", "PASS", "PASS", "WAIVED"]
+    assert rows[3].meta == {"prev_status": "FAIL"}
+
+
+def test_incremental_run_recomputes_clock_dependent_controls(monkeypatch):
+    from datetime import datetime, timezone
+
+    from packages.rules import operators
+
+    client, SessionLocal = setup_client()
+    session = SessionLocal()
+    for i in range(2):
+        session.add(
+            asset_m.Asset(
+                asset_id=f"key{i}",
+                cloud="aws",
+                type="AccessKey",
+                region="us-east-1",
+                tags={},
+                config={"rotated": "2024-01-01", "active": True},
+                evidence={"source": "x", "pointer": "y"},
+                ingest_source="test",
+            )
+        )
+    for control_id, logic in [
+        ("KEY_ROTATED", {"<": [{"days_since": {"var": "config.rotated"}}, 90]}),
+        ("KEY_ACTIVE", {"==": [{"var": "config.active"}, True]}),
+    ]:
+        session.add(
+            control_m.Control(
+                control_id=control_id,
+                title=control_id,
+                category="iam",
+                severity="high",
+                applies_to={"types": ["AccessKey"]},
+                logic=logic,
+                frameworks=[],
+                fix={},
+            )
+        )
+    session.commit()
+    session.close()
+
+    class Clock(datetime):
+        today_ = datetime(2024, 2, 1, tzinfo=timezone.utc)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.today_
+
+    monkeypatch.setattr(operators, "datetime", Clock)
+    from app.services import evaluator
+
+    evaluator.SessionLocal = SessionLocal
+    evaluator.run_evaluation()
+    Clock.today_ = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    second = evaluator.run_evaluation(incremental=True)
+    assert second["reused_count"] == 2 and second["recomputed_count"] == 2
+
+    session = SessionLocal()
+    rows = session.query(result_m.Result).filter(
+        result_m.Result.run_id == second["run_id"]
+    )
+    assert {(r.control_id, r.status) for r in rows} == {
+        ("KEY_ROTATED", "FAIL"),
+        ("KEY_ACTIVE", "PASS"),
+    }
+
+
+def test_run_records_phase_and_control_timings():
+    client, SessionLocal = setup_client()
+    session = SessionLocal()
+    for i in range(3):
+        session.add(
+            asset_m.Asset(
+                asset_id=f"user{i}",
+                cloud="aws",
+                type="User",
+                region="us-east-1",
+                tags={},
+                config={"mfa": i == 0, "age": i},
+                evidence={},
+                ingest_source="test",
+            )
+        )
+    for cid, logic in [
+        ("C_FAST", {"==": [{"var": "config.mfa"}, True]}),
+        ("C_SLOW", {"and": [{">": [{"var": "config.age"}, 0]}, {"!": {"var": "config.mfa"}}]}),
+    ]:
+        session.add(
+            control_m.Control(
+                control_id=cid,
+                title=cid,
+                category="iam",
+                severity="high",
+                applies_to={"types": ["User"]},
+                logic=logic,
+                frameworks=[],
+                fix={},
+            )
+        )
+    session.commit()
+    session.close()
+
+    from app.services import evaluator
+    from app.services.timings import PHASES
+
+    evaluator.SessionLocal = SessionLocal
+    summary = evaluator.run_evaluation()
+    assert set(summary["timings"]) == set(PHASES)
+
+    runs = client.get("/evaluate/runs").json()
+    assert set(runs[0]["timings"]) == set(PHASES)
+    assert runs[0]["timings"]["evaluation"] >= 0
+
+    # The summary of a finished run is served from its rollups.
+    from app.services import run_stats
+
+    session = SessionLocal()
+    assert run_stats.rolled_up(session, summary["run_id"])
+    result = session.query(result_m.Result).filter_by(asset_id="user0").first()
+    assert (result.asset_type, result.cloud, result.region) == ("User", "aws", "us-east-1")
+    assert (result.env, result.category) == (None, "iam")
+    session.close()
+    data = client.get("/results/summary").json()
+    assert data["by_status"]["PASS"] + data["by_status"]["FAIL"] == 6
+
+    resp = client.get("/evaluate/runs/latest/slowest-controls", params={"limit": 5})
+    assert resp.status_code == 200
+    slowest = resp.json()
+    assert {t["control_id"] for t in slowest} == {"C_FAST", "C_SLOW"}
+    assert slowest[0]["seconds"] >= slowest[1]["seconds"]
+    assert all(t["assets_count"] == 3 for t in slowest)
+    assert client.get("/evaluate/runs/missing/slowest-controls").status_code == 404
+
+
+def test_vectorized_run_matches_per_asset(monkeypatch, caplog):
+    pytest.importorskip("numpy")
+    client, SessionLocal = setup_client()
+    session = SessionLocal()
+    for i in range(40):
+        session.add(
+            asset_m.Asset(
+                asset_id=f"user{i:02d}",
+                cloud="aws",
+                type="User",
+                region="us-east-1",
+                tags={"env": "prod" if i % 2 else "dev"},
+                config={"mfa": i % 3 == 0, "roles": ["admin"] * (i % 2)} if i % 4 else {},
+                evidence={"source": "x", "pointer": "y"},
+                ingest_source="test",
+            )
+        )
+    for control_id, logic in [
+        ("MFA", {"==": [{"var": "config.mfa"}, True]}),
+        ("ADMIN_MFA", {"or": [{"!": {"contains": [{"var": "config.roles"}, "admin"]}}, {"var": "config.mfa"}]}),
+        ("CUSTOM", {"some_custom_op": [1, 2]}),
+    ]:
+        session.add(
+            control_m.Control(
+                control_id=control_id,
+                title=control_id,
+                category="iam",
+                severity="high",
+                applies_to={"types": ["User"]},
+                logic=logic,
+                frameworks=["FedRAMP-Moderate"],
+                fix={},
+            )
+        )
+    session.add(
+        exc_m.Exception(
+            control_id="MFA",
+            selector={"asset_id": "user01"},
+            reason="waived",
+            expires_at=date(2099, 1, 1),
+            created_by="me",
+        )
+    )
+    session.commit()
+    session.close()
+
+    from app.services import evaluator
+
+    evaluator.SessionLocal = SessionLocal
+    monkeypatch.setenv("EVALUATION_VECTORIZED", "false")
+    per_asset = evaluator.run_evaluation()
+    monkeypatch.setenv("EVALUATION_VECTORIZED", "true")
+    with caplog.at_level("INFO", logger=evaluator.__name__):
+        columnar = evaluator.run_evaluation()
+    assert "Evaluated 2 controls column-wise, 1 per asset" in caplog.text
+
+    session = SessionLocal()
+
+    def statuses(run_id):
+        rows = (
+            session.query(result_m.Result)
+            .filter(result_m.Result.run_id == run_id)
+            .order_by(result_m.Result.id)
+        )
+        return [(r.control_id, r.asset_id, r.status, r.meta) for r in rows]
+
+    assert statuses(columnar["run_id"]) == statuses(per_asset["run_id"])
+    assert {s for _, _, s, _ in statuses(columnar["run_id"])} == {"PASS", "FAIL", "NA", "WAIVED"}
+
+    # Streamed asset lists are not pinned in columns: per asset only.
+    monkeypatch.setenv("EVALUATION_ASSET_CACHE_ROWS", "10")
+    caplog.clear()
+    with caplog.at_level("INFO", logger=evaluator.__name__):
+        streamed = evaluator.run_evaluation()
+    assert "column-wise" not in caplog.text
+    assert statuses(streamed["run_id"]) == statuses(per_asset["run_id"])
+
+
+def test_projected_run_matches_full_config(monkeypatch):
+    client, SessionLocal = setup_client()
+    session = SessionLocal()
+    for i in range(10):
+        session.add(
+            asset_m.Asset(
+                asset_id=f"user{i}",
+                cloud="aws",
+                type="User",
+                region="us-east-1",
+                tags={"env": "prod"},
+                config={"mfa": i % 3 == 0, "describe": {"blob": "x" * 1000}} if i % 4 else {"describe": []},
+                evidence={"source": "x", "pointer": "y"},
+                ingest_source="test",
+            )
+        )
+    session.add(
+        control_m.Control(
+            control_id="IAM_USERS_MFA",
+            title="Users must have MFA",
+            category="iam",
+            severity="high",
+            applies_to={"types": ["User"]},
+            logic={"==": [{"var": "config.mfa"}, True]},
+            frameworks=["FedRAMP-Moderate"],
+            fix={},
+        )
+    )
+    session.commit()
+    session.close()
+
+    from app.services import evaluator
+    from app.services.asset_index import AssetIndex
+    from app.services.projection import ConfigProjection
+
+    session = SessionLocal()
+    index = AssetIndex(session, ["User"], projection=ConfigProjection(["mfa"]))
+    assert index.assets_for(["User"])[1].config == {"mfa": False}
+    session.commit()
+    session.close()
+
+    evaluator.SessionLocal = SessionLocal
+    monkeypatch.setenv("EVALUATION_PROJECTION", "false")
+    full = evaluator.run_evaluation()
+    monkeypatch.setenv("EVALUATION_PROJECTION", "true")
+    projected = evaluator.run_evaluation()
+
+    session = SessionLocal()
+
+    def statuses(run_id):
+        rows = (
+            session.query(result_m.Result)
+            .filter(result_m.Result.run_id == run_id)
+            .order_by(result_m.Result.id)
+        )
+        return [(r.asset_id, r.status) for r in rows]
+
+    assert statuses(projected["run_id"]) == statuses(full["run_id"])
+    # Pruned documents are never written back.
+    assert all("describe" in a.config for a in session.query(asset_m.Asset))
+
+
+def test_reordered_operands_match_file_order(monkeypatch):
+    client, SessionLocal = setup_client()
+    session = SessionLocal()
+    for i in range(40):
+        session.add(
+            asset_m.Asset(
+                asset_id=f"user{i}",
+                cloud="aws",
+                type="User",
+                region="us-east-1",
+                tags={"env": "prod" if i % 10 == 0 else "dev"},
+                config={"mfa": i % 3 == 0, "name": "svc-" * 200 + str(i)},
+                evidence={"source": "x", "pointer": "y"},
+                ingest_source="test",
+            )
+        )
+    # The cheap ``env`` check almost always decides, but comes last.
+    logic = {
+        "and": [
+            {"regex": [{"var": "config.name"}, "(svc-)+[0-9]*7$"]},
+            {"==": [{"var": "config.mfa"}, True]},
+            {"==": [{"var": "tags.env"}, "prod"]},
+        ]
+    }
+    session.add(
+        control_m.Control(
+            control_id="PROD_SVC",
+            title="Production service users",
+            category="iam",
+            severity="low",
+            applies_to={"types": ["User"]},
+            logic=logic,
+            frameworks=[],
+            fix={},
+        )
+    )
+    session.commit()
+    session.close()
+
+    from app.services import evaluator
+    from app.services.rule_compiler import logic_hash, operand_orders
+
+    evaluator.SessionLocal = SessionLocal
+    monkeypatch.setenv("EVALUATION_VECTORIZED", "false")
+    monkeypatch.setenv("EVALUATION_REORDER", "true")
+    profiled = evaluator.run_evaluation()
+    assert profiled["timings"]["profiling"] > 0
+    reordered = evaluator.run_evaluation()
+    assert operand_orders()[logic_hash(logic)][0] == 2
+
+    orders = client.get("/evaluate/operand-orders").json()
+    assert [o["node_hash"] for o in orders] == [logic_hash(logic)]
+    assert orders[0]["reordered"] and orders[0]["samples"] == 60
+    assert orders[0]["stop_rates"][2] > 0.8
+
+    monkeypatch.setenv("EVALUATION_REORDER", "false")
+    plain = evaluator.run_evaluation()
+    assert operand_orders() == {}
+
+    session = SessionLocal()
+
+    def statuses(run_id):
+        rows = (
+            session.query(result_m.Result)
+            .filter(result_m.Result.run_id == run_id)
+            .order_by(result_m.Result.id)
+        )
+        return [(r.asset_id, r.status) for r in rows]
+
+    assert statuses(reordered["run_id"]) == statuses(plain["run_id"])
+    assert statuses(profiled["run_id"]) == statuses(plain["run_id"])
@@ -220,7 +220,7 @@ def test_residency_module():
         cloud="saas",
         type="dataflow",
         region="us",
-        tags={},
+        tags={"env": True},
         config={"data_class": "pii"},
         evidence={},
         ingest_source="test",
@@ -238,6 +238,7 @@ def test_residency_module():
     session = SessionLocal()
     res = session.query(result_m.Result).one()
     assert res.status == "FAIL"
+    assert (res.asset_type, res.env, res.category) == ("dataflow", "True", "residency")
 
 
 def test_policy_module():
@@ -0,0 +1,92 @@
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from packages.rules.engine import evaluate_logic
+from packages.rules.operators import (
+    NA,
+    NONE,
+    MissingValue,
+    OperatorRegistry,
+    UnsupportedOperator,
+)
+
+DATA = {"env": "prod", "config": {"ip": "10.1.2.3", "version": "1.4.0-rc.1"}, "n": None}
+
+
+def test_modes_differ_only_in_missing_values():
+    registry = OperatorRegistry()
+    none, na = registry.evaluator(NONE), registry.evaluator(NA)
+    assert none({"var": "missing"}, DATA) is None
+    with pytest.raises(MissingValue):
+        na({"var": "missing"}, DATA)
+    # Dotted paths are an NA-mode (API) feature.
+    assert na({"var": "config.ip"}, DATA) == "10.1.2.3"
+    assert none({"var": "config.ip"}, DATA) is None
+    assert none({"<": [{"var": "n"}, 1]}, DATA) is False
+    with pytest.raises(TypeError):
+        na({"<": [{"var": "n"}, 1]}, DATA)
+    for evaluate in (none, na):
+        assert evaluate({"and": [{"==": [{"var": "env"}, "prod"]}, {"!": False}]}, DATA)
+        with pytest.raises(UnsupportedOperator):
+            evaluate({"geo_fence": [1]}, DATA)
+
+
+def test_builtin_custom_operators():
+    registry = OperatorRegistry()
+    na = registry.evaluator(NA)
+    assert na({"cidr_contains": ["10.0.0.0/8", {"var": "config.ip"}]}, DATA)
+    assert na({"cidr_contains": ["10.0.0.0/8", "10.2.0.0/16"]}, DATA)
+    assert not na({"cidr_contains": ["10.0.0.0/8", "192.168.0.1"]}, DATA)
+    assert not na({"cidr_contains": ["10.0.0.0/8", "::1"]}, DATA)
+    assert na({"semver_lt": [{"var": "config.version"}, "1.4.0"]}, DATA)
+    assert na({"semver_lt": ["1.4.0-alpha", "1.4.0-alpha.1"]}, DATA)
+    assert na({"semver_lt": ["v1.9.9", "1.10"]}, DATA)
+    assert not na({"semver_lt": ["2.0.0+build.5", "2.0.0"]}, DATA)
+    ten_days = (datetime.now(timezone.utc) - timedelta(days=10, hours=1)).isoformat()
+    assert na({"days_since": ten_days}, DATA) == 10
+    assert na({"days_since": [date.today().isoformat()]}, DATA) in (0, 1)
+    # Unusable input is a missing value: NA in NA mode, None in NONE mode.
+    for rule in (
+        {"cidr_contains": ["10.0.0.0/8", "not-an-ip"]},
+        {"semver_lt": ["latest", "1.0"]},
+        {"days_since": {"var": "n"}},
+    ):
+        with pytest.raises(MissingValue):
+            na(rule, DATA)
+        assert registry.evaluator(NONE)(rule, DATA) is None
+
+
+def test_registered_operators_apply_to_existing_evaluators():
+    registry = OperatorRegistry()
+    na = registry.evaluator(NA)
+
+    @registry.register("startswith")
+    def startswith(value, prefix):
+        return str(value).startswith(prefix)
+
+    assert na({"startswith": [{"var": "env"}, "pr"]}, DATA) is True
+    assert "startswith" in registry and registry.missing(["startswith", "x"]) == ["x"]
+    with pytest.raises(ValueError):
+        registry.register("var", lambda path: None)
+    registry.unregister("startswith")
+    with pytest.raises(UnsupportedOperator):
+        na({"startswith": [{"var": "env"}, "pr"]}, DATA)
+
+
+def test_volatile_operators():
+    registry = OperatorRegistry()
+    assert registry.is_volatile(["==", "days_since"])
+    assert not registry.is_volatile(["==", "cidr_contains"])
+    registry.register("now_hour", lambda: 0, volatile=True)
+    assert registry.is_volatile(["now_hour"])
+    registry.unregister("now_hour")
+    assert not registry.is_volatile(["now_hour"])
+
+
+def test_rule_engine_uses_none_mode():
+    assert evaluate_logic({"in": [{"var": "missing"}, {"var": "also_missing"}]}, {}) is False
+    assert evaluate_logic({"cidr_contains": ["10.0.0.0/8", {"var": "ip"}]}, {}) is None
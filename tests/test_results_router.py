@@ -2,6 +2,7 @@ import sys
 from datetime import datetime
 from pathlib import Path
 
+import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -91,6 +92,11 @@ def seed_data(SessionLocal):
         fix={},
         evaluated_at=datetime(2024, 1, 1),
         run_id="run1",
+        asset_type="Bucket",
+        cloud="aws",
+        region="us-east-1",
+        env="prod",
+        category="Storage",
     )
     res2 = result_m.Result(
         control_id="C2",
@@ -103,6 +109,11 @@ def seed_data(SessionLocal):
         fix={},
         evaluated_at=datetime(2024, 1, 2),
         run_id="run1",
+        asset_type="Bucket",
+        cloud="aws",
+        region="us-west-1",
+        env="dev",
+        category="Identity",
     )
     res3 = result_m.Result(
         control_id="C1",
@@ -115,6 +126,11 @@ def seed_data(SessionLocal):
         fix={},
         evaluated_at=datetime(2024, 1, 3),
         run_id="run1",
+        asset_type="Bucket",
+        cloud="aws",
+        region="us-west-1",
+        env="dev",
+        category="Storage",
     )
     session.add_all([run, asset1, asset2, control1, control2, res1, res2, res3])
     session.commit()
@@ -170,3 +186,308 @@ def test_framework_filter():
     data = resp.json()
     assert data["total_items"] == 1
     assert data["items"][0]["frameworks"] == ["FedRAMP-Moderate"]
+
+
+def test_results_filter_on_their_own_dimensions():
+    client, SessionLocal = setup_client()
+    seed_data(SessionLocal)
+    session = SessionLocal()
+    session.query(asset_m.Asset).delete()
+    session.query(control_m.Control).delete()
+    session.commit()
+    session.close()
+    # Results keep the asset and control attributes they were evaluated with.
+    data = client.get("/results", params={"env": "dev", "category": "Storage"}).json()
+    assert data["total_items"] == 1
+    item = data["items"][0]
+    assert (item["asset_id"], item["type"], item["region"]) == ("A2", "Bucket", "us-west-1")
+    resp = client.get("/evaluate/results", params={"cloud": "aws", "type": "Bucket", "env": "prod"})
+    assert [r["asset_id"] for r in resp.json()] == ["A1"]
+
+
+def seed_many(SessionLocal, count=23):
+    session = SessionLocal()
+    session.add(run_m.EvaluationRun(run_id="run1", status="completed"))
+    session.add(
+        asset_m.Asset(
+            asset_id="A1", cloud="aws", type="Bucket", region="us-east-1",
+            tags={"env": "prod"}, config={}, evidence={}, ingest_source="test",
+        )
+    )
+    session.add(
+        control_m.Control(
+            control_id="C1", title="Encrypt bucket", category="Storage", severity="LOW",
+            applies_to={}, logic={}, frameworks=[], fix={},
+        )
+    )
+    for i in range(count):
+        session.add(
+            result_m.Result(
+                control_id="C1", control_title="Encrypt bucket", asset_id="A1",
+                status=["PASS", "FAIL", "NA"][i % 3], severity=["LOW", "HIGH"][i % 2],
+                frameworks=[], evidence={}, fix={},
+                # duplicate timestamps exercise the id tie-break
+                evaluated_at=datetime(2024, 1, 1 + i // 4), run_id="run1",
+            )
+        )
+    session.commit()
+    session.close()
+
+
+def test_cursor_pages_match_offset_order():
+    client, SessionLocal = setup_client()
+    seed_many(SessionLocal)
+    for sort_by in ("evaluated_at", "severity", "status"):
+        for sort_dir in ("asc", "desc"):
+            params = {"sort_by": sort_by, "sort_dir": sort_dir}
+            expected = client.get("/results", params={**params, "page_size": 100}).json()["items"]
+            assert len(expected) == 23
+            pages, cursor = [], None
+            while True:
+                query = {**params, "page_size": 5, **({"cursor": cursor} if cursor else {})}
+                data = client.get("/results", params=query).json()
+                pages.append(data)
+                cursor = data["next_cursor"]
+                if cursor is None:
+                    break
+            assert [item for p in pages for item in p["items"]] == expected
+            assert pages[0]["prev_cursor"] is None and pages[0]["total_items"] == 23
+            assert all(p["total_items"] is None for p in pages[1:])
+            # Walk back from the last page with prev_cursor.
+            back, cursor = [pages[-1]["items"]], pages[-1]["prev_cursor"]
+            while cursor:
+                data = client.get("/results", params={**params, "page_size": 5, "cursor": cursor}).json()
+                back.insert(0, data["items"])
+                cursor = data["prev_cursor"]
+            assert [item for items in back for item in items] == expected
+
+
+def test_cursor_validation_and_optional_total():
+    client, SessionLocal = setup_client()
+    seed_many(SessionLocal, count=4)
+    first = client.get("/results", params={"page_size": 2, "include_total": False}).json()
+    assert first["total_items"] is None and first["next_cursor"]
+    resp = client.get("/results", params={"cursor": first["next_cursor"], "sort_by": "status"})
+    assert resp.status_code == 400
+    assert client.get("/results", params={"cursor": "not-a-cursor"}).status_code == 400
+    # Offset pages also hand out cursors.
+    second = client.get("/results", params={"page": 2, "page_size": 2}).json()
+    assert second["prev_cursor"] and second["next_cursor"] is None
+
+
+def test_evaluate_results_cursor():
+    client, SessionLocal = setup_client()
+    seed_many(SessionLocal, count=7)
+    seen, cursor, pages = [], None, []
+    while True:
+        resp = client.get("/evaluate/results", params={"limit": 3, **({"cursor": cursor} if cursor else {})})
+        assert resp.status_code == 200
+        seen += resp.json()
+        pages.append(resp)
+        cursor = resp.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert len(seen) == 7
+    assert "X-Prev-Cursor" not in pages[0].headers
+
+    # Walk back from the last page; offset is ignored with a cursor.
+    back, cursor = [], pages[-1].headers["X-Prev-Cursor"]
+    while cursor:
+        resp = client.get("/evaluate/results", params={"limit": 3, "offset": 5, "cursor": cursor})
+        assert resp.status_code == 200 and resp.headers.get("X-Next-Cursor")
+        back = resp.json() + back
+        cursor = resp.headers.get("X-Prev-Cursor")
+    assert back + pages[-1].json() == seen
+
+    # A cursor is bound to the filters it was issued for.
+    other = {"limit": 3, "status": "FAIL", "cursor": pages[0].headers["X-Next-Cursor"]}
+    assert client.get("/evaluate/results", params=other).status_code == 400
+    assert client.get("/evaluate/results", params={"cursor": "%%"}).status_code == 400
+
+
+SUMMARY_FILTERS = [
+    {},
+    {"status": "FAIL"},
+    {"severity": "LOW", "env": "dev"},
+    {"cloud": "aws", "type": "Bucket", "category": "Storage"},
+    {"framework": "SOC2"},
+    {"asset_id": "A2"},
+]
+
+
+def test_summary_from_rollups_matches_live_rows():
+    from app.services import run_stats
+
+    client, SessionLocal = setup_client()
+    seed_data(SessionLocal)
+    live = [client.get("/results/summary", params=p).json() for p in SUMMARY_FILTERS]
+    live_totals = [client.get("/results", params=p).json()["total_items"] for p in SUMMARY_FILTERS]
+    assert live[0]["by_status"]["FAIL"] == 2
+    assert live[0]["by_framework"] == {"SOC2": 2, "FedRAMP-Moderate": 1}
+    assert live[2]["by_severity"]["LOW"] == 1
+
+    session = SessionLocal()
+    assert run_stats.write_rollups(session, "run1") == 6
+    session.commit()
+    assert run_stats.rolled_up(session, "run1")
+    # Rollups are what a rolled-up run is summarised from.
+    session.query(result_m.Result).delete()
+    session.commit()
+    session.close()
+    for params, expected, total in zip(SUMMARY_FILTERS, live, live_totals):
+        if {"framework", "asset_id"} & set(params):
+            continue
+        assert client.get("/results/summary", params=params).json() == expected
+        assert client.get("/results", params=params).json()["total_items"] == total
+
+
+def test_summary_without_run():
+    client, _ = setup_client()
+    data = client.get("/results/summary").json()
+    assert data["run_id"] == ""
+    assert data["by_status"] == {"PASS": 0, "FAIL": 0, "NA": 0, "WAIVED": 0}
+    assert data["by_framework"] == {}
+
+
+def test_json_and_ndjson_exports_stream_in_chunks(monkeypatch):
+    import json
+
+    from app.services import result_export
+
+    monkeypatch.setattr(result_export, "CHUNK_ROWS", 2)
+    client, SessionLocal = setup_client()
+    seed_data(SessionLocal)
+    resp = client.get("/results/export.json", params={"sort_dir": "asc"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    bundle = resp.json()
+    assert bundle["run_id"] == "run1"
+    assert [(r["control_id"], r["asset_id"]) for r in bundle["results"]] == [
+        ("C1", "A1"),
+        ("C2", "A2"),
+        ("C1", "A2"),
+    ]
+    assert bundle["results"][1] == {
+        "run_id": "run1",
+        "evaluated_at": "2024-01-02T00:00:00",
+        "status": "FAIL",
+        "severity": "HIGH",
+        "category": "Identity",
+        "framework_ids": ["FedRAMP-Moderate"],
+        "control_id": "C2",
+        "control_title": "MFA required",
+        "asset_id": "A2",
+        "asset_type": "Bucket",
+        "cloud": "aws",
+        "region": "us-west-1",
+        "env": "dev",
+        "evidence_source": None,
+        "evidence_pointer": None,
+        "fix": None,
+    }
+    assert [c["control_id"] for c in bundle["controls"]] == ["C1", "C2"]
+
+    resp = client.get("/results/export.ndjson", params={"status": "FAIL"})
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["asset_id"] for r in lines] == ["A2", "A2"]
+    assert lines == [r for r in bundle["results"][::-1] if r["status"] == "FAIL"]
+
+
+def test_export_gzip_negotiation():
+    import gzip
+
+    client, SessionLocal = setup_client()
+    seed_data(SessionLocal)
+    plain = client.get("/results/export.csv", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    resp = client.get(
+        "/results/export.csv", headers={"Accept-Encoding": "br;q=1, gzip;q=0.5"}
+    )
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["vary"]
+    # The client decodes the body; it is the same CSV.
+    assert resp.text == plain.text
+    with client.stream(
+        "GET", "/results/export.csv", headers={"Accept-Encoding": "gzip"}
+    ) as raw:
+        assert gzip.decompress(b"".join(raw.iter_raw())) == plain.content
+
+
+def test_export_without_run():
+    client, _ = setup_client()
+    assert client.get("/results/export.json").json() == {
+        "run_id": "",
+        "results": [],
+        "controls": [],
+    }
+    assert client.get("/results/export.ndjson").text == ""
+    assert client.get("/results/export.csv").text.startswith("run_id,")
+
+
+def test_parquet_and_arrow_exports(monkeypatch):
+    import io
+
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    from app.services import result_export
+
+    monkeypatch.setattr(result_export, "CHUNK_ROWS", 2)
+    client, SessionLocal = setup_client()
+    seed_data(SessionLocal)
+    rows = client.get("/results/export.json", params={"sort_dir": "asc"}).json()["results"]
+
+    resp = client.get("/results/export.parquet", params={"sort_dir": "asc"})
+    assert resp.status_code == 200
+    parquet = pq.ParquetFile(io.BytesIO(resp.content))
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert table.schema.field("status").type == pa.dictionary(pa.int32(), pa.string())
+    assert table.column_names == list(result_export.FIELDS)
+    exported = table.to_pylist()
+    for row in exported:
+        row["evaluated_at"] = row["evaluated_at"].replace(tzinfo=None).isoformat()
+    assert exported == rows
+
+    resp = client.get("/results/export.arrow", params={"status": "FAIL"})
+    assert resp.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(resp.content).read_all()
+    assert table.column("asset_id").to_pylist() == ["A2", "A2"]
+    assert table.column("control_id").to_pylist() == ["C1", "C2"]
+
+
+def test_whole_run_columnar_export_is_cached(monkeypatch, tmp_path):
+    pytest.importorskip("pyarrow")
+    from app.services import columnar_export
+
+    monkeypatch.setattr(columnar_export, "CACHE_DIR", str(tmp_path))
+    client, SessionLocal = setup_client()
+    seed_data(SessionLocal)
+    # Unfinished runs are not cached.
+    first = client.get("/results/export.parquet").content
+    assert not list(tmp_path.iterdir())
+
+    session = SessionLocal()
+    session.get(run_m.EvaluationRun, "run1").status = "completed"
+    session.commit()
+    session.close()
+    client.get("/results/export.parquet", params={"status": "FAIL"})
+    assert not list(tmp_path.iterdir())
+    assert client.get("/results/export.parquet").content == first
+    assert [p.name for p in tmp_path.iterdir()] == ["run1.parquet"]
+
+    (tmp_path / "run1.parquet").write_bytes(b"cached")
+    assert client.get("/results/export.parquet").content == b"cached"
+    columnar_export.evict(["run1"])
+    assert not list(tmp_path.iterdir())
+
+
+def test_columnar_export_requires_pyarrow(monkeypatch):
+    from app.services import columnar_export
+
+    monkeypatch.setattr(columnar_export, "available", False)
+    client, SessionLocal = setup_client()
+    seed_data(SessionLocal)
+    resp = client.get("/results/export.arrow")
+    assert resp.status_code == 501
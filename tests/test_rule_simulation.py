@@ -0,0 +1,110 @@
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "apps/api"))
+
+from main import app  # type: ignore
+from app.dependencies import get_db
+from app.models.db import Base
+from app.models import assets as asset_m, results as result_m
+
+
+def setup_client():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        future=True,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    TestingSessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+    Base.metadata.create_all(bind=engine)
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    session = TestingSessionLocal()
+    for i in range(300):
+        cloud, region = ("aws", "us-east-1") if i % 3 else ("gcp", "us-central1")
+        config = {} if i % 10 == 0 else {"encrypted": i % 4 != 0}
+        session.add(
+            asset_m.Asset(
+                asset_id=f"b{i}", cloud=cloud, type="Bucket", region=region,
+                tags={"env": "prod" if i % 2 else "dev"}, config=config,
+                evidence={}, ingest_source="test",
+            )
+        )
+    session.add(
+        asset_m.Asset(
+            asset_id="u1", cloud="aws", type="User", region="us-east-1",
+            tags={}, config={"mfa": True}, evidence={}, ingest_source="test",
+        )
+    )
+    session.commit()
+    session.close()
+    return TestClient(app), TestingSessionLocal
+
+
+LOGIC = {"==": [{"var": "config.encrypted"}, True]}
+
+
+def test_simulate_exhaustive_sample_matches_full_evaluation():
+    client, SessionLocal = setup_client()
+    r = client.post("/rules/simulate", json={"logic": LOGIC, "filter": {"types": ["Bucket"]}, "sample_size": 1000})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["population"] == body["evaluated"] == 300
+    assert body["exhaustive"] and not body["truncated"]
+    # i % 10 == 0 -> NA; i % 4 == 0 (else) -> FAIL
+    na = sum(1 for i in range(300) if i % 10 == 0)
+    fail = sum(1 for i in range(300) if i % 10 and i % 4 == 0)
+    dist = body["distribution"]
+    assert (dist["NA"]["count"], dist["FAIL"]["count"], dist["PASS"]["count"]) == (na, fail, 300 - na - fail)
+    assert dist["FAIL"]["lower"] == dist["FAIL"]["upper"] == round(fail / 300, 6)
+    assert len(body["failing_examples"]) == 5
+    assert {s["cloud"] for s in body["strata"]} == {"aws", "gcp"}
+    session = SessionLocal()
+    assert session.query(result_m.Result).count() == 0
+
+
+def test_simulate_samples_strata_and_filters():
+    client, _ = setup_client()
+    r = client.post(
+        "/rules/simulate",
+        json={"logic": LOGIC, "filter": {"types": ["Bucket"], "env": "prod"}, "sample_size": 30, "seed": 1},
+    )
+    body = r.json()
+    assert body["population"] == 150 and body["evaluated"] == 30 and not body["exhaustive"]
+    strata = {s["cloud"]: s for s in body["strata"]}
+    assert strata["aws"]["evaluated"] == 20 and strata["gcp"]["evaluated"] == 10
+    for status in ("PASS", "FAIL", "NA"):
+        d = body["distribution"][status]
+        assert 0.0 <= d["lower"] <= d["rate"] <= d["upper"] <= 1.0
+    same = client.post(
+        "/rules/simulate",
+        json={"logic": LOGIC, "filter": {"types": ["Bucket"], "env": "prod"}, "sample_size": 30, "seed": 1},
+    ).json()
+    assert same["distribution"] == body["distribution"]
+
+
+def test_simulate_time_budget_and_errors():
+    client, _ = setup_client()
+    r = client.post("/rules/simulate", json={"logic": LOGIC, "sample_size": 301, "time_budget_ms": 10})
+    body = r.json()
+    # A spent budget stops sampling and evaluation, whichever comes first.
+    assert 0 <= body["evaluated"] <= body["sample_size"] == 301
+    assert body["truncated"] == (body["evaluated"] < 301)
+    r = client.post("/rules/simulate", json={"logic": {"geo_fence": [1, 2]}})
+    assert r.status_code == 400 and r.json()["detail"] == "Unsupported operators: geo_fence"
+    r = client.post("/rules/simulate", json={"logic": {">": [{"var": "asset_id"}, 1]}})
+    assert r.status_code == 400 and r.json()["detail"].startswith("Logic raised TypeError")
@@ -2,10 +2,11 @@ import base64
 import tarfile
 from pathlib import Path
 
+import pytest
 import yaml
 from fastapi.testclient import TestClient
 from nacl import signing
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
@@ -22,7 +23,15 @@ from app.models import controls as control_m, meta as meta_m
 PRIVATE_KEY_B64 = "gpXAdxXlavULojMEhEjRN8gmpXBOcIrtn3rwlKQCCis="
 
 
-def make_pack(tmp_path: Path, version: str, tamper: bool = False) -> Path:
+def make_pack(
+    tmp_path: Path,
+    version: str,
+    tamper: bool = False,
+    operators=None,
+    template_id=None,
+    envs=("dev",),
+    logic=None,
+) -> Path:
     pack_dir = tmp_path / "build" / "rules"
     (pack_dir / "templates").mkdir(parents=True, exist_ok=True)
     (pack_dir / "mappings").mkdir(exist_ok=True)
@@ -33,25 +42,28 @@ def make_pack(tmp_path: Path, version: str, tamper: bool = False) -> Path:
         "min_engine_version": "0",
         "description": "test",
     }
+    if operators is not None:
+        meta["operators"] = operators
     meta_yaml = yaml.safe_dump(meta)
     sk = signing.SigningKey(base64.b64decode(PRIVATE_KEY_B64))
     sig = sk.sign(meta_yaml.encode()).signature
     (pack_dir / "meta.yaml").write_text(meta_yaml if not tamper else meta_yaml + "#tamper")
     (pack_dir / "signatures" / "meta.sig").write_text(base64.b64encode(sig).decode())
     (pack_dir / "expansions.yaml").write_text(
-        yaml.safe_dump({"envs": ["dev"], "types": ["ec2"], "params": [{"enabled": True}]})
+        yaml.safe_dump({"envs": list(envs), "types": ["ec2"], "params": [{"enabled": True}]})
     )
+    template_id = template_id or f"tmpl{version}"
     template = {
-        "template_id": f"tmpl{version}",
+        "template_id": template_id,
         "title": "Sample {env} {type}",
-        "logic": {"var": "enabled"},
+        "logic": logic or {"var": "enabled"},
         "frameworks": ["PCI"],
     }
     (pack_dir / "templates" / "tmpl.yaml").write_text(yaml.safe_dump(template))
     mapping = {
         "requirement_id": "r1",
         "title": "req",
-        "mapped_controls": [f"tmpl{version}-dev-ec2"],
+        "mapped_controls": [f"{template_id}-{envs[0]}-ec2"],
     }
     for name in [
         "pci",
@@ -74,13 +86,16 @@ def make_pack(tmp_path: Path, version: str, tamper: bool = False) -> Path:
     return tar_path
 
 
-def setup_client(tmp_path: Path):
+def setup_client(tmp_path: Path, foreign_keys: bool = False):
     engine = create_engine(
         "sqlite:///:memory:",
         future=True,
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
+    if foreign_keys:
+        # Enforce ON DELETE CASCADE, as Postgres does.
+        event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys=ON"))
     TestingSessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
     Base.metadata.create_all(bind=engine)
 
@@ -135,3 +150,190 @@ def test_rollback_restores(tmp_path):
     session = SessionLocal()
     ctrl = session.query(control_m.Control).one()
     assert ctrl.control_id == "tmpl2024.01.0-dev-ec2"
+
+
+def test_pack_declared_operators_must_be_registered(tmp_path):
+    client, SessionLocal = setup_client(tmp_path)
+    pack = make_pack(tmp_path, "2024.03.0", operators=["cidr_contains", "days_since"])
+    with pack.open("rb") as f:
+        r = client.post("/rules/upload", files={"file": ("p.tar.gz", f.read(), "application/gzip")})
+    assert r.status_code == 200
+    pack = make_pack(tmp_path, "2024.03.1", operators=["cidr_contains", "geo_fence"])
+    with pack.open("rb") as f:
+        r = client.post("/rules/upload", files={"file": ("p.tar.gz", f.read(), "application/gzip")})
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Unsupported operators: geo_fence"
+
+
+def test_rollback_loads_compiled_artifact(tmp_path, monkeypatch):
+    pack1 = make_pack(tmp_path, "2024.04.0")
+    pack2 = make_pack(tmp_path, "2024.05.0")
+    client, SessionLocal = setup_client(tmp_path)
+    for pack in (pack1, pack2):
+        with pack.open("rb") as f:
+            client.post("/rules/upload?apply=true", files={"file": ("p.tar.gz", f.read(), "application/gzip")})
+    artifact = tmp_path / "2024.04.0.pack.gz"
+    assert artifact.exists()
+    import gzip
+    import json
+
+    body = json.loads(gzip.decompress(artifact.read_bytes()).split(b"\n", 1)[1])
+    assert body["version"] == "2024.04.0" and len(body["controls"]) == 1
+
+    def no_parse(data):
+        raise AssertionError("pack re-parsed")
+
+    monkeypatch.setattr(rules_router, "_parse_pack", no_parse)
+    r = client.post("/rules/rollback?version=2024.04.0")
+    assert r.status_code == 200 and r.json()["control_count"] == 1
+    session = SessionLocal()
+    assert session.query(control_m.Control).one().control_id == "tmpl2024.04.0-dev-ec2"
+    session.close()
+
+    from app.models import db as models_db
+
+    monkeypatch.setattr(models_db, "SessionLocal", SessionLocal)
+    assert rules_router.warm_active_pack() == 1
+
+
+def test_invalid_artifact_is_rebuilt(tmp_path, monkeypatch):
+    from app.services import rulepack_artifact
+
+    pack = make_pack(tmp_path, "2024.06.0")
+    client, SessionLocal = setup_client(tmp_path)
+    with pack.open("rb") as f:
+        client.post("/rules/upload", files={"file": ("p.tar.gz", f.read(), "application/gzip")})
+    artifact = tmp_path / "2024.06.0.pack.gz"
+    assert rulepack_artifact.load(tmp_path, "2024.06.0") is not None
+
+    # Written with another key, or for another tarball: ignored.
+    monkeypatch.setattr(rulepack_artifact.settings, "SECRET_KEY", "other")
+    assert rulepack_artifact.load(tmp_path, "2024.06.0") is None
+    monkeypatch.undo()
+    tarball = tmp_path / "2024.06.0.tar.gz"
+    original = tarball.read_bytes()
+    tarball.write_bytes(original + b"\0")
+    assert rulepack_artifact.load(tmp_path, "2024.06.0") is None
+    tarball.write_bytes(original)
+
+    artifact.write_bytes(b"garbage")
+    r = client.post("/rules/rollback?version=2024.06.0")
+    assert r.status_code == 200
+    assert artifact.read_bytes() != b"garbage"
+    assert rulepack_artifact.load(tmp_path, "2024.06.0") is not None
+
+
+def test_apply_writes_only_the_diff(tmp_path):
+    from datetime import date
+
+    from app.models import exceptions as exc_m
+
+    client, SessionLocal = setup_client(tmp_path, foreign_keys=True)
+
+    def upload(version, **kwargs):
+        pack = make_pack(tmp_path, version, template_id="shared", **kwargs)
+        with pack.open("rb") as f:
+            r = client.post("/rules/upload?apply=true", files={"file": ("p.tar.gz", f.read(), "application/gzip")})
+        assert r.status_code == 200
+        return r.json()["diff"]
+
+    assert upload("2024.07.0", envs=("dev", "prod")) == {
+        "added": 2, "changed": 0, "removed": 0, "unchanged": 0
+    }
+    session = SessionLocal()
+    ids = dict(session.query(control_m.Control.control_id, control_m.Control.id).all())
+    for cid in ids:
+        session.add(
+            exc_m.Exception(
+                control_id=cid, selector={}, reason="waived", expires_at=date(2030, 1, 1), created_by="t"
+            )
+        )
+    session.commit()
+    session.close()
+
+    assert upload("2024.07.1", envs=("dev", "prod")) == {
+        "added": 0, "changed": 0, "removed": 0, "unchanged": 2
+    }
+    assert upload("2024.07.2", envs=("dev", "stage")) == {
+        "added": 1, "changed": 0, "removed": 1, "unchanged": 1
+    }
+    assert upload("2024.07.3", envs=("dev", "stage"), logic={"!": {"var": "public"}}) == {
+        "added": 0, "changed": 2, "removed": 0, "unchanged": 0
+    }
+    session = SessionLocal()
+    controls = {c.control_id: c for c in session.query(control_m.Control)}
+    assert sorted(controls) == ["shared-dev-ec2", "shared-stage-ec2"]
+    assert controls["shared-dev-ec2"].id == ids["shared-dev-ec2"]
+    assert controls["shared-dev-ec2"].logic == {"!": {"var": "public"}}
+    # The waiver on the kept control survives; the removed control's is gone.
+    assert [e.control_id for e in session.query(exc_m.Exception)] == ["shared-dev-ec2"]
+
+    r = client.post("/rules/rollback?version=2024.07.2")
+    assert r.json()["diff"] == {"added": 0, "changed": 2, "removed": 0, "unchanged": 0}
+
+
+def test_apply_hashes_controls_written_elsewhere(tmp_path):
+    from app.services.rulepack_apply import apply_controls
+
+    client, SessionLocal = setup_client(tmp_path)
+    session = SessionLocal()
+    session.add(
+        control_m.Control(
+            control_id="c1", title="T", category="", severity="",
+            applies_to={}, logic={"var": "x"}, frameworks=[], fix={},
+        )
+    )
+    session.commit()
+    pack = [{"control_id": "c1", "title": "T", "logic": {"var": "x"}}]
+    diff = apply_controls(session, pack)
+    session.commit()
+    assert diff.as_dict() == {"added": 0, "changed": 0, "removed": 0, "unchanged": 1}
+    assert session.query(control_m.Control).one().content_hash is not None
+    with pytest.raises(ValueError, match="Duplicate control ids: c1"):
+        apply_controls(session, pack * 2)
+
+
+def test_streaming_reader_limits_and_signature(tmp_path, monkeypatch):
+    from app.services import rulepack_reader as reader
+
+    data = make_pack(tmp_path, "2024.08.0").read_bytes()
+    files = reader.read_pack(data)
+    assert reader.META in files and "rules/templates/tmpl.yaml" in files
+    assert not any(name.endswith("/") for name in files)
+    with pytest.raises(ValueError, match="too large"):
+        reader.read_pack(data, max_member_bytes=16)
+    with pytest.raises(ValueError, match="too large"):
+        reader.read_pack(data, max_total_bytes=256)
+    with pytest.raises(ValueError, match="more than 3 members"):
+        reader.read_pack(data, max_members=3)
+    with pytest.raises(ValueError, match="Invalid rule-pack archive"):
+        reader.read_pack(b"not a tarball")
+
+    # A forged pack is rejected before any of its YAML is parsed.
+    forged = make_pack(tmp_path, "2024.08.1", tamper=True).read_bytes()
+
+    def no_yaml(data):
+        raise AssertionError("YAML parsed")
+
+    monkeypatch.setattr(reader, "load_yaml", no_yaml)
+    with pytest.raises(ValueError, match="Invalid signature"):
+        rules_router._parse_pack(forged)
+
+
+def test_upload_rejects_malformed_archive(tmp_path):
+    client, SessionLocal = setup_client(tmp_path)
+    r = client.post("/rules/upload", files={"file": ("p.tar.gz", b"garbage", "application/gzip")})
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Invalid rule-pack archive"
+
+
+def test_template_files_parse_in_worker_processes(tmp_path, monkeypatch):
+    data = make_pack(tmp_path, "2024.09.0").read_bytes()
+    monkeypatch.setenv("RULEPACK_PARSE_WORKERS", "2")
+    pack = rules_router._parse_pack(data)
+    assert [c["control_id"] for c in pack.controls] == ["tmpl2024.09.0-dev-ec2"]
+
+    from app.services import rulepack_reader as reader
+
+    blobs = [f"n: {i}".encode() for i in range(20)]
+    assert reader.load_many(blobs, workers=2) == [{"n": i} for i in range(20)]